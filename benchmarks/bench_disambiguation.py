@@ -0,0 +1,45 @@
+"""
+Benchmark of the objects allocated by disambiguation.babelfy_man.disambiguate_sentences.
+Synthetic pages are disambiguated and their results are kept in memory (as for a batch of pages waiting to be parsed).
+The reported figures, per page, are:
+	- the memory blocks still allocated for the results;
+	- the bytes still allocated for the results, as traced by tracemalloc;
+	- the time of disambiguate_sentences.
+Usage:
+	python -m benchmarks.bench_disambiguation [num_pages]
+"""
+import gc
+import sys
+import time
+import tracemalloc
+
+import disambiguation.babelfy_man as bfm
+from benchmarks.synthetic import generate_pages
+
+
+def run(num_pages):
+	pages = generate_pages(num_pages)
+	results = []
+
+	gc.collect()
+	start_blocks = sys.getallocatedblocks()
+	tracemalloc.start()
+	start_time = time.perf_counter()
+	for sentences, annotations in pages:
+		results.append(bfm.disambiguate_sentences(sentences, annotations))
+	elapsed = time.perf_counter() - start_time
+	gc.collect()
+	traced_bytes, peak_bytes = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	blocks = sys.getallocatedblocks() - start_blocks
+
+	num_words = sum(len(sent) for sentences, _ in pages for sent in sentences)
+	print("pages: %d, words: %d" % (num_pages, num_words))
+	print("allocated blocks per page: %.1f" % (blocks / float(num_pages)))
+	print("traced bytes per page: %.1f (peak: %.1f)" % (traced_bytes / float(num_pages), peak_bytes / float(num_pages)))
+	print("time per page (with tracing): %.1f us" % (elapsed / num_pages * 1e6))
+	return results
+
+
+if __name__ == '__main__':
+	run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,54 @@
+"""
+Benchmark of the cold start: every case runs in a new Python process (as a run, or a worker process, does),
+and the median wall-clock time of some runs is reported. The cases are:
+	- usage: main.py with bad arguments (it prints the usage);
+	- import: the import of utils.relation_extractor, without loading the spaCy model;
+	- model: the import and the load of the spaCy model, as used by the runs (utils.dependency_parser);
+	- model_all_components: the same, with all the components of the model (see SPACY_DISABLED_COMPONENTS).
+The cases which fail (e.g. the spaCy model is not installed) are reported as such.
+Usage:
+	python -m benchmarks.bench_startup [num_runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+	("usage", ["main.py"]),
+	("import", ["-c", "import utils.relation_extractor"]),
+	("model", ["-c", "import utils.dependency_parser as d; d.get_spacy_parser()"]),
+	("model_all_components", ["-c", "import configurations as conf; conf.SPACY_DISABLED_COMPONENTS = []; "
+									"import utils.dependency_parser as d; d.get_spacy_parser()"]),
+]
+
+
+def measure(args, num_runs):
+	"""
+	:return: the median time of the runs of a Python process with the given arguments, or None if it fails
+	"""
+	times = []
+	for _ in range(num_runs):
+		start_time = time.perf_counter()
+		result = subprocess.run([sys.executable] + args, cwd=ROOT_DIR, stdout=subprocess.DEVNULL,
+								stderr=subprocess.DEVNULL)
+		times.append(time.perf_counter() - start_time)
+		if result.returncode not in (0, 255):
+			return None
+	return statistics.median(times)
+
+
+def run(num_runs):
+	for name, args in CASES:
+		elapsed = measure(args, num_runs)
+		if elapsed is None:
+			print("%s: failed" % name)
+		else:
+			print("%s: %.0f ms" % (name, elapsed * 1000))
+
+
+if __name__ == '__main__':
+	run(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,134 @@
+"""
+End-to-end benchmark of a run (utils.relation_extractor.find_relation_from_datadir) on a synthetic dataset
+directory (see benchmarks.synthetic.write_datadir), which is reproducible from its seed.
+The reported figures are the pages and the relation instances per second, and the time of every stage
+recorded by utils.profiling. With --stub, the spaCy model is replaced by benchmarks.stub_pipeline,
+so that no model has to be downloaded (the figures are then not comparable with the ones of a real model).
+The shape of the synthetic pages can be changed with --sentences (sentences per page), --density (probability
+that an annotation starts at a word) and --overlap (probability that an annotation is overlapped by the next one).
+The figures can be saved as a baseline (JSON), and compared with a baseline: the benchmark fails
+(exit status 1) if the throughput is lower than the one of the baseline by more than the tolerance,
+or if the baseline was measured with other settings, or if it has no figures.
+Without a path, --save-baseline and --compare use BASELINE_STUB, the committed baseline of --stub
+with the default settings (the figures depend on the machine: measure it again on a new one).
+Usage:
+	python -m benchmarks.bench_throughput [--stub] [--subdirs=N] [--pages=N] [--workers=N] [--seed=S]
+		[--sentences=N] [--density=P] [--overlap=P] [--save-baseline[=PATH]] [--compare[=PATH]] [--tolerance=FRACTION]
+"""
+import getopt
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import utils.dependency_parser as dep_parser
+import utils.profiling as profiling
+import utils.relation_extractor as relext
+from benchmarks.synthetic import write_datadir
+from utils.seeds import RelationExtractor
+
+# the relations of the benchmark, with seeds (as in the seed files) in the vocabulary of the synthetic pages
+RELATIONS = [
+	("material", ["made of", "made from"]),
+	("place", ["located in", "is in"]),
+	("smell", ["smells like"]),
+	("taste", ["tastes like"]),
+]
+
+OPTIONS = ["stub", "subdirs=", "pages=", "workers=", "seed=", "sentences=", "density=", "overlap=",
+		   "save-baseline=", "compare=", "tolerance="]
+
+# the baseline of --stub with the default settings
+BASELINE_STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_stub.json")
+
+
+def run(num_subdirs=4, pages_per_subdir=250, num_workers=1, seed=0, num_sentences=5, annotation_density=0.3,
+		overlap=0.2):
+	"""
+	:param num_sentences, annotation_density, overlap: the parameters of benchmarks.synthetic.generate_page
+	:return: a dictionary with the figures of the run
+	"""
+	data_dir = tempfile.mkdtemp(prefix="bench_throughput_")
+	try:
+		num_pages = write_datadir(data_dir, num_subdirs, pages_per_subdir, seed, num_sentences=num_sentences,
+								  annotation_density=annotation_density, overlap=overlap)
+		relation_extractors = [RelationExtractor(name, seeds) for name, seeds in RELATIONS]
+		profiling.configure(None)
+		start_time = time.perf_counter()
+		num_instances = sum(1 for _ in relext.find_relation_from_datadir(data_dir, relation_extractors, num_workers))
+		elapsed = time.perf_counter() - start_time
+	finally:
+		shutil.rmtree(data_dir)
+
+	return {
+		"pages": num_pages,
+		"instances": num_instances,
+		"seconds": round(elapsed, 3),
+		"pages_per_second": round(num_pages / elapsed, 3),
+		"instances_per_second": round(num_instances / elapsed, 3),
+		"stages": profiling.report(),
+	}
+
+
+def compare(result, baseline, tolerance):
+	"""
+	:return: the list of the figures of the result lower than the ones of the baseline by more than the tolerance
+	"""
+	regressions = []
+	for key in ["pages_per_second", "instances_per_second"]:
+		if result[key] < baseline[key] * (1 - tolerance):
+			regressions.append("%s: %.3f, baseline %.3f" % (key, result[key], baseline[key]))
+	return regressions
+
+
+def main(argv):
+	# --save-baseline and --compare without a path
+	argv = [arg + "=" + BASELINE_STUB if arg in ["--save-baseline", "--compare"] else arg for arg in argv]
+	opts, _ = getopt.getopt(argv, "", OPTIONS)
+	opts = dict(opts)
+	if "--stub" in opts:
+		from benchmarks.stub_pipeline import make_stub_pipeline
+		dep_parser.spacy_parser = make_stub_pipeline()
+
+	settings = {
+		"stub": "--stub" in opts,
+		"subdirs": int(opts.get("--subdirs", 4)),
+		"pages": int(opts.get("--pages", 250)),
+		"workers": int(opts.get("--workers", 1)),
+		"seed": int(opts.get("--seed", 0)),
+		"sentences": int(opts.get("--sentences", 5)),
+		"density": float(opts.get("--density", 0.3)),
+		"overlap": float(opts.get("--overlap", 0.2)),
+	}
+	result = run(settings["subdirs"], settings["pages"], settings["workers"], settings["seed"],
+				 settings["sentences"], settings["density"], settings["overlap"])
+	result["settings"] = settings
+	print("pages: %d, relation instances: %d, time: %.3f s" % (result["pages"], result["instances"], result["seconds"]))
+	print("pages per second: %.3f, relation instances per second: %.3f"
+		  % (result["pages_per_second"], result["instances_per_second"]))
+	for row in result["stages"]:
+		print("\t%(stage)s: %(calls)d calls, %(items)d items, %(seconds).3f s" % row)
+
+	if "--save-baseline" in opts:
+		with open(opts["--save-baseline"], "w") as f:
+			json.dump(result, f, indent=1)
+	if "--compare" in opts:
+		with open(opts["--compare"]) as f:
+			baseline = json.load(f)
+		if baseline.get("settings") != result["settings"]:
+			print("The baseline was measured with different settings: %s" % json.dumps(baseline.get("settings")))
+			return 1
+		if baseline.get("pages_per_second") is None:
+			print("The baseline has no figures: measure them with --save-baseline=%s" % opts["--compare"])
+			return 1
+		regressions = compare(result, baseline, float(opts.get("--tolerance", 0.2)))
+		for r in regressions:
+			print("Regression: " + r)
+		return 1 if len(regressions) > 0 else 0
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv[1:]))
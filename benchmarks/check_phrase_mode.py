@@ -0,0 +1,77 @@
+"""
+Equivalence check of the light mode of utils.similarity.PhraseEmbedder against the whole spaCy model.
+The relational phrases (of a candidate store built with utils.candidate_store, or of a text file
+with one phrase per line) are embedded in both modes and matched, in order, against the relations
+of a seed file; the decisions (and the promoted seeds) of the two modes must be the same.
+Some edge cases (EDGE_PHRASES: phrases split in more sentences, or empty between "X" and "Y") are always checked.
+The time spent embedding the phrases in the two modes is also reported.
+Usage:
+	python -m benchmarks.check_phrase_mode <IN_relation_seeds_file> <IN_candidates.sqlite | IN_phrases.txt> [max_phrases]
+"""
+import sys
+import time
+
+import numpy as np
+
+import utils.phrase_vectors as phrase_vectors
+import utils.seed_parser as seed_parser
+import utils.similarity as similarity
+from utils.seeds import RelationClassifier
+
+# relational phrases whose artificial sentence can be split by the parser
+EDGE_PHRASES = [", made of", ". located in", "! smells like", "Made of", "Located in. The", ".", "..."]
+
+
+def read_phrases(path, max_phrases):
+	phrases = phrase_vectors.read_phrases(path)
+	phrases = phrases[:max_phrases] if max_phrases is not None else phrases
+	known = set(phrases)
+	return phrases + [ph for ph in EDGE_PHRASES if ph not in known]
+
+
+def decide(seeds_file, phrases, light):
+	"""
+	:return: a tuple (embeddings, decisions, promoted_seeds, seconds), where:
+		- embeddings is the list of the tuples (is_one_sentence, vector) of the phrases;
+		- decisions is the list of the names of the compliant relations of every phrase;
+		- promoted_seeds is the list of the promoted seeds of every relation;
+		- seconds is the time spent embedding the phrases.
+	"""
+	similarity.phrase_embedder = similarity.PhraseEmbedder(light=light)
+	relation_classifier = RelationClassifier(seed_parser.parse_seed_file(seeds_file))
+	start_time = time.perf_counter()
+	embeddings = similarity.phrase_embedder.embed_many(phrases)
+	elapsed = time.perf_counter() - start_time
+	decisions = [[r.name for r in relation_classifier.compliant_extractors(ph)] for ph in phrases]
+	return embeddings, decisions, [r.get_promoted_seeds() for r in relation_classifier], elapsed
+
+
+def run(seeds_file, phrases_path, max_phrases=None):
+	phrases = read_phrases(phrases_path, max_phrases)
+	full_embeddings, full_decisions, full_seeds, full_time = decide(seeds_file, phrases, light=False)
+	light_embeddings, light_decisions, light_seeds, light_time = decide(seeds_file, phrases, light=True)
+	if similarity.phrase_embedder.light_components is None:
+		print("The light mode cannot be used with this model (no word vectors, or no parser)")
+
+	print("phrases: %d" % len(phrases))
+	print("whole model: %.1f us per phrase" % (full_time / max(len(phrases), 1) * 1e6))
+	print("light mode: %.1f us per phrase" % (light_time / max(len(phrases), 1) * 1e6))
+
+	different_sentences = sum(1 for (a, _), (b, _) in zip(full_embeddings, light_embeddings) if a != b)
+	max_difference = max([float(np.abs(u - v).max()) for (_, u), (_, v) in zip(full_embeddings, light_embeddings)]
+						 or [0.])
+	different_decisions = [(ph, a, b) for ph, a, b in zip(phrases, full_decisions, light_decisions) if a != b]
+	print("different sentence splits: %d, maximum vector difference: %g" % (different_sentences, max_difference))
+	print("different decisions: %d" % len(different_decisions))
+	for ph, a, b in different_decisions[:20]:
+		print("\t%s: %s (whole model), %s (light mode)" % (ph, ",".join(a), ",".join(b)))
+	if len(different_decisions) > 0 or full_seeds != light_seeds:
+		return 1
+	return 0
+
+
+if __name__ == '__main__':
+	if len(sys.argv) < 3:
+		print(__doc__)
+		sys.exit(-1)
+	sys.exit(run(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else None))
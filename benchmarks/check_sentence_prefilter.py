@@ -0,0 +1,87 @@
+"""
+Recall check of the sentence prefilter (utils.sentence_filter) on a sample of the corpus.
+The first pages of the corpus are analyzed twice, from the same seeds: without the prefilter and with it;
+the skipped sentences, the time of the two runs and the relation instances lost by the prefilter are reported.
+The values of SENTENCE_PREFILTER_* (configurations.py) can be overridden to compare the trade-offs.
+With --stub the spaCy model is replaced by the stub pipeline of bench_throughput (see benchmarks/stub_pipeline.py).
+Usage:
+	python -m benchmarks.check_sentence_prefilter [--stub] [--neighbours=N] [--min-similarity=S] [--cue-length=L] <IN_datadir> <IN_relation_seeds_file> [num_pages]
+"""
+import collections
+import getopt
+import itertools
+import sys
+import time
+
+import configurations as conf
+import utils.corpus_index as corpus_index
+import utils.dependency_parser as dep_parser
+import utils.relation_extractor as relext
+import utils.seed_parser as seed_parser
+from utils.seeds import RelationClassifier
+
+OPTIONS = ["stub", "neighbours=", "min-similarity=", "cue-length="]
+
+
+def sample_pages(data_dir, num_pages):
+	"""
+	:return: the first num_pages pages of the corpus, as tuples (page_name, sentences, annotations)
+	"""
+	corpus = corpus_index.open_corpus(data_dir)
+	page_list = (page for _, pages in corpus.get_docs_list_by_subdir() for page in pages)
+	return list(itertools.islice(relext._load_pages(corpus, page_list), num_pages))
+
+
+def analyze(pages, seeds_file, prefilter):
+	"""
+	:return: a tuple (instances, seconds, sentence_prefilter), where instances is the list of the relation instances
+		found, as tuples (relation_name, left mention, right mention, source)
+	"""
+	conf.SENTENCE_PREFILTER = prefilter
+	relation_classifier = RelationClassifier(seed_parser.parse_seed_file(seeds_file))
+	start_time = time.perf_counter()
+	instances = [(i.relation_name, i.left_concept.mention, i.right_concept.mention, i.source)
+				 for _, i in relext.analyze_pages(pages, dep_parser.get_sentence_parser(), relation_classifier)]
+	return instances, time.perf_counter() - start_time, relation_classifier.sentence_prefilter
+
+
+def run(data_dir, seeds_file, num_pages=1000):
+	pages = sample_pages(data_dir, num_pages)
+	all_instances, all_time, _ = analyze(pages, seeds_file, prefilter=False)
+	kept_instances, kept_time, sentence_prefilter = analyze(pages, seeds_file, prefilter=True)
+
+	lost = collections.Counter(all_instances) - collections.Counter(kept_instances)
+	num_lost = sum(lost.values())
+	print("pages: %d, sentences: %d, skipped: %d (%.1f%%)"
+		  % (len(pages), sentence_prefilter.num_sentences, sentence_prefilter.num_skipped,
+			 100. * sentence_prefilter.num_skipped / max(sentence_prefilter.num_sentences, 1)))
+	print("without prefilter: %.2f s, %d instances" % (all_time, len(all_instances)))
+	print("with prefilter: %.2f s, %d instances" % (kept_time, len(kept_instances)))
+	print("lost instances: %d, recall %.3f" % (num_lost, 1. - num_lost / float(max(len(all_instances), 1))))
+	for relation_name, count in sorted(collections.Counter(i[0] for i in lost.elements()).items()):
+		print("\t%s: %d lost" % (relation_name, count))
+	for i in list(lost.elements())[:20]:
+		print("\t" + "\t".join(i[:3]))
+	return 0
+
+
+def main(argv):
+	opts, args = getopt.getopt(argv, "", OPTIONS)
+	opts = dict(opts)
+	if len(args) not in [2, 3]:
+		print(__doc__)
+		return -1
+	if "--stub" in opts:
+		from benchmarks.stub_pipeline import make_stub_pipeline
+		dep_parser.spacy_parser = make_stub_pipeline()
+	if "--neighbours" in opts:
+		conf.SENTENCE_PREFILTER_NEIGHBOURS = int(opts["--neighbours"])
+	if "--min-similarity" in opts:
+		conf.SENTENCE_PREFILTER_MIN_SIMILARITY = float(opts["--min-similarity"])
+	if "--cue-length" in opts:
+		conf.SENTENCE_PREFILTER_CUE_LENGTH = int(opts["--cue-length"])
+	return run(args[0], args[1], int(args[2]) if len(args) == 3 else 1000)
+
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,84 @@
+"""
+A stub spaCy pipeline for the benchmarks, which needs no model download:
+a blank English model with a rule-based dependency "parser" (StubParser) and random word vectors
+for the vocabulary of the synthetic pages (see benchmarks.synthetic).
+The parses are not linguistically meaningful, but they have the shape expected by utils.relation_extractor
+(a subject, a verb, prepositional objects), so every stage of the procedure is exercised.
+"""
+import numpy as np
+import spacy
+from spacy.attrs import POS, DEP, HEAD
+from spacy.symbols import VERB, NOUN, ADP, ADJ, PUNCT
+
+from benchmarks.synthetic import VOCABULARY
+
+VERBS = set("is was are located made smells tastes has".split())
+PREPOSITIONS = set("of in from to like as".split())
+
+
+class StubParser(object):
+	"""
+	A pipeline component which sets the POS tags and the dependency tree of a sentence:
+		- the first verb (or the middle word) is the root;
+		- the word before the root is its subject, the other words before it are compounds of the subject;
+		- after the root, a preposition is attached to the last object, and the word after it is its object;
+		  the first other word is an attribute of the root, the following ones are modifiers of the last object.
+	"""
+	name = "stub_parser"
+
+	def __init__(self, vocab):
+		self.vocab = vocab
+
+	def __call__(self, doc):
+		words = [t.text for t in doc]
+		if len(words) == 0:
+			return doc
+		tags = self.tag(words)
+		array = np.zeros((len(words), 3), dtype="int64")
+		for i, (pos, dep, head) in enumerate(tags):
+			array[i] = [pos, self.vocab.strings.add(dep), head - i]
+		doc.from_array([POS, DEP, HEAD], array.astype("uint64"))
+		return doc
+
+	def tag(self, words):
+		"""
+		:return: a list of tuples (pos, dep, head_index), one per word
+		"""
+		n = len(words)
+		root = next((i for i, w in enumerate(words) if w in VERBS), n // 2)
+		tags = [None] * n
+		tags[root] = (VERB, "ROOT", root)
+		for i in range(root):
+			tags[i] = (NOUN, "nsubj", root) if i == root - 1 else (NOUN, "compound", root - 1)
+
+		anchor = root
+		preposition = None
+		for i in range(root + 1, n):
+			if words[i] == ".":
+				tags[i] = (PUNCT, "punct", root)
+			elif words[i] in PREPOSITIONS:
+				tags[i] = (ADP, "prep", anchor)
+				preposition = i
+			elif preposition is not None:
+				tags[i] = (NOUN, "pobj", preposition)
+				anchor = i
+				preposition = None
+			elif anchor == root:
+				tags[i] = (NOUN, "attr", root)
+				anchor = i
+			else:
+				tags[i] = (ADJ, "amod", anchor)
+		return tags
+
+
+def make_stub_pipeline(vector_size=50, seed=0):
+	"""
+	:return: a spaCy Language object, with the StubParser and the word vectors
+	"""
+	nlp = spacy.blank("en")
+	rng = np.random.RandomState(seed)
+	for word in VOCABULARY + ["X", "Y", "."]:
+		nlp.vocab.set_vector(word, rng.normal(size=vector_size).astype("float32"))
+	nlp.add_pipe(StubParser(nlp.vocab), name=StubParser.name)
+	nlp.meta["name"] = "stub_pipeline"
+	return nlp
@@ -0,0 +1,100 @@
+"""
+Generation of synthetic babelfied pages, for the benchmarks.
+The pages are reproducible: they only depend on the seed of the random generator.
+They can also be written as a dataset directory (see write_datadir), with the layout and the XML format
+of the babelfied Wikipedia (see utils.file_manager).
+"""
+import gzip
+import os
+import random
+from xml.sax.saxutils import escape
+
+from utils.file_manager import Annotation
+
+ANNOTATION_TYPES = ["BABELFY", "HL", "MSC"]
+
+VOCABULARY = ("the a an of in is was are located made from city river capital country smells tastes like "
+			  "similar to has odor taste kind example part known as famous large small old new northern "
+			  "southern village town region mountain lake island river species plant animal food").split()
+
+
+def generate_page(rng, num_sentences=5, sentence_length=20, annotation_density=0.3, overlap=0.2, max_mention_length=3):
+	"""
+	Generate the sentences and the annotations of a page.
+	:param rng: a random.Random object
+	:param num_sentences: the number of sentences
+	:param sentence_length: the average number of words per sentence
+	:param annotation_density: the probability that an annotation starts at a word
+	:param overlap: the probability that an annotation is followed by another one overlapping it
+	:param max_mention_length: the maximum number of words of a mention
+	:return: a tuple (sentences, annotations), as returned by utils.file_manager.read_page
+	"""
+	sentences = []
+	annotations = []
+	tag_index = 0
+	for _ in range(num_sentences):
+		length = max(2, int(rng.gauss(sentence_length, sentence_length / 4.)))
+		sentence = [rng.choice(VOCABULARY) for _ in range(length - 1)] + ["."]
+		sentences.append(sentence)
+		i = 0
+		while i < length - 1:
+			if rng.random() < annotation_density:
+				starts = [i]
+				if rng.random() < overlap:
+					starts.append(i + 1)
+				for start in starts:
+					end = min(length - 1, start + rng.randint(1, max_mention_length))
+					if end > start:
+						annotations.append(Annotation(
+							"bn:%08dn" % rng.randint(0, 10 ** 8),
+							" ".join(sentence[start:end]),
+							str(tag_index + start),
+							str(tag_index + end),
+							rng.choice(ANNOTATION_TYPES)))
+				i = end
+			i += 1
+		tag_index += length + 1
+	return sentences, annotations
+
+
+def generate_pages(num_pages, seed=0, **kwargs):
+	"""
+	:return: a list of num_pages pages (see generate_page)
+	"""
+	rng = random.Random(seed)
+	return [generate_page(rng, **kwargs) for _ in range(num_pages)]
+
+
+def page_to_xml(sentences, annotations):
+	"""
+	:return: the XML document (a string) of a page, in the format of the babelfied Wikipedia:
+		one sentence per line in the text, and the annotations with their anchors.
+	"""
+	lines = ["<disambiguatedArticle>",
+			 "<text>" + escape("\n".join(" ".join(sent) for sent in sentences) + "\n") + "</text>",
+			 "<annotations>"]
+	for a in annotations:
+		lines.append("<annotation><babelNetID>%s</babelNetID><mention>%s</mention><anchorStart>%s</anchorStart>"
+					 "<anchorEnd>%s</anchorEnd><type>%s</type></annotation>"
+					 % (escape(a.babelNetID), escape(a.mention), a.anchorStart, a.anchorEnd, escape(a.type)))
+	lines += ["</annotations>", "</disambiguatedArticle>"]
+	return "\n".join(lines)
+
+
+def write_datadir(data_dir, num_subdirs, pages_per_subdir, seed=0, **kwargs):
+	"""
+	Write a synthetic dataset directory: num_subdirs numbered subdirectories, with pages_per_subdir
+	gzipped XML pages each (see utils.file_manager.get_docs_list_by_subdir).
+	:param kwargs: the parameters of generate_page
+	:return: the number of pages written
+	"""
+	rng = random.Random(seed)
+	for subdir in range(num_subdirs):
+		subdir_path = os.path.join(data_dir, "%03d" % subdir)
+		if not os.path.isdir(subdir_path):
+			os.makedirs(subdir_path)
+		for k in range(pages_per_subdir):
+			sentences, annotations = generate_page(rng, **kwargs)
+			with gzip.open(os.path.join(subdir_path, "Page_%05d.xml.gz" % k), "wt", encoding="utf8") as f:
+				f.write(page_to_xml(sentences, annotations))
+	return num_subdirs * pages_per_subdir
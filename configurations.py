@@ -4,6 +4,12 @@ VERBOSITY = 2
 # Data structure for store the new merged concepts
 NUM_NEW_CONCEPT = 0
 NEW_CONCEPTS = {}
+# Number of most recent merged concepts kept in NEW_CONCEPTS
+NEW_CONCEPTS_MAX_SIZE = 1 << 16
+
+# Number of distinct null concepts (i.e. word and position in the sentence) shared among the sentences
+# (see disambiguation.BabelNetConcept.get_null_concept)
+NULL_CONCEPT_CACHE_SIZE = 1 << 16
 
 # Default number of first sentences of Wikipedia pages to be analyzed
 NUM_FIRST_WIKI_SENTENCES = 5
@@ -11,3 +17,83 @@ NUM_FIRST_WIKI_SENTENCES = 5
 # Default similarity threshold, in case this is not provided as input in the seed file
 DEFAULT_SIMILARITY_THRESHOLD = 0.90
 
+
+# Number of worker processes used to analyze the dataset (see utils.relation_extractor.find_relation_from_datadir).
+# With 1, the dataset is analyzed sequentially in the main process.
+NUM_WORKERS = 1
+
+# Components of the spaCy model which are not loaded: only the tagger and the parser are needed
+SPACY_DISABLED_COMPONENTS = ["ner"]
+
+# Minimum number of sentences parsed together through the spaCy "pipe" API
+# (see utils.relation_extractor.analyze_pages).
+PARSER_BATCH_SIZE = 256
+
+# Maximum number of items (pages) in every queue of the pipeline (see utils.pipeline)
+PIPELINE_QUEUE_SIZE = 64
+# Number of seconds between two reports of the queue depths of the pipeline
+PIPELINE_REPORT_INTERVAL = 60
+
+# Directory of the persistent cache of spaCy parses (see utils.parse_cache); None disables the cache.
+PARSE_CACHE_DIR = None
+# Maximum size on disk of the parse cache, in megabytes
+PARSE_CACHE_MAX_SIZE_MB = 4096
+# Number of parsed sentences per shard of the parse cache
+PARSE_CACHE_SHARD_SIZE = 4096
+# Number of shards of the parse cache kept in memory
+PARSE_CACHE_LOADED_SHARDS = 4
+
+# Number of vectors of relational phrases kept in memory (see utils.similarity.PhraseEmbedder)
+PHRASE_VECTOR_CACHE_SIZE = 100000
+# If True, the relational phrases are embedded in the light mode: only the tokenizer, the components below
+# and the vectors of the vocabulary are used, not the whole spaCy model (see utils.similarity.PhraseEmbedder)
+LIGHT_PHRASE_EMBEDDING = True
+LIGHT_PHRASE_COMPONENTS = ["parser"]
+# Directory of the precomputed vectors of the relational phrases, written by utils.phrase_vectors (None: no store)
+PHRASE_VECTOR_STORE = None
+# If True, the relational phrases which are not in the store are embedded with the spaCy model;
+# otherwise they raise an error (see utils.phrase_vectors.PhraseVectorStore)
+PHRASE_VECTOR_STORE_FALLBACK = True
+# Number of relational phrases embedded at once when a store is exported
+PHRASE_VECTOR_EXPORT_BATCH_SIZE = 10000
+# Number of rejected relational phrases remembered by each RelationExtractor
+REJECTED_PHRASES_CACHE_SIZE = 100000
+# Maximum number of seeds promoted by each RelationExtractor (see utils.memory); None for no limit
+MAX_PROMOTED_SEEDS = None
+# Seed expansion to a fixed point (see utils.seed_expansion): the candidate phrases less frequent than
+# SEED_EXPANSION_MIN_FREQUENCY are ignored, and every relation runs at most SEED_EXPANSION_MAX_ITERATIONS iterations
+SEED_EXPANSION_MIN_FREQUENCY = 1
+SEED_EXPANSION_MAX_ITERATIONS = 20
+# Number of candidate phrases embedded at once, and maximum number of similarities computed at once
+SEED_EXPANSION_BATCH_SIZE = 10000
+SEED_EXPANSION_BLOCK_ELEMENTS = 1 << 24
+# Number of pages between two checks of the memory budget (see utils.memory)
+MEMORY_CHECK_EVERY_PAGES = 100
+
+# Directory of the page filter index, written by utils.page_filter (None: no page is skipped)
+PAGE_FILTER_DIR = None
+# If True, the pages are filtered also by the lexical cues of the seeds, which can lose some triples
+PAGE_FILTER_LEXICAL_CUES = True
+# A page is kept by the structural filter if a sentence has at least PAGE_FILTER_MIN_SENTENCE_LENGTH words
+# and PAGE_FILTER_MIN_ANNOTATIONS annotations; the lexical cue of a word is its first PAGE_FILTER_CUE_LENGTH letters
+PAGE_FILTER_MIN_SENTENCE_LENGTH = 2
+PAGE_FILTER_MIN_ANNOTATIONS = 1
+PAGE_FILTER_CUE_LENGTH = 4
+
+# If True, the sentences without any lexical cue of the seeds are not parsed (see utils.sentence_filter):
+# the cues are the first SENTENCE_PREFILTER_CUE_LENGTH letters of the words of the seeds and of their
+# SENTENCE_PREFILTER_NEIGHBOURS nearest words with similarity at least SENTENCE_PREFILTER_MIN_SIMILARITY.
+# More neighbours and shorter cues lose less triples, but skip less sentences.
+SENTENCE_PREFILTER = False
+SENTENCE_PREFILTER_NEIGHBOURS = 10
+SENTENCE_PREFILTER_MIN_SIMILARITY = 0.6
+SENTENCE_PREFILTER_CUE_LENGTH = 4
+
+# Number of strings remembered while building a corpus index, to intern them (see utils.corpus_index._StringWriter):
+# a string evicted from the cache is written again, so a smaller cache uses less memory, but a bigger index
+CORPUS_INDEX_STRING_CACHE_SIZE = 1 << 20
+
+# If True, the Wikipedia pages are read with the streaming utils.file_manager.IterparseReader,
+# which stops reading a page as soon as the needed sentences and annotations have been read;
+# otherwise with utils.file_manager.LxmlParser, which parses the whole page.
+STREAMING_XML_READER = True
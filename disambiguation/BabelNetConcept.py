@@ -1,3 +1,6 @@
+import functools
+
+import configurations as conf
 import constants as c
 
 class BabelNetConcept(object):
@@ -5,9 +8,13 @@ class BabelNetConcept(object):
 	This class represents the annotation schema provided in the annotated corpus.
 	There is also the field "subConceptList", used to keep in memory the concepts
 	from which a concept has been generated (for example, when we merge overlapping concepts).
+	The objects are never modified after their creation, so they can be shared (see get_null_concept).
 	"""
+	__slots__ = ("mention", "babelNetID", "type", "anchorStart", "anchorEnd", "subConceptList")
+
+	fields = ["mention", "babelNetID", "type", "anchorStart", "anchorEnd", "subConceptList"]
 
-	def __init__(self, mention, babelNetID, type, anchorStart=-1, anchorEnd=-1, subConceptList = []):
+	def __init__(self, mention, babelNetID, type, anchorStart=-1, anchorEnd=-1, subConceptList=()):
 		self.mention = mention
 		self.babelNetID = babelNetID
 		self.type = type
@@ -15,9 +22,9 @@ class BabelNetConcept(object):
 		self.anchorEnd = anchorEnd
 		self.subConceptList = subConceptList
 
-		self.values = [self.mention, self.babelNetID, self.type, self.anchorStart, self.anchorEnd, self.subConceptList]
-		self.fields = ["mention", "babelNetID", "type", "anchorStart", "anchorEnd", "subConceptList"]
-		assert len(self.values)==len(self.fields)
+	@property
+	def values(self):
+		return [self.mention, self.babelNetID, self.type, self.anchorStart, self.anchorEnd, self.subConceptList]
 
 	def isNullConcept(self):
 		return self.babelNetID==c.NULL_BABELNET_ID
@@ -32,3 +39,14 @@ class BabelNetConcept(object):
 			lambda x: x[0] + ":" + x[1], zip(self.fields, map(str,self.values))
 		))
 
+
+@functools.lru_cache(maxsize=conf.NULL_CONCEPT_CACHE_SIZE)
+def get_null_concept(word, anchorStart):
+	"""
+	Returns the null concept of a single word.
+	The null concepts are flyweights: the same object is returned for the same word in the same position.
+	:param word: the word (string)
+	:param anchorStart: the start index in the sentence
+	:return: a BabelNetConcept (a null one)
+	"""
+	return BabelNetConcept(word, c.NULL_BABELNET_ID, c.NULL_TYPE, anchorStart, anchorStart + 1, ())
@@ -1,9 +1,14 @@
+import array
+
+
 class Disambiguation(object):
 	"""
 	This class represent a word disambiguation.
 	 in the field word there is the word to which the disambiguation is related
 	 in the field concept there is a BabelNetConcept object
 	"""
+	__slots__ = ("word", "concept")
+
 	def __init__(self, word, concept):
 		self.word = word
 		self.concept = concept
@@ -12,4 +17,56 @@ class Disambiguation(object):
 		return " ".join([self.word, str(self.concept)])
 
 	def __str__(self):
-		return " ".join([self.word, str(self.concept)])
\ No newline at end of file
+		return " ".join([self.word, str(self.concept)])
+
+
+class DisambiguatedSentence(object):
+	"""
+	This class represent a disambiguated sentence, i.e. a list of Disambiguation objects, one per word.
+	It is stored as a table instead of a list of objects:
+	 in the field words there is the list of words;
+	 in the field concepts there is the list of the distinct concepts of the sentence;
+	 in the field concept_indexes there is an array with the index (in concepts) of the concept of every word.
+	It behaves as a list of Disambiguation objects, which are created only when accessed.
+	"""
+	__slots__ = ("words", "concepts", "concept_indexes")
+
+	def __init__(self, words=None, concepts=None, concept_indexes=None):
+		self.words = words if words is not None else []
+		self.concepts = concepts if concepts is not None else []
+		self.concept_indexes = concept_indexes if concept_indexes is not None else array.array("i")
+
+	def append(self, word, concept, concept_index=None):
+		"""
+		Add a word with its concept.
+		:param concept_index: the index of the concept in self.concepts, if it is already there.
+		"""
+		if concept_index is None:
+			concept_index = len(self.concepts)
+			self.concepts.append(concept)
+		self.words.append(word)
+		self.concept_indexes.append(concept_index)
+
+	def concept(self, i):
+		return self.concepts[self.concept_indexes[i]]
+
+	def __len__(self):
+		return len(self.words)
+
+	def __getitem__(self, i):
+		if isinstance(i, slice):
+			return [Disambiguation(w, self.concepts[ci]) for w, ci in zip(self.words[i], self.concept_indexes[i])]
+		return Disambiguation(self.words[i], self.concepts[self.concept_indexes[i]])
+
+	def __delitem__(self, i):
+		# the concepts which are not referred anymore are left in the table
+		del self.words[i]
+		del self.concept_indexes[i]
+
+	def __iter__(self):
+		concepts = self.concepts
+		for w, ci in zip(self.words, self.concept_indexes):
+			yield Disambiguation(w, concepts[ci])
+
+	def __repr__(self):
+		return repr(list(self))
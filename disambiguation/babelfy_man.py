@@ -1,9 +1,10 @@
+import bisect
 import copy
 
 import configurations as conf
 import constants as c
-from disambiguation.BabelNetConcept import BabelNetConcept
-from disambiguation.Disambiguation import Disambiguation
+from disambiguation.BabelNetConcept import BabelNetConcept, get_null_concept
+from disambiguation.Disambiguation import DisambiguatedSentence
 
 
 def disambiguate_sentences(sentences, annotations):
@@ -16,18 +17,24 @@ def disambiguate_sentences(sentences, annotations):
 	"""
     start_tag_index = 0
     end_tag_index = 0
-    nb_annotations = 0
     disambiguated_sentences = []
 
+    # interval index of the annotations of the page, built once:
+    # the annotations sorted by anchorStart (then by position in the list), and the sorted array of their anchorStart.
+    sorted_annotations = sorted(enumerate(annotations), key=lambda x: (int(x[1].anchorStart), x[0]))
+    sorted_starts = [int(ann.anchorStart) for _, ann in sorted_annotations]
+
     for i, sent in enumerate(sentences):
         end_tag_index = start_tag_index + len(sent)
-        sent_annotations = filter(lambda x:
-                                  int(x.anchorStart) >= start_tag_index and
-                                  int(x.anchorEnd) < end_tag_index,
-                                  annotations[nb_annotations:])
 
-        norm_sent_annotations = list(map(lambda x: _normalize_annotation(x, start_tag_index), sent_annotations))
-        nb_annotations += len(norm_sent_annotations)
+        # the annotations which start in the sentence are found by bisection;
+        # then keep those which also end in the sentence, in their original order.
+        first = bisect.bisect_left(sorted_starts, start_tag_index)
+        last = bisect.bisect_left(sorted_starts, end_tag_index)
+        sent_annotations = sorted(((pos, ann) for pos, ann in sorted_annotations[first:last]
+                                   if int(ann.anchorEnd) < end_tag_index), key=lambda x: x[0])
+
+        norm_sent_annotations = list(map(lambda x: _normalize_annotation(x[1], start_tag_index), sent_annotations))
 
         disamb_sent = disambiguate_sentence(sent, norm_sent_annotations)
 
@@ -43,64 +50,52 @@ def disambiguate_sentence(sentence, sent_annotations):
 	Disambiguate a single sentence.
 	:param sentence: a list of tokens (strings)
 	:param sent_annotations: a list of Annotation objects
-	:return: a list of Disambiguation objects
+	:return: a DisambiguatedSentence, i.e. a list of Disambiguation objects
 	"""
 
-    disambiguation_dict_list = []
-
-    # get a dictionary
-    # from ranges of indexes
-    # to BabelNetConcept that summarize the annotations which fall into that range
-    # 	and merge all of them.
+    # merge the overlapping annotations:
+    # every merged range of indexes gets a BabelNetConcept
+    # that summarizes the annotations which fall into that range.
     #
     # for example:
     # 	consider this words: "public law school"
     # 	consider that the concepts are (independently from the type!): "public law"; "law school"
     # 	the merged concept will be: "public law school", with a new concept ID (stored in configurations.NEW_CONCEPTS)
-    # 	the new variable is similar to the following dict: {(0,3): BabelNetConcept("public law school")}
+    # 	the range (0,3) gets the concept BabelNetConcept("public law school")
     #
     #
     # 	notice however that configurations.NEW_CONCEPTS is not used in any particular way,
-    # 	it is a way to keep track of changes.
+    # 	it is a way to keep track of changes (only the last NEW_CONCEPTS_MAX_SIZE concepts are kept).
     #
-    merged_sent_annotations = _merge_overlapping_concepts(sent_annotations)
+    # The result is the table of the merged concepts of the sentence (one per merged range, in the order of the ranges)
+    # and the index in the table of the concept of every position (None for the words without annotations),
+    # computed with a single sweep over the annotations (see merged_concept_table).
+    concepts, position2concept_index = merged_concept_table(sent_annotations, len(sentence))
+
+    disambiguated_sentence = DisambiguatedSentence(concepts=concepts)
 
     # For each word of the sentence,
-    # map it to a Disambiguation object,
-    # that will be stored in a list at the same index of the word
+    # map it to its concept in the table of the disambiguated sentence.
+    # The words without annotations get a (shared) null concept.
     for i, word in enumerate(sentence):
-
-        range_key = [r for r in merged_sent_annotations if i >= r[0] and i < r[1]]
-
-        assert len(range_key) <= 1
-        if range_key == []:
-            concept = _default_concept(word, i)
+        concept_index = position2concept_index[i]
+        if concept_index is None:
+            disambiguated_sentence.append(word, _default_concept(word, i))
         else:
-            concept = merged_sent_annotations[range_key[0]]
-
-        disambiguation_dict_list.append(
-            Disambiguation(word, concept)
-        )
+            disambiguated_sentence.append(word, concepts[concept_index], concept_index)
 
-    return disambiguation_dict_list
+    return disambiguated_sentence
 
 
 def _default_concept(word, anchorStart):
     """
 	Returns a null concept from a single word.
+	The null concepts are shared (see disambiguation.BabelNetConcept.get_null_concept).
 	:param word: the word (string)
 	:param anchorStart: the start index in the sentence
 	:return: a BabelNetConcept (a null one)
 	"""
-    kargs = {
-        "mention": word,
-        "babelNetID": c.NULL_BABELNET_ID,
-        "type": c.NULL_TYPE,
-        "anchorStart": anchorStart,
-        "anchorEnd": anchorStart + 1,
-        "subConceptList": []
-    }
-    return BabelNetConcept(**kargs)
+    return get_null_concept(word, anchorStart)
 
 
 def _normalize_annotation(annotation, tag_index):
@@ -121,11 +116,86 @@ def _normalize_annotation(annotation, tag_index):
     return copy.copy(norm_annotation)
 
 
+def merged_concept_table(sent_annotations, sentence_length):
+    """
+	Merge the overlapping annotations of a sentence with a single sweep over them, sorted by range:
+	every annotation either extends the current merged range or starts a new one.
+	The result is the same of _merge_overlapping_concepts, as a table.
+	:param sent_annotations: a list of Annotation objects (normalized, see _normalize_annotation)
+	:param sentence_length: the number of words of the sentence
+	:return: a tuple (concepts, position2concept_index), where:
+		- concepts is the list of the BabelNetConcept objects of the merged ranges, in the order of the ranges;
+		- position2concept_index is a list with the index (in concepts) of the concept of every position
+			of the sentence, or None for the positions without annotations.
+	"""
+    # the ranges of the annotations, sorted (then by position in the list)
+    entries = sorted([(ann.anchorStart, ann.anchorEnd, k) for k, ann in enumerate(sent_annotations)])
+
+    # the merged ranges, and the positions (in sent_annotations) of the annotations which fall in each of them
+    merged_ranges = []
+    range_members = []
+    # the empty (or reversed) annotations, which fall in the first range containing them (as in the original procedure)
+    degenerate = []
+    members = None
+    cur_start = cur_end = 0
+    for start, end, k in entries:
+        if members is not None and cur_start <= start < cur_end:
+            if end > cur_end:
+                cur_end = end
+        elif members is not None and (start, end) == (cur_start, cur_end):
+            # an empty range equal to the current one is the same range
+            pass
+        else:
+            if members is not None:
+                merged_ranges.append((cur_start, cur_end))
+                range_members.append(members)
+            cur_start, cur_end, members = start, end, []
+        if end > start:
+            members.append(k)
+        else:
+            degenerate.append(k)
+    if members is not None:
+        merged_ranges.append((cur_start, cur_end))
+        range_members.append(members)
+    for k in degenerate:
+        ann = sent_annotations[k]
+        range_idx = next(idx for idx, r in enumerate(merged_ranges)
+                         if ann.anchorStart >= r[0] and ann.anchorEnd <= r[1])
+        range_members[range_idx].append(k)
+
+    concepts = []
+    position2concept_index = [None] * sentence_length
+    for (range_start, range_end), members in zip(merged_ranges, range_members):
+        # the annotations of a range are kept in their original order
+        members.sort()
+        annotation_list = [sent_annotations[k] for k in members]
+
+        # if only one annotation is as wide as the range (a "dominant" concept),
+        # the concept has its mention and all the annotations in the subConceptList;
+        # otherwise, all the annotations are merged (see _merge_concept_from_annotations)
+        dominant = [ann for ann in annotation_list if ann.anchorStart == range_start and ann.anchorEnd == range_end]
+        if len(dominant) == 1:
+            ann = dominant[0]
+            concept = BabelNetConcept(ann.mention, ann.babelNetID, ann.type, ann.anchorStart, ann.anchorEnd,
+                                      annotation_list)
+        else:
+            concept = _merge_concept_from_annotations(annotation_list)
+
+        # the merged ranges do not overlap
+        lo, hi = max(range_start, 0), min(range_end, sentence_length)
+        if hi > lo:
+            position2concept_index[lo:hi] = [len(concepts)] * (hi - lo)
+        concepts.append(concept)
+    return concepts, position2concept_index
+
+
 def _merge_overlapping_concepts(sent_annotations):
     """
 	From a list of annotation, produce a dictionary
 	from the range of indexes to a BabelNetConcept object
 	which summarize the subconcept in that range.
+	This is the original procedure, replaced by merged_concept_table
+	and kept as a reference for benchmarks.bench_merge_concepts.
 	:param sent_annotations: a list of Annotation object
 	:return: a dictionary
 		from a tuple of indexes (start, end)
@@ -214,26 +284,20 @@ def _merge_concept_from_annotations(annotation_list):
 		- with only one main concept selected (or created) from the annotations
 	"""
     max_end = 0
-    merged_mention = ""
     annotation_list = sorted(annotation_list, key=lambda x: (x.anchorStart, x.anchorEnd))
     min_start = annotation_list[0].anchorStart
 
-    # iterate over all the annotations for merge the mention string.
-    # all this unreadable code compute the mention considering the
-    # overlapping of the mentions.
+    # iterate over all the annotations for merge the mention string:
+    # every annotation which ends after the previous ones adds its words after max_end,
+    # and the pieces are joined once at the end.
+    mention_pieces = []
     for annotation in annotation_list:
         r = (annotation.anchorStart, annotation.anchorEnd)
         if max_end < r[1]:
-            new_start_index = max_end - r[0]
-            new_start_index = new_start_index if new_start_index >= 0 else 0
-            spl_mention = annotation.mention.split()
-            l = spl_mention[new_start_index:]
-            merged_mention += " " + " ".join(spl_mention[new_start_index:])
+            new_start_index = max(max_end - r[0], 0)
+            mention_pieces.append(" ".join(annotation.mention.split()[new_start_index:]))
             max_end = r[1]
-
-    # remove the first character if it is a space
-    if merged_mention[0] == " ":
-        merged_mention = merged_mention[1:]
+    merged_mention = " ".join(mention_pieces)
 
     # create a new concept with the merged mention and a new concept ID
     kargs = {
@@ -247,7 +311,8 @@ def _merge_concept_from_annotations(annotation_list):
 
     new_concept = BabelNetConcept(**kargs)
 
-    # store in the global data structure.
+    # store in the global data structure, evicting the oldest concept (the IDs are consecutive).
     conf.NEW_CONCEPTS[conf.NUM_NEW_CONCEPT] = new_concept
+    conf.NEW_CONCEPTS.pop(conf.NUM_NEW_CONCEPT - conf.NEW_CONCEPTS_MAX_SIZE, None)
     conf.NUM_NEW_CONCEPT += 1
     return new_concept
@@ -1,5 +1,9 @@
 import sys
 
+import configurations as conf
+import utils.checkpoint as ckpt
+import utils.memory as memory
+import utils.profiling as profiling
 import utils.question_answer_generator as qa_gen
 import utils.question_pattern_parser as qa_parser
 import utils.relation_extractor as relext
@@ -7,31 +11,147 @@ import utils.seed_parser as seed_parser
 from utils.misc import log_print
 
 
+# the options accepted from the command line, in the form --name[=value]
+OPTIONS = ["workers", "parse-cache", "resume", "incremental", "pipeline", "profile", "profile-every", "cprofile",
+           "memory-budget", "max-promoted-seeds", "phrase-vectors",
+           "expand-seeds", "page-filter", "sentence-prefilter"]
+
+
 def print_usage():
     print("Usage:")
-    print("main.py <IN_datadir> <IN_relation_seeds_file.tsv> <IN_question_patterns.tsv> <OUT_triples.tsv> <OUT_question_answer_pairs>")
+    print("main.py [--workers=N] [--parse-cache=DIR] [--resume | --incremental[=DB]] [--pipeline] [--profile[=PREFIX] [--profile-every=N] [--cprofile]] [--memory-budget=MB] [--max-promoted-seeds=N] [--phrase-vectors=DIR] [--expand-seeds=CANDIDATES] [--page-filter=DIR] [--sentence-prefilter] <IN_datadir> <IN_relation_seeds_file.tsv> <IN_question_patterns.tsv> <OUT_triples.tsv> <OUT_question_answer_pairs>")
+
+
+def parse_options(argv):
+    """
+    Split the command line arguments into positional arguments and options (in the form --name[=value]).
+    :param argv: the list of command line arguments (without the program name)
+    :return: a tuple (positional_arguments, options), where options is a dict from option name to value
+        (the empty string for options without value).
+    """
+    args, options = [], {}
+    for arg in argv:
+        if arg.startswith("--"):
+            name, _, value = arg[2:].partition("=")
+            options[name] = value
+        else:
+            args.append(arg)
+    return args, options
 
 
 def main():
-    if len(sys.argv) != 6:
+    args, options = parse_options(sys.argv[1:])
+    if len(args) != 5 or any(o not in OPTIONS for o in options):
         print_usage()
         return -1
     # filepath for the directory which contains the corpus
-    DATASET_DIR = sys.argv[1]
+    DATASET_DIR = args[0]
+    num_workers = int(options.get("workers", conf.NUM_WORKERS))
+    if "parse-cache" in options:
+        conf.PARSE_CACHE_DIR = options["parse-cache"]
+    if "sentence-prefilter" in options:
+        # the sentences without any lexical cue of the seeds are not parsed (see utils.sentence_filter)
+        conf.SENTENCE_PREFILTER = True
+    if "phrase-vectors" in options:
+        # the relational phrases are scored against the vectors precomputed by utils.phrase_vectors
+        conf.PHRASE_VECTOR_STORE = options["phrase-vectors"]
+    if "profile" in options:
+        # the report is written to PREFIX.json and PREFIX.csv (see utils.profiling)
+        profile_prefix = options["profile"] or args[3] + ".profile"
+        profiling.configure(profile_prefix, int(options.get("profile-every", 0)),
+                            profile_prefix if "cprofile" in options else None)
+    if "memory-budget" in options or "max-promoted-seeds" in options:
+        # the budget is checked by every process (see utils.memory)
+        memory.configure(float(options["memory-budget"]) if "memory-budget" in options else None,
+                         int(options["max-promoted-seeds"]) if "max-promoted-seeds" in options else None)
 
-    relation_extractors = seed_parser.parse_seed_file(sys.argv[2])
-    relation2patterns = qa_parser.read_question_pattern_file(sys.argv[3])
-    triples_outfile = open(sys.argv[4], "w")
-    questionAnswerGenerator = qa_gen.QuestionAnswerGenerator(sys.argv[5], relation2patterns)
+    relation_extractors = seed_parser.parse_seed_file(args[1])
+    relation2patterns = qa_parser.read_question_pattern_file(args[2])
+    if "pipeline" in options and (num_workers > 1 or "incremental" in options):
+        print_usage()
+        return -1
+    if "expand-seeds" in options:
+        if "incremental" in options:
+            print_usage()
+            return -1
+        # the seeds are expanded before the run, then frozen (see utils.seed_expansion)
+        import utils.seed_expansion as seed_expansion
+        seed_expansion.expand(relation_extractors, seed_expansion.read_candidate_phrases(options["expand-seeds"]))
+    if "page-filter" in options:
+        # the pages which cannot give relation instances are skipped (see utils.page_filter)
+        import utils.page_filter as page_filter
+        conf.PAGE_FILTER_DIR = options["page-filter"]
+        page_filter.check_relations([(r.name, r.current_seeds, r.similarity_threshold) for r in relation_extractors])
+    if "incremental" in options:
+        if "resume" in options or num_workers > 1:
+            print_usage()
+            return -1
+        import utils.incremental as incremental
+        store_path = options["incremental"] or args[3] + incremental.STORE_SUFFIX
+        res = main_incremental(DATASET_DIR, relation_extractors, relation2patterns, store_path, args[3], args[4])
+        profiling.finish()
+        return res
+
+    # the progress of the run is recorded next to the triples file, so that it can be resumed with --resume
+    checkpoint = ckpt.Checkpoint(args[3] + ckpt.MANIFEST_SUFFIX, args)
+    if "resume" in options and checkpoint.load():
+        checkpoint.truncate_outputs()
+        output_mode = "a"
+    else:
+        checkpoint.remove()
+        output_mode = "w"
+    triples_outfile = open(args[3], output_mode)
+    questionAnswerGenerator = qa_gen.QuestionAnswerGenerator(args[4], relation2patterns, mode=output_mode)
+    checkpoint.restore(relation_extractors, questionAnswerGenerator)
+
+    def save_checkpoint(subdir, page_list):
+        checkpoint.save(subdir, page_list, [triples_outfile, questionAnswerGenerator.outfile],
+                        relation_extractors, questionAnswerGenerator)
+
+    def write_triple(i):
+        print(i)
+        print("\t".join([i.left_concept.mention, i.relation_name, i.right_concept.mention]), file=triples_outfile)
+
+    for r in relation_extractors:
+        log_print(r)
+    if "pipeline" in options:
+        # the stages run concurrently, connected by bounded queues (see utils.pipeline)
+        import utils.pipeline as pipeline
+        pipeline.find_relation_pipeline(DATASET_DIR, relation_extractors,
+                                        [("qa", questionAnswerGenerator.sample_instance), ("writer", write_triple)],
+                                        checkpoint.done_subdirs, save_checkpoint)
+    else:
+        for i in relext.find_relation_from_datadir(DATASET_DIR, relation_extractors, num_workers,
+                                                   checkpoint.done_subdirs, save_checkpoint):
+            write_triple(i)
+            questionAnswerGenerator.sample_instance(i)
+
+    questionAnswerGenerator.flush_buffered_instances()
+    profiling.finish()
+    return 0
+
+
+def main_incremental(data_dir, relation_extractors, relation2patterns, store_path, triples_path, qa_path):
+    """
+    Incremental run (see utils.incremental): analyze only the pages and the relations which changed
+    since the last run, then write the output files again from all the triples in the store.
+    """
+    import utils.incremental as incremental
+    store = incremental.IncrementalStore(store_path)
     for r in relation_extractors:
         log_print(r)
-    for i in relext.find_relation_from_datadir(DATASET_DIR, relation_extractors):
+    for i in incremental.update_store(data_dir, relation_extractors, store):
         print(i)
-        print("\t".join([i.left_concept.mention, i.relation_name, i.right_concept.mention]), file=triples_outfile)
 
+    triples_outfile = open(triples_path, "w")
+    questionAnswerGenerator = qa_gen.QuestionAnswerGenerator(qa_path, relation2patterns)
+    for i in store.iter_triples():
+        print("\t".join([i.left_concept.mention, i.relation_name, i.right_concept.mention]), file=triples_outfile)
         questionAnswerGenerator.sample_instance(i)
 
     questionAnswerGenerator.flush_buffered_instances()
+    triples_outfile.close()
+    store.close()
     return 0
 
 
@@ -0,0 +1,316 @@
+"""
+A store of the candidate triples of the corpus, decoupled from the relation matching.
+The expensive stage (parsing, syntactic-semantic graphs and path search) is run only once, by "extract",
+which writes every candidate triple (left concept, relational phrase, right concept, source sentence)
+to a SQLite database; then "match" applies a seed file to the stored candidates, without parsing the corpus.
+The candidates are stored in the order they are found, so they can be matched in the same order of a normal run.
+To keep the store compact, the concepts, the relational phrases and the page names are stored only once;
+the candidate triples refer to them (and to their source sentence) by id.
+
+The relational phrases are also an inverted index of the candidates: every distinct (normalized) phrase
+has its frequency, and the candidates are indexed by phrase. Since the frequency of the phrases is very skewed,
+"match" decides the compliance of every distinct phrase only once, then applies the decision to all its candidates
+(see match); with --in-order, the candidates are matched one by one, exactly as in a normal run (see match_in_order).
+
+Usage:
+	python -m utils.candidate_store extract <IN_datadir> <OUT_candidates.sqlite>
+	python -m utils.candidate_store match [--in-order] [--phrase-vectors=DIR] [--expand-seeds] <IN_candidates.sqlite> <IN_relation_seeds_file.tsv> <IN_question_patterns.tsv> <OUT_triples.tsv> <OUT_question_answer_pairs>
+	python -m utils.candidate_store phrases <IN_candidates.sqlite> [num_phrases]
+"""
+import datetime
+import os
+import sqlite3
+import sys
+
+import configurations as conf
+import utils.corpus_index as corpus_index
+import utils.dependency_parser as dep_parser
+import utils.question_answer_generator as qa_gen
+import utils.question_pattern_parser as qa_parser
+import utils.relation_extractor as relext
+import utils.seed_parser as seed_parser
+from disambiguation.BabelNetConcept import BabelNetConcept
+from utils.misc import log_print, LRUCache
+from utils.seeds import as_relation_classifier
+
+SCHEMA = """
+CREATE TABLE pages (
+	id INTEGER PRIMARY KEY,
+	name TEXT
+);
+CREATE TABLE concepts (
+	id INTEGER PRIMARY KEY,
+	mention TEXT,
+	babelNetID,
+	type TEXT
+);
+CREATE TABLE phrases (
+	id INTEGER PRIMARY KEY,
+	phrase TEXT UNIQUE,
+	frequency INTEGER DEFAULT 0
+);
+CREATE TABLE sources (
+	id INTEGER PRIMARY KEY,
+	text TEXT
+);
+CREATE TABLE candidates (
+	id INTEGER PRIMARY KEY,
+	page INTEGER,
+	left_concept INTEGER,
+	phrase INTEGER,
+	right_concept INTEGER,
+	source INTEGER
+);
+"""
+# the inverted index from the relational phrases to the candidates, built when the extraction is complete
+INDEX_SCHEMA = """
+CREATE INDEX IF NOT EXISTS candidates_phrase ON candidates (phrase);
+"""
+
+# number of source sentences remembered while writing (the candidates of a sentence are consecutive)
+SOURCE_CACHE_SIZE = 1024
+
+
+class CandidateStore(object):
+	"""
+	The SQLite store of the candidate triples.
+	"""
+
+	def __init__(self, db_path, create=False):
+		"""
+		:param db_path: the path to the database
+		:param create: if True, a new (empty) store is created, replacing the existing one;
+			otherwise the store must exist
+		"""
+		if create and os.path.isfile(db_path):
+			os.remove(db_path)
+		if not create and not os.path.isfile(db_path):
+			raise Exception("The candidate store " + db_path + " does not exist")
+		self.db = sqlite3.connect(db_path)
+		if create:
+			self.db.executescript(SCHEMA)
+
+		# the ids of the concepts and of the phrases already written, and of the last page and sources
+		self.concept_ids = {}
+		self.phrase_ids = {}
+		# the frequencies of the phrases not yet written
+		self.pending_frequencies = {}
+		self.source_ids = LRUCache(SOURCE_CACHE_SIZE)
+		self.last_page = (None, None)
+
+	def close(self):
+		self.db.close()
+
+	def commit(self):
+		self.db.executemany("UPDATE phrases SET frequency = frequency + ? WHERE id = ?",
+							[(frequency, phrase_id) for phrase_id, frequency in self.pending_frequencies.items()])
+		self.pending_frequencies = {}
+		self.db.commit()
+
+	def build_index(self):
+		"""
+		Index the candidates by relational phrase, and commit.
+		"""
+		self.commit()
+		self.db.executescript(INDEX_SCHEMA)
+		self.db.commit()
+
+	def add(self, page_name, candidate):
+		"""
+		Append a candidate triple to the store.
+		:param page_name: the name of the page of the candidate
+		:param candidate: a relation_extractor.CandidateTriple
+		"""
+		if self.last_page[0] != page_name:
+			self.last_page = (page_name, self.db.execute("INSERT INTO pages (name) VALUES (?)",
+														 (str(page_name),)).lastrowid)
+		source_id = self.source_ids.get(candidate.source)
+		if source_id is None:
+			source_id = self.db.execute("INSERT INTO sources (text) VALUES (?)", (candidate.source,)).lastrowid
+			self.source_ids[candidate.source] = source_id
+		phrase = normalize_phrase(candidate.relational_phrase)
+		phrase_id = self.phrase_ids.get(phrase)
+		if phrase_id is None:
+			phrase_id = self.db.execute("INSERT INTO phrases (phrase) VALUES (?)", (phrase,)).lastrowid
+			self.phrase_ids[phrase] = phrase_id
+		self.pending_frequencies[phrase_id] = self.pending_frequencies.get(phrase_id, 0) + 1
+
+		self.db.execute("INSERT INTO candidates (page, left_concept, phrase, right_concept, source) "
+						"VALUES (?, ?, ?, ?, ?)",
+						(self.last_page[1], self._concept_id(candidate.left_concept), phrase_id,
+						 self._concept_id(candidate.right_concept), source_id))
+
+	def _concept_id(self, concept):
+		key = (concept.mention, concept.babelNetID, concept.type)
+		concept_id = self.concept_ids.get(key)
+		if concept_id is None:
+			concept_id = self.db.execute("INSERT INTO concepts (mention, babelNetID, type) VALUES (?, ?, ?)",
+										 key).lastrowid
+			self.concept_ids[key] = concept_id
+		return concept_id
+
+	def iter_phrases(self):
+		"""
+		:return: yield tuples (phrase_id, phrase, frequency), in the order of their first occurrence
+		"""
+		return self.db.execute("SELECT id, phrase, frequency FROM phrases ORDER BY id")
+
+	def iter_candidates(self, phrase_ids=None):
+		"""
+		:param phrase_ids: if not None, only the candidates with these relational phrases (found through the index)
+		:return: yield tuples (page_name, CandidateTriple), in the order they have been added
+		"""
+		selected = ""
+		if phrase_ids is not None:
+			self.db.executescript(INDEX_SCHEMA)
+			self.db.execute("CREATE TEMP TABLE IF NOT EXISTS selected_phrases (id INTEGER PRIMARY KEY)")
+			self.db.execute("DELETE FROM selected_phrases")
+			self.db.executemany("INSERT INTO selected_phrases VALUES (?)", [(i,) for i in phrase_ids])
+			selected = "WHERE c.phrase IN (SELECT id FROM selected_phrases) "
+		for row in self.db.execute("SELECT p.name, l.mention, l.babelNetID, l.type, ph.phrase, "
+								   "r.mention, r.babelNetID, r.type, s.text "
+								   "FROM candidates c "
+								   "JOIN pages p ON c.page = p.id "
+								   "JOIN concepts l ON c.left_concept = l.id "
+								   "JOIN phrases ph ON c.phrase = ph.id "
+								   "JOIN concepts r ON c.right_concept = r.id "
+								   "JOIN sources s ON c.source = s.id " +
+								   selected +
+								   "ORDER BY c.id"):
+			page_name, left_mention, left_bid, left_type, phrase, right_mention, right_bid, right_type, source = row
+			yield page_name, relext.CandidateTriple(BabelNetConcept(left_mention, left_bid, left_type), phrase,
+													BabelNetConcept(right_mention, right_bid, right_type), source)
+
+
+def extract(data_dir, store):
+	"""
+	Extract the candidate triples of the whole dataset and write them to the store.
+	:param data_dir: the path to the dataset directory, or to a corpus index built with utils.corpus_index
+	:param store: a new CandidateStore
+	"""
+	corpus = corpus_index.open_corpus(data_dir)
+	parser = dep_parser.get_sentence_parser()
+	for subdir, page_list in corpus.get_docs_list_by_subdir():
+		start_subdir = datetime.datetime.now()
+		log_print(start_subdir, "Extracting candidates from subdir %03d" % subdir)
+		for page_name, candidate in relext.extract_candidates_from_pages(relext._load_pages(corpus, page_list), parser):
+			store.add(page_name, candidate)
+		store.commit()
+		log_print(datetime.datetime.now(), "Total Time elapsed: ", datetime.datetime.now() - start_subdir)
+	store.build_index()
+
+
+def normalize_phrase(relational_phrase):
+	"""
+	The key of a relational phrase in the inverted index: the words separated by single spaces.
+	The case is kept, since the word vectors (and so the similarity with the seeds) depend on it.
+	"""
+	return " ".join(relational_phrase.split())
+
+
+def match(store, relation_extractors):
+	"""
+	Apply the relations to the candidate triples of the store, through the inverted index of the relational phrases.
+	The compliance of every distinct phrase is decided only once, visiting the phrases in the order
+	of their first occurrence; then the relation instances of all the candidates with a compliant phrase
+	are yielded, in the order of the candidates.
+	Notice that the decision on a phrase is final: in a normal run (see match_in_order) a phrase rejected at its
+	first occurrence can still be accepted at a later one, if meanwhile a similar seed has been promoted.
+	:param store: a CandidateStore
+	:param relation_extractors: a list of RelationExtractor objects
+	:return: yield RelationExtraction objects
+	"""
+	relation_classifier = as_relation_classifier(relation_extractors)
+	# a dictionary from a compliant phrase to the names of its relations
+	compliant_phrases = {}
+	compliant_phrase_ids = []
+	num_phrases = 0
+	num_candidates = 0
+	for phrase_id, phrase, frequency in list(store.iter_phrases()):
+		num_phrases += 1
+		num_candidates += frequency
+		compliant_extractors = relation_classifier.compliant_extractors(phrase)
+		if len(compliant_extractors) > 0:
+			compliant_phrases[phrase] = [r.name for r in compliant_extractors]
+			compliant_phrase_ids.append(phrase_id)
+	log_print("%d distinct relational phrases (%d candidates), %d compliant"
+			  % (num_phrases, num_candidates, len(compliant_phrases)))
+
+	for _, candidate in store.iter_candidates(compliant_phrase_ids):
+		for relation_name in compliant_phrases[candidate.relational_phrase]:
+			yield relext.RelationExtraction(relation_name, candidate.left_concept, candidate.right_concept,
+											candidate.source)
+
+
+def match_in_order(store, relation_extractors):
+	"""
+	Apply the relations to the candidate triples of the store, one by one, in the order they have been found:
+	the result is the same of a normal run on the same corpus.
+	:param store: a CandidateStore
+	:param relation_extractors: a list of RelationExtractor objects
+	:return: yield RelationExtraction objects
+	"""
+	candidates = (candidate for _, candidate in store.iter_candidates())
+	for inst in relext.match_candidates(candidates, relation_extractors):
+		yield inst
+
+
+def print_usage():
+	print("Usage:")
+	print("python -m utils.candidate_store extract <IN_datadir> <OUT_candidates.sqlite>")
+	print("python -m utils.candidate_store match [--in-order] [--phrase-vectors=DIR] [--expand-seeds] "
+		  "<IN_candidates.sqlite> <IN_relation_seeds_file.tsv> <IN_question_patterns.tsv> <OUT_triples.tsv> <OUT_question_answer_pairs>")
+	print("python -m utils.candidate_store phrases <IN_candidates.sqlite> [num_phrases]")
+
+
+def main():
+	if len(sys.argv) == 4 and sys.argv[1] == "extract":
+		store = CandidateStore(sys.argv[3], create=True)
+		extract(sys.argv[2], store)
+		store.close()
+		return 0
+
+	in_order = "--in-order" in sys.argv
+	expand_seeds = "--expand-seeds" in sys.argv
+	for arg in sys.argv:
+		if arg.startswith("--phrase-vectors="):
+			# the phrases are scored against the vectors precomputed by utils.phrase_vectors, without the spaCy model
+			conf.PHRASE_VECTOR_STORE = arg[len("--phrase-vectors="):]
+	args = [arg for arg in sys.argv if arg not in ["--in-order", "--expand-seeds"]
+			and not arg.startswith("--phrase-vectors=")]
+	if len(args) == 7 and args[1] == "match":
+		store = CandidateStore(args[2])
+		relation_extractors = seed_parser.parse_seed_file(args[3])
+		if expand_seeds:
+			# the seeds are expanded over the phrases of the store, then frozen (see utils.seed_expansion)
+			import utils.seed_expansion as seed_expansion
+			seed_expansion.expand(relation_extractors, [(phrase, frequency) for _, phrase, frequency
+														in store.iter_phrases()])
+		relation2patterns = qa_parser.read_question_pattern_file(args[4])
+		triples_outfile = open(args[5], "w")
+		questionAnswerGenerator = qa_gen.QuestionAnswerGenerator(args[6], relation2patterns)
+		for r in relation_extractors:
+			log_print(r)
+		for i in (match_in_order if in_order else match)(store, relation_extractors):
+			print("\t".join([i.left_concept.mention, i.relation_name, i.right_concept.mention]), file=triples_outfile)
+			questionAnswerGenerator.sample_instance(i)
+		questionAnswerGenerator.flush_buffered_instances()
+		triples_outfile.close()
+		store.close()
+		return 0
+
+	if len(sys.argv) in [3, 4] and sys.argv[1] == "phrases":
+		store = CandidateStore(sys.argv[2])
+		num_phrases = int(sys.argv[3]) if len(sys.argv) == 4 else 100
+		for phrase, frequency in store.db.execute("SELECT phrase, frequency FROM phrases "
+												  "ORDER BY frequency DESC LIMIT ?", (num_phrases,)):
+			print("%d\t%s" % (frequency, phrase))
+		store.close()
+		return 0
+
+	print_usage()
+	return -1
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,157 @@
+"""
+Checkpoints of a run over the whole dataset (see main.py), so that an interrupted run can be resumed.
+The checkpoint is a JSON manifest, written every time a subdirectory has been analyzed, which records:
+	- the analyzed subdirectories, with the number of their pages;
+	- the size of every output file (triples and Q/A pairs) at that moment;
+	- the seeds promoted by every RelationExtractor, with their similarity handicaps;
+	- the buffers of the QuestionAnswerGenerator, i.e. the relation instances not yet turned into Q/A pairs;
+	- the counter of the merged concepts (configurations.NUM_NEW_CONCEPT).
+When a run is resumed, the output files are truncated to the recorded sizes and opened in append mode:
+the triples and the Q/A pairs written after the last checkpoint are discarded, and their subdirectory is analyzed again.
+"""
+import json
+import os
+
+import configurations as conf
+from disambiguation.BabelNetConcept import BabelNetConcept
+from utils.misc import log_print
+from utils.relation_extractor import RelationExtraction
+
+CHECKPOINT_VERSION = 1
+# the manifest of a run is stored next to its triples file
+MANIFEST_SUFFIX = ".checkpoint.json"
+
+
+class Checkpoint(object):
+	"""
+	The progress of a run. A checkpoint can be resumed only by a run with the same inputs.
+	"""
+
+	def __init__(self, manifest_path, inputs):
+		"""
+		:param manifest_path: the path to the JSON manifest
+		:param inputs: a list of strings which identifies the run (e.g. the paths to its input and output files)
+		"""
+		self.manifest_path = manifest_path
+		self.inputs = list(inputs)
+		# a dictionary from subdir to the number of its pages
+		self.done_subdirs = {}
+		# a dictionary from the path of an output file to its size
+		self.output_sizes = {}
+		# a dictionary from relation_name to the list of its promoted seeds (see RelationExtractor.get_promoted_seeds)
+		self.promoted_seeds = {}
+		# a dictionary from relation_name to a tuple (number_of_instances, list of buffered relation instances)
+		self.question_answer_buffers = {}
+		self.num_new_concepts = 0
+
+	def load(self):
+		"""
+		Read the manifest of an interrupted run.
+		:return: False if there is no manifest, True otherwise.
+		"""
+		if not os.path.isfile(self.manifest_path):
+			return False
+		with open(self.manifest_path) as f:
+			manifest = json.load(f)
+		if manifest.get("version") != CHECKPOINT_VERSION:
+			raise Exception("Unknown checkpoint version in " + self.manifest_path)
+		if manifest["inputs"] != self.inputs:
+			raise Exception("The checkpoint " + self.manifest_path + " belongs to a run with different inputs: " +
+							" ".join(manifest["inputs"]))
+		self.done_subdirs = dict((int(subdir), num_pages) for subdir, num_pages in manifest["done_subdirs"].items())
+		self.output_sizes = manifest["output_sizes"]
+		self.promoted_seeds = dict((name, [tuple(s) for s in seeds]) for name, seeds in manifest["promoted_seeds"].items())
+		self.question_answer_buffers = dict((name, (number_of_instances, [_decode_instance(i) for i in instances]))
+											for name, (number_of_instances, instances)
+											in manifest["question_answer_buffers"].items())
+		self.num_new_concepts = manifest["num_new_concepts"]
+		log_print("Resuming from %s: %d subdirs already analyzed" % (self.manifest_path, len(self.done_subdirs)))
+		return True
+
+	def truncate_outputs(self):
+		"""
+		Discard what has been written in the output files after the checkpoint.
+		"""
+		for path, size in self.output_sizes.items():
+			if not os.path.isfile(path) or os.path.getsize(path) < size:
+				raise Exception("The output file " + path + " is shorter than recorded in " + self.manifest_path)
+			os.truncate(path, size)
+
+	def restore(self, relation_extractors, question_answer_generator):
+		"""
+		Bring the RelationExtractor objects and the QuestionAnswerGenerator back to the state of the checkpoint.
+		:param relation_extractors: a list of RelationExtractor objects, with only their initial seeds
+		:param question_answer_generator: a QuestionAnswerGenerator, with empty buffers
+		"""
+		for r in relation_extractors:
+			r.restore_promoted_seeds(self.promoted_seeds.get(r.name, []))
+		for relation_name, (number_of_instances, instances) in self.question_answer_buffers.items():
+			question_answer_generator.number_of_instances[relation_name] = number_of_instances
+			question_answer_generator.sampled_instances[relation_name] = instances
+		conf.NUM_NEW_CONCEPT = self.num_new_concepts
+
+	def save(self, subdir, page_list, output_files, relation_extractors, question_answer_generator):
+		"""
+		Record that a subdirectory has been analyzed, together with the current state of the run.
+		It must be called when all the relation instances of the subdirectory have been written.
+		:param subdir: the subdirectory
+		:param page_list: the list of its pages
+		:param output_files: the list of the (open) output files
+		:param relation_extractors: a list of RelationExtractor objects
+		:param question_answer_generator: the QuestionAnswerGenerator
+		"""
+		self.done_subdirs[subdir] = len(page_list)
+		for f in output_files:
+			f.flush()
+			os.fsync(f.fileno())
+			self.output_sizes[f.name] = os.path.getsize(f.name)
+		self.promoted_seeds = dict((r.name, r.get_promoted_seeds()) for r in relation_extractors)
+		self.question_answer_buffers = dict((name, (question_answer_generator.number_of_instances[name], instances))
+											for name, instances in question_answer_generator.sampled_instances.items())
+		self.num_new_concepts = conf.NUM_NEW_CONCEPT
+
+		manifest = {
+			"version": CHECKPOINT_VERSION,
+			"inputs": self.inputs,
+			"done_subdirs": dict((str(subdir), num_pages) for subdir, num_pages in self.done_subdirs.items()),
+			"output_sizes": self.output_sizes,
+			"promoted_seeds": self.promoted_seeds,
+			"question_answer_buffers": dict((name, (number_of_instances, [_encode_instance(i) for i in instances]))
+											for name, (number_of_instances, instances)
+											in self.question_answer_buffers.items()),
+			"num_new_concepts": self.num_new_concepts,
+		}
+		# write to a temporary file first, so that a crash never leaves a truncated manifest
+		with open(self.manifest_path + ".tmp", "w") as f:
+			json.dump(manifest, f)
+		os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+	def remove(self):
+		"""
+		Delete the manifest (e.g. when a new run starts from scratch).
+		"""
+		if os.path.isfile(self.manifest_path):
+			os.remove(self.manifest_path)
+
+
+def _encode_instance(relation_instance):
+	"""
+	:return: the fields of a RelationExtraction object used by the QuestionAnswerGenerator, as a JSON-serializable list
+	"""
+	return [relation_instance.relation_name,
+			_encode_concept(relation_instance.left_concept),
+			_encode_concept(relation_instance.right_concept),
+			relation_instance.source]
+
+
+def _decode_instance(fields):
+	relation_name, left_concept, right_concept, source = fields
+	return RelationExtraction(relation_name, _decode_concept(left_concept), _decode_concept(right_concept), source)
+
+
+def _encode_concept(concept):
+	return [concept.mention, concept.babelNetID, concept.type, concept.anchorStart, concept.anchorEnd]
+
+
+def _decode_concept(fields):
+	return BabelNetConcept(*fields)
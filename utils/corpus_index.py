@@ -0,0 +1,360 @@
+"""
+A binary, columnar pre-index of the babelfied corpus.
+It is built only once from the dataset directory (see build_corpus_index),
+then it can be used instead of the dataset directory (see open_corpus):
+the columns are memory-mapped, so a page is read from its offsets, without decompressing or parsing XML.
+
+The index directory contains:
+	- meta.json: the parameters of the index and the length of every column;
+	- strings.bin and string_offsets.bin: the interned strings (tokens, mentions, BabelNet IDs and page names),
+	  concatenated in UTF-8, and the offset of every string in strings.bin (plus the end of the last one);
+	  a string is decoded only when it is looked up, so the processes do not load the whole table;
+	- one binary file per column (fixed-width little-endian values), see PAGE_COLUMNS and ANNOTATION_COLUMNS;
+	- sentence_offsets.bin: the offset in tokens.bin of the first token of every sentence (plus the end of the last one);
+	- tokens.bin: the ids of the tokens of all the sentences.
+The meta.json file is written last, so an index is complete only if it exists.
+
+Usage:
+	python -m utils.corpus_index <IN_datadir> <OUT_index_dir>
+"""
+import array
+import json
+import os
+import sys
+
+import numpy as np
+
+import configurations as conf
+import utils.file_manager as fman
+from utils.misc import LRUCache, log_print
+
+INDEX_FORMAT = "babelfied-corpus-index"
+INDEX_VERSION = 2
+META_FILENAME = "meta.json"
+
+# (column name, numpy dtype, array typecode used while building)
+PAGE_COLUMNS = [
+	("pages.subdir", "<i4", "i"),
+	("pages.name", "<u4", "I"),
+	("pages.first_sentence", "<i8", "q"),
+	("pages.num_sentences", "<i4", "i"),
+	("pages.first_annotation", "<i8", "q"),
+	("pages.num_annotations", "<i4", "i"),
+]
+ANNOTATION_COLUMNS = [
+	("annotations.babelNetID", "<u4", "I"),
+	("annotations.mention", "<u4", "I"),
+	("annotations.anchorStart", "<i4", "i"),
+	("annotations.anchorEnd", "<i4", "i"),
+	("annotations.type", "<u1", "B"),
+]
+TEXT_COLUMNS = [
+	("sentence_offsets", "<i8", "q"),
+	("tokens", "<u4", "I"),
+]
+STRING_COLUMNS = [
+	("string_offsets", "<i8", "q"),
+	("strings", "<u1", "B"),
+]
+COLUMNS = PAGE_COLUMNS + ANNOTATION_COLUMNS + TEXT_COLUMNS + STRING_COLUMNS
+
+# number of values buffered in memory for every column, while building the index
+BUFFER_SIZE = 1 << 20
+
+
+def is_corpus_index(path):
+	return os.path.isfile(os.path.join(path, META_FILENAME))
+
+
+def open_corpus(path, num_of_sentences=conf.NUM_FIRST_WIKI_SENTENCES, streaming=conf.STREAMING_XML_READER,
+				filtered=True):
+	"""
+	Open a corpus, either a dataset directory or a pre-built index.
+	:param path: the path to the dataset directory or to the index directory
+	:param num_of_sentences: the number of first sentences read from every page
+	:param streaming: how the XML files are read (see file_manager.read_page)
+	:param filtered: if True and configurations.PAGE_FILTER_DIR is set, skip the pages
+		which cannot give relation instances (see utils.page_filter)
+	:return: a CorpusIndex or a file_manager.XmlCorpus object (or a page_filter.FilteredCorpus around it)
+	"""
+	if is_corpus_index(path):
+		corpus = CorpusIndex(path, num_of_sentences)
+	else:
+		corpus = fman.XmlCorpus(path, num_of_sentences, streaming)
+	if filtered and conf.PAGE_FILTER_DIR is not None:
+		from utils.page_filter import FilteredCorpus, PageFilter
+		corpus = FilteredCorpus(corpus, PageFilter(conf.PAGE_FILTER_DIR))
+	return corpus
+
+
+def build_corpus_index(data_dir, index_dir, num_of_sentences=conf.NUM_FIRST_WIKI_SENTENCES,
+					   string_cache_size=conf.CORPUS_INDEX_STRING_CACHE_SIZE):
+	"""
+	Read the whole dataset directory and write the index.
+	Only the first num_of_sentences sentences of every page, and the annotations relative to them, are indexed.
+	:param data_dir: the path to the dataset directory
+	:param index_dir: the path to the (new) index directory
+	:param num_of_sentences: the number of first sentences indexed for every page (-1 for all of them)
+	:param string_cache_size: the number of strings remembered to intern them (see _StringWriter)
+	"""
+	if not os.path.isdir(index_dir):
+		os.makedirs(index_dir)
+	if is_corpus_index(index_dir):
+		os.remove(os.path.join(index_dir, META_FILENAME))
+
+	annotation_types = {}
+	columns = dict((name, _ColumnWriter(index_dir, name, typecode)) for name, _, typecode in COLUMNS)
+	strings = _StringWriter(columns, string_cache_size)
+	intern = strings.intern
+
+	num_sentences = 0
+	num_tokens = 0
+	num_annotations = 0
+	columns["sentence_offsets"].append(0)
+	for subdir, xml_path_list in fman.get_docs_list_by_subdir(data_dir):
+		log_print("Indexing subdir %03d" % subdir)
+		for xml_path in xml_path_list:
+			try:
+				sentences, annotations = fman.read_page(xml_path, num_of_sentences)
+				# the values of the annotations are converted before writing anything of the page,
+				# so a page with an empty element (e.g. <mention/>, whose text is None) is skipped as a whole
+				annotation_values = [(intern(ann.babelNetID), intern(ann.mention),
+									  int(ann.anchorStart), int(ann.anchorEnd), ann.type) for ann in annotations]
+			except Exception as e:
+				log_print("Problem with " + xml_path)
+				continue
+
+			columns["pages.subdir"].append(subdir)
+			# the page names are unique: they are not interned
+			columns["pages.name"].append(strings.append(os.path.relpath(xml_path, data_dir)))
+			columns["pages.first_sentence"].append(num_sentences)
+			columns["pages.num_sentences"].append(len(sentences))
+			columns["pages.first_annotation"].append(num_annotations)
+			columns["pages.num_annotations"].append(len(annotations))
+
+			for sent in sentences:
+				for word in sent:
+					columns["tokens"].append(intern(word))
+				num_tokens += len(sent)
+				num_sentences += 1
+				columns["sentence_offsets"].append(num_tokens)
+
+			for babelNetID, mention, anchorStart, anchorEnd, type in annotation_values:
+				if type not in annotation_types:
+					annotation_types[type] = len(annotation_types)
+				columns["annotations.babelNetID"].append(babelNetID)
+				columns["annotations.mention"].append(mention)
+				columns["annotations.anchorStart"].append(anchorStart)
+				columns["annotations.anchorEnd"].append(anchorEnd)
+				columns["annotations.type"].append(annotation_types[type])
+			num_annotations += len(annotations)
+
+	for column in columns.values():
+		column.close()
+
+	meta = {
+		"format": INDEX_FORMAT,
+		"version": INDEX_VERSION,
+		"num_of_sentences": num_of_sentences,
+		"annotation_types": sorted(annotation_types, key=annotation_types.get),
+		"columns": dict((name, columns[name].length) for name, _, _ in COLUMNS),
+	}
+	with open(os.path.join(index_dir, META_FILENAME), "w") as f:
+		json.dump(meta, f, indent=1)
+
+
+class _ColumnWriter(object):
+	"""
+	Append fixed-width values to a column file, through a buffer.
+	"""
+	def __init__(self, index_dir, name, typecode):
+		self.file = open(os.path.join(index_dir, name + ".bin"), "wb")
+		self.typecode = typecode
+		self.buffer = array.array(typecode)
+		self.length = 0
+
+	def append(self, value):
+		self.buffer.append(value)
+		self.length += 1
+		if len(self.buffer) >= BUFFER_SIZE:
+			self.flush()
+
+	def extend(self, values):
+		self.buffer.extend(values)
+		self.length += len(values)
+		if len(self.buffer) >= BUFFER_SIZE:
+			self.flush()
+
+	def flush(self):
+		if sys.byteorder != "little":
+			self.buffer.byteswap()
+		self.buffer.tofile(self.file)
+		self.buffer = array.array(self.typecode)
+
+	def close(self):
+		self.flush()
+		self.file.close()
+
+
+class _StringWriter(object):
+	"""
+	Write the strings to the strings and string_offsets columns, as soon as they are interned.
+	Only the cache_size most recently used strings are remembered: a string evicted from the cache
+	is written again, with a new id. The table can then contain some duplicates, which are harmless
+	(the ids are only decoded), but the memory used while building is bounded.
+	"""
+	def __init__(self, columns, cache_size):
+		self.blob = columns["strings"]
+		self.offsets = columns["string_offsets"]
+		self.ids = LRUCache(cache_size)
+		self.offsets.append(0)
+
+	def intern(self, string):
+		"""
+		:return: the id of the string
+		"""
+		string_id = self.ids.get(string)
+		if string_id is None:
+			string_id = self.append(string)
+			self.ids[string] = string_id
+		return string_id
+
+	def append(self, string):
+		"""
+		Write a string without interning it.
+		:return: the id of the string
+		"""
+		self.blob.extend(string.encode("utf-8"))
+		self.offsets.append(self.blob.length)
+		return self.offsets.length - 2
+
+
+class _StringTable(object):
+	"""
+	The strings of an index, decoded from the memory-mapped columns only when they are looked up.
+	"""
+	def __init__(self, offsets, blob):
+		self.offsets = offsets
+		self.blob = blob
+
+	def __len__(self):
+		return len(self.offsets) - 1
+
+	def __getitem__(self, string_id):
+		return self.blob[int(self.offsets[string_id]):int(self.offsets[string_id + 1])].tobytes().decode("utf-8")
+
+
+class CorpusIndex(object):
+	"""
+	Read-only access to an index built by build_corpus_index.
+	It has the same interface of file_manager.XmlCorpus: the pages are identified by their position in the index.
+	The object can be sent to other processes: the columns are memory-mapped again in the new process.
+	"""
+
+	def __init__(self, index_dir, num_of_sentences=conf.NUM_FIRST_WIKI_SENTENCES):
+		"""
+		:param index_dir: the path to the index directory
+		:param num_of_sentences: the number of first sentences read from every page;
+			it cannot be greater than the number of sentences indexed.
+		"""
+		self.index_dir = index_dir
+		self.num_of_sentences = num_of_sentences
+		with open(os.path.join(index_dir, META_FILENAME)) as f:
+			self.meta = json.load(f)
+		if self.meta.get("format") != INDEX_FORMAT or self.meta.get("version") != INDEX_VERSION:
+			raise Exception("Unknown corpus index format in " + index_dir)
+		indexed_sentences = self.meta["num_of_sentences"]
+		if indexed_sentences != -1 and (num_of_sentences == -1 or num_of_sentences > indexed_sentences):
+			raise Exception("The corpus index in %s contains only the first %d sentences of every page"
+							% (index_dir, indexed_sentences))
+		self._open()
+
+	def _open(self):
+		self.columns = {}
+		for name, dtype, _ in COLUMNS:
+			length = self.meta["columns"][name]
+			if length == 0:
+				self.columns[name] = np.zeros(0, dtype=dtype)
+			else:
+				self.columns[name] = np.memmap(os.path.join(self.index_dir, name + ".bin"),
+											   dtype=dtype, mode="r", shape=(length,))
+		self.strings = _StringTable(self.columns["string_offsets"], self.columns["strings"])
+		self.annotation_types = self.meta["annotation_types"]
+
+	def __getstate__(self):
+		return {"index_dir": self.index_dir, "num_of_sentences": self.num_of_sentences, "meta": self.meta}
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self._open()
+
+	def __len__(self):
+		return len(self.columns["pages.subdir"])
+
+	def get_docs_list_by_subdir(self):
+		"""
+		Same as file_manager.get_docs_list_by_subdir.
+		:return: yield tuples (current_subdir, list_of_page_ids)
+		"""
+		subdirs = self.columns["pages.subdir"]
+		if len(subdirs) == 0:
+			return
+		# the pages are stored subdir by subdir: find where the subdir changes
+		boundaries = [0] + (np.flatnonzero(subdirs[1:] != subdirs[:-1]) + 1).tolist() + [len(subdirs)]
+		for start, end in zip(boundaries[:-1], boundaries[1:]):
+			yield int(subdirs[start]), list(range(start, end))
+
+	def page_name(self, page_id):
+		return self.strings[self.columns["pages.name"][page_id]]
+
+	def read_page(self, page_id):
+		"""
+		Same as file_manager.read_page.
+		:param page_id: the position of the page in the index
+		:return: a tuple (sentences, annotations)
+		"""
+		strings = self.strings
+		first_sentence = int(self.columns["pages.first_sentence"][page_id])
+		num_sentences = int(self.columns["pages.num_sentences"][page_id])
+		if self.num_of_sentences != -1:
+			num_sentences = min(num_sentences, self.num_of_sentences)
+
+		offsets = self.columns["sentence_offsets"][first_sentence:first_sentence + num_sentences + 1].tolist()
+		tokens = self.columns["tokens"][offsets[0]:offsets[-1]].tolist()
+		sentences = [[strings[t] for t in tokens[start - offsets[0]:end - offsets[0]]]
+					 for start, end in zip(offsets[:-1], offsets[1:])]
+
+		first_annotation = int(self.columns["pages.first_annotation"][page_id])
+		annotations_slice = slice(first_annotation, first_annotation + int(self.columns["pages.num_annotations"][page_id]))
+		babelNetIDs = self.columns["annotations.babelNetID"][annotations_slice].tolist()
+		mentions = self.columns["annotations.mention"][annotations_slice].tolist()
+		anchorStarts = self.columns["annotations.anchorStart"][annotations_slice].tolist()
+		anchorEnds = self.columns["annotations.anchorEnd"][annotations_slice].tolist()
+		types = self.columns["annotations.type"][annotations_slice].tolist()
+
+		# as in file_manager.read_page, stop at the first annotation out of the read sentences
+		# (it matters only if less sentences than the indexed ones are read)
+		len_sentences = sum(len(sent) for sent in sentences) + len(sentences)
+		annotations = []
+		for bid, mention, start, end, type in zip(babelNetIDs, mentions, anchorStarts, anchorEnds, types):
+			if start < 0 or end > len_sentences:
+				break
+			annotations.append(fman.Annotation(strings[bid], strings[mention], start, end, self.annotation_types[type]))
+		return sentences, annotations
+
+
+def print_usage():
+	print("Usage:")
+	print("python -m utils.corpus_index <IN_datadir> <OUT_index_dir>")
+
+
+def main():
+	if len(sys.argv) != 3:
+		print_usage()
+		return -1
+	build_corpus_index(sys.argv[1], sys.argv[2])
+	return 0
+
+
+if __name__ == '__main__':
+	main()
@@ -1,17 +1,47 @@
 """
 A "singleton" module for retrieve the loaded-only-once-in-memory spaCy model, when needed.
+spaCy itself is imported only when the model is loaded, so the programs which do not parse (or not yet)
+do not pay for it. The same model, without the components listed in configurations.SPACY_DISABLED_COMPONENTS,
+is shared by the sentence parser and by the embedding of the seeds (see utils.similarity).
 """
-import spacy
+import atexit
+
+import configurations as conf
 
 
 # lazy initialization
 spacy_parser = None
+sentence_parser = None
 
 def get_spacy_parser():
 	global spacy_parser
 	if spacy_parser==None:
+		import spacy
 		try:
-			spacy_parser = spacy.load("en_core_web_md")
+			spacy_parser = spacy.load("en_core_web_md", disable=conf.SPACY_DISABLED_COMPONENTS)
 		except IOError:
-			spacy_parser = spacy.load("en_core_web_sm")
+			spacy_parser = spacy.load("en_core_web_sm", disable=conf.SPACY_DISABLED_COMPONENTS)
 	return spacy_parser
+
+def get_sentence_parser():
+	"""
+	Return the parser for the sentences of the corpus:
+	the spaCy model itself or, if configurations.PARSE_CACHE_DIR is set,
+	a utils.parse_cache.ParseCache around it (with the same "pipe" API).
+	"""
+	global sentence_parser
+	if sentence_parser==None:
+		if conf.PARSE_CACHE_DIR==None:
+			sentence_parser = get_spacy_parser()
+		else:
+			from utils.parse_cache import ParseCache
+			sentence_parser = ParseCache(get_spacy_parser(), conf.PARSE_CACHE_DIR)
+			atexit.register(sentence_parser.flush)
+	return sentence_parser
+
+def flush_sentence_parser():
+	"""
+	Write on disk the pending parses of the sentence parser, if it is cached.
+	"""
+	if sentence_parser!=None and hasattr(sentence_parser, "flush"):
+		sentence_parser.flush()
@@ -2,9 +2,6 @@ import gzip
 import os
 import re
 
-import xmltodict
-from lxml import etree
-
 import constants as c
 
 
@@ -15,11 +12,60 @@ def get_docs_list_by_subdir(wikipedia_dir):
 	:param wikipedia_dir: the path to the dataset directory
 	:return: a tuple (current_subdir, list_of_filepaths), where:
 		- current_subdir is the integer representing the subdirectory name;
-		- list_of_filepaths is the list of filepaths into the current subdirectory.
+		- list_of_filepaths is the list of filepaths into the current subdirectory, sorted by filename
+			(so that every run visits the pages in the same order).
 	"""
 	for subdir in sorted(os.listdir(wikipedia_dir), key=lambda x: int(x)):
 		d = wikipedia_dir + "/" + subdir + "/"
-		yield int(subdir), list(map(lambda x: d + x, os.listdir(d)))
+		yield int(subdir), list(map(lambda x: d + x, sorted(os.listdir(d))))
+
+
+def read_page(xml_path, num_of_sentences=-1, streaming=True):
+	"""
+	Read the first sentences of a Wikipedia page and the annotations relative to them.
+	:param xml_path: the path to the Wikipedia page in XML format
+	:param num_of_sentences: the number of sentences to read (-1 for all of them)
+	:param streaming: if True, read the page with IterparseReader, otherwise with LxmlParser
+	:return: a tuple (sentences, annotations), where sentences is a list of splitted sentences
+		and annotations is a list of Annotation objects.
+		An exception is raised if the page cannot be parsed.
+	"""
+	# XML manager for parse the Wikipedia page in XML format
+	if streaming:
+		xml_man = IterparseReader(xml_path, num_of_sentences=num_of_sentences)
+	else:
+		xml_man = LxmlParser(xml_path)
+
+	# read the first sentences.
+	sentences = list(xml_man.get_sentences(num_of_sentences=num_of_sentences))
+
+	# retrieve only the usable annotations, relative to only the retrieved sentences
+	len_sentences = sum(len(sent) for sent in sentences) + len(sentences)
+	annotations = list(xml_man.get_annotations_by_range(0, len_sentences))
+	return sentences, annotations
+
+
+class XmlCorpus(object):
+	"""
+	The dataset directory of Wikipedia pages in XML format.
+	It has the same interface of utils.corpus_index.CorpusIndex:
+	the pages are identified by their filepaths, and named by their paths relative to the dataset directory
+	(the same names of an index of the dataset, however the path of the dataset directory is written).
+	"""
+
+	def __init__(self, wikipedia_dir, num_of_sentences=-1, streaming=True):
+		self.wikipedia_dir = wikipedia_dir
+		self.num_of_sentences = num_of_sentences
+		self.streaming = streaming
+
+	def get_docs_list_by_subdir(self):
+		return get_docs_list_by_subdir(self.wikipedia_dir)
+
+	def read_page(self, xml_path):
+		return read_page(xml_path, self.num_of_sentences, self.streaming)
+
+	def page_name(self, xml_path):
+		return os.path.relpath(xml_path, self.wikipedia_dir)
 
 
 class LxmlParser(object):
@@ -32,6 +78,7 @@ class LxmlParser(object):
 
 		:param xml_path:
 		"""
+		from lxml import etree
 		self.xml_path = xml_path
 		self.parsed_xml = etree.parse(xml_path)
 
@@ -119,10 +166,147 @@ class LxmlParser(object):
 
 
 
+class IterparseReader(object):
+	"""
+	A streaming alternative to LxmlParser, built on lxml's iterparse.
+	The text of the page is read first, keeping only the needed sentences;
+	then the annotations are read one by one, only until they fall out of the requested range.
+	Every element is freed as soon as it has been read, so the rest of the page is never kept in memory.
+	The annotations can be requested only once, since the page is read as a stream.
+	"""
+
+	def __init__(self, xml_path, num_of_sentences=-1):
+		"""
+		:param xml_path: the path to the Wikipedia page in XML format, compressed with gzip or not.
+		:param num_of_sentences: the number of sentences to keep (-1 for all of them).
+		"""
+		from lxml import etree
+		self.xml_path = xml_path
+		self.num_of_sentences = num_of_sentences
+		self.file = _open_xml(xml_path)
+		self.events = etree.iterparse(self.file, events=("end",), tag=(c.TEXT_TAG, c.ANNOTATION_TAG))
+		self.lines = None
+		try:
+			for _, el in self.events:
+				if el.tag == c.TEXT_TAG:
+					self.lines = _first_lines(el.text, num_of_sentences)
+					_free(el)
+					break
+				_free(el)
+		except Exception:
+			self.close()
+			raise
+
+	def close(self):
+		self.file.close()
+
+	def get_text(self):
+		"""
+		return the text of the Wikipedia page (only the kept sentences)
+		"""
+		if self.lines == None:
+			return ""
+		return "".join(self.lines)
+
+	def get_sentences(self, num_of_sentences=-1):
+		"""
+		Same as LxmlParser.get_sentences, among the kept sentences.
+		"""
+		if self.lines == None:
+			return
+		for i, line in enumerate(self.lines):
+			if num_of_sentences==-1 or i<num_of_sentences:
+				spl_line = re.split(" +", line)
+				if spl_line[-1]=='':
+					del spl_line[-1]
+				yield spl_line
+			else:
+				break
+
+	def get_annotations_by_range(self, anchorStart, anchorEnd):
+		"""
+		Same as LxmlParser.get_annotations_by_range: the reading stops at the first annotation out of the range.
+		:param anchorStart: start index of the range used for filter the annotations.
+		:param anchorEnd: end index of the range used for filter the annotations.
+		:return: a list of Annotations objects.
+		"""
+		try:
+			for _, ann_el in self.events:
+				if ann_el.tag != c.ANNOTATION_TAG:
+					_free(ann_el)
+					continue
+				try:
+					ann_anchorStart = int(ann_el[c.ANNOTATION_ANCHORSTART_POS].text)
+					ann_anchorEnd = int(ann_el[c.ANNOTATION_ANCHOREND_POS].text)
+				except:
+					_free(ann_el)
+					continue
+				if ann_anchorStart>=anchorStart and ann_anchorEnd<=anchorEnd:
+					annotation = Annotation(
+						ann_el[c.ANNOTATION_BABELNETID_TAG_POS].text,
+						ann_el[c.ANNOTATION_MENTION_POS].text,
+						ann_el[c.ANNOTATION_ANCHORSTART_POS].text,
+						ann_el[c.ANNOTATION_ANCHOREND_POS].text,
+						ann_el[c.ANNOTATION_TYPE_TAG_POS].text,
+					)
+					_free(ann_el)
+					yield annotation
+				else:
+					break
+		finally:
+			self.close()
+
+
+def _open_xml(xml_path):
+	"""
+	Open a Wikipedia page in XML format, decompressing it if it is compressed with gzip.
+	"""
+	f = open(xml_path, "rb")
+	if f.read(2) == b"\x1f\x8b":
+		f.close()
+		return gzip.open(xml_path, "rb")
+	f.seek(0)
+	return f
+
+
+# the line boundaries of str.splitlines
+LINE_BOUNDARY_RE = re.compile("\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
+def _first_lines(text, num_of_lines):
+	"""
+	Same as text.splitlines()[:num_of_lines], without splitting the whole text.
+	:return: the first num_of_lines lines of the text (all of them if num_of_lines=-1), or None if the text is None.
+	"""
+	if text == None:
+		return None
+	if num_of_lines == -1:
+		return text.splitlines()
+	lines = []
+	start = 0
+	for m in LINE_BOUNDARY_RE.finditer(text):
+		if len(lines) == num_of_lines:
+			return lines
+		lines.append(text[start:m.start()])
+		start = m.end()
+	if len(lines) < num_of_lines and start < len(text):
+		lines.append(text[start:])
+	return lines
+
+
+def _free(el):
+	"""
+	Free an element read by iterparse, together with its already read siblings.
+	"""
+	el.clear()
+	while el.getprevious() is not None:
+		del el.getparent()[0]
+
+
 class Annotation(object):
 	"""
 	This class represent the annotation element in the provided XML schema.
 	"""
+	__slots__ = ("babelNetID", "mention", "anchorStart", "anchorEnd", "type")
 
 	def __init__(self, babelNetID, mention, anchorStart, anchorEnd, type):
 		self.babelNetID = babelNetID
@@ -1,10 +1,10 @@
 """
-This module use the networkx package to deal with graphs.
+This module deals with the paths in the dependency graph of a spaCy-parsed sentence.
+The graph has an edge from every left child to its head, and from every head to its right children.
+The paths from a source token are computed directly on the head indices of the tokens
+(see find_shortest_paths_from_source and find_filtered_paths_from_source);
+the networkx package is imported only by the functions that build a networkXGraph.
 """
-from networkx import DiGraph
-from networkx.algorithms.shortest_paths.unweighted import all_pairs_shortest_path
-from networkx.algorithms.shortest_paths.unweighted import single_source_shortest_path
-
 import constants as c
 
 
@@ -12,6 +12,7 @@ def build_networkXGraph_from_spaCy_depGraph(sentence):
 	"""
 	Given a spaCy-parsed sentence, return the relative networkXGraph.
 	"""
+	from networkx import DiGraph
 	g = DiGraph()
 	tokens = list(sentence)
 	g.add_nodes_from(tokens)
@@ -29,16 +30,112 @@ def _add_edges_from_spaCy_depGraph(g, node):
 
 
 def find_shortest_paths(sentence):
+	from networkx.algorithms.shortest_paths.unweighted import all_pairs_shortest_path
 	g = build_networkXGraph_from_spaCy_depGraph(sentence)
 	all_shortest_paths = all_pairs_shortest_path(g)
 	return all_shortest_paths
 
-def find_shortest_paths_from_source(sentence, start_token):
+def find_shortest_paths_from_source_nx(sentence, start_token):
+	"""
+	Same as find_shortest_paths_from_source, computed by NetworkX on the networkXGraph of the sentence.
+	"""
+	from networkx.algorithms.shortest_paths.unweighted import single_source_shortest_path
 	g = build_networkXGraph_from_spaCy_depGraph(sentence)
 	shortest_paths_from_source = single_source_shortest_path(g, start_token)
 	return shortest_paths_from_source
 
 
+def _successors(tokens):
+	"""
+	The adjacency lists of the dependency graph, as lists of positions in the sentence.
+	The order of the successors is the same of the networkXGraph built by build_networkXGraph_from_spaCy_depGraph:
+	first the head (if the token is a left child), then the right children from left to right.
+	:param tokens: the list of tokens of the sentence
+	"""
+	offset = tokens[0].i
+	heads = [t.head.i - offset for t in tokens]
+	successors = [[] for _ in tokens]
+	for position, head in enumerate(heads):
+		if position < head < len(tokens):
+			successors[position].append(head)
+	for position, head in enumerate(heads):
+		if 0 <= head < position:
+			successors[head].append(position)
+	return successors
+
+
+def find_shortest_paths_from_source(sentence, start_token):
+	"""
+	Same as NetworkX's single_source_shortest_path on the networkXGraph of the sentence,
+	computed with a breadth-first search over the head indices.
+	:return: a dictionary {end_token: path}, where path is a list of tokens from start_token to end_token,
+		in the same order of NetworkX.
+	"""
+	tokens = list(sentence)
+	if len(tokens) == 0:
+		return {start_token: [start_token]}
+	successors = _successors(tokens)
+	source = start_token.i - tokens[0].i
+
+	parents = {source: None}
+	queue = [source]
+	for v in queue:
+		for w in successors[v]:
+			if w not in parents:
+				parents[w] = v
+				queue.append(w)
+
+	shortest_paths_from_source = {}
+	for v in queue:
+		path = [tokens[v]] if parents[v] is None else shortest_paths_from_source[tokens[parents[v]]] + [tokens[v]]
+		shortest_paths_from_source[tokens[v]] = path
+	return shortest_paths_from_source
+
+
+def find_filtered_paths_from_source(sentence, start_token):
+	"""
+	Same as filter_paths({start_token: find_shortest_paths_from_source(sentence, start_token)}),
+	with the requirements (see satisfyRequirements) checked during the breadth-first search:
+		- the requirements on the first token are checked once, before the search;
+		- the search does not go beyond a token if the path to it already has more than one verb;
+		- only the paths to a token that can end a path are built.
+	:return: the list of paths (lists of tokens) which satisfy the requirements, in the same order of filter_paths.
+	"""
+	tokens = list(sentence)
+	if len(tokens) == 0 or not _isGoodStart(start_token):
+		return []
+	successors = _successors(tokens)
+	source = start_token.i - tokens[0].i
+
+	parents = {source: None}
+	num_verbs = {source: int(_isVerb(start_token))}
+	happy_paths = []
+	queue = [source]
+	for v in queue:
+		for w in successors[v]:
+			if w in parents:
+				continue
+			w_num_verbs = num_verbs[v] + _isVerb(tokens[w])
+			if w_num_verbs > 1:
+				continue
+			parents[w] = v
+			num_verbs[w] = w_num_verbs
+			queue.append(w)
+			if _isGoodEnd(tokens[w]):
+				happy_paths.append(_build_path(tokens, parents, w))
+	return happy_paths
+
+
+def _build_path(tokens, parents, end):
+	path = []
+	v = end
+	while v is not None:
+		path.append(tokens[v])
+		v = parents[v]
+	path.reverse()
+	return path
+
+
 def filter_paths(paths_dict):
 	"""
 	Filter paths in the form provided by NetworkX (i.e.: {start_node_id: {end_node_id: [path]}})
@@ -66,7 +163,10 @@ def satisfyRequirements(path):
 
 
 def hasVerb(path):
-	return sum(1 for t in path if t.pos_==c.VERB_POSTAG and t.dep_ != "auxpass" and t.dep_ != "aux")<=1
+	return sum(1 for t in path if _isVerb(t))<=1
+
+def _isVerb(t):
+	return t.pos_==c.VERB_POSTAG and t.dep_ != "auxpass" and t.dep_ != "aux"
 
 def hasConceptsAtTheEnds(path):
 	return (path[0].ent_id_ != c.NULL_BABELNET_ID
@@ -80,5 +180,20 @@ def isConceptDefinition(path):
 		   (path[-1].dep_ in c.OBJ_DEPTAGS)
 
 
+def _isGoodStart(t):
+	"""
+	The requirements of hasConceptsAtTheEnds and isConceptDefinition on the first token of a path.
+	"""
+	return (t.ent_id_ != c.NULL_BABELNET_ID or t.pos_ == c.PRON_POSTAG or t.pos_ == c.PROPN_POSTAG) and \
+		   t.dep_ in c.SUBJ_DEPTAGS
+
+
+def _isGoodEnd(t):
+	"""
+	The requirements of hasConceptsAtTheEnds and isConceptDefinition on the last token of a path.
+	"""
+	return t.ent_id_ != c.NULL_BABELNET_ID and t.dep_ in c.OBJ_DEPTAGS
+
+
 def extract_triple(path):
 	return (path[0], path[1:-1], path[-1])
\ No newline at end of file
@@ -0,0 +1,278 @@
+"""
+Incremental extraction: only the pages whose content changed, and only the relations whose seeds changed,
+are analyzed again.
+The results of the previous runs are kept in a SQLite store (IncrementalStore), together with:
+	- the fingerprint of every page, i.e. of the sentences and annotations read from it
+		(only the first NUM_FIRST_WIKI_SENTENCES sentences, as in a normal run);
+	- the fingerprint of every relation, i.e. of its name, its initial seeds and its similarity threshold;
+	- the seeds promoted for every relation.
+A pair (page, relation) is analyzed again only if one of the two fingerprints changed since it was analyzed;
+its old triples are then replaced by the new ones. The pages removed from the corpus and the relations removed
+from the seed file are removed from the store.
+Notice that the seeds promoted by a relation depend on the order in which the pages are analyzed:
+an unchanged relation continues from the seeds it had promoted, a changed relation starts from its initial seeds.
+"""
+import collections
+import datetime
+import hashlib
+import itertools
+import json
+import sqlite3
+
+import utils.corpus_index as corpus_index
+import utils.dependency_parser as dep_parser
+import utils.relation_extractor as relext
+from disambiguation.BabelNetConcept import BabelNetConcept
+from utils.misc import log_print
+from utils.seeds import RelationClassifier
+
+# the store of a run is kept next to its triples file
+STORE_SUFFIX = ".incremental.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+	name TEXT PRIMARY KEY,
+	page_order INTEGER,
+	run INTEGER
+);
+CREATE TABLE IF NOT EXISTS processed (
+	page TEXT,
+	relation TEXT,
+	page_fingerprint BLOB,
+	relation_fingerprint BLOB,
+	PRIMARY KEY (page, relation)
+);
+CREATE TABLE IF NOT EXISTS triples (
+	page TEXT,
+	relation TEXT,
+	position INTEGER,
+	left_mention TEXT,
+	left_babelNetID,
+	left_type TEXT,
+	right_mention TEXT,
+	right_babelNetID,
+	right_type TEXT,
+	source TEXT
+);
+CREATE INDEX IF NOT EXISTS triples_page_relation ON triples (page, relation);
+CREATE TABLE IF NOT EXISTS relations (
+	name TEXT PRIMARY KEY,
+	fingerprint BLOB,
+	promoted_seeds TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+	run INTEGER PRIMARY KEY,
+	start TEXT
+);
+"""
+
+
+def page_fingerprint(sentences, annotations):
+	"""
+	:param sentences: a list of splitted sentences
+	:param annotations: a list of file_manager.Annotation objects
+	:return: the fingerprint of a page (bytes)
+	"""
+	h = hashlib.sha1()
+	h.update(json.dumps(sentences).encode("utf8"))
+	h.update(json.dumps([[a.babelNetID, a.mention, int(a.anchorStart), int(a.anchorEnd), a.type]
+						 for a in annotations]).encode("utf8"))
+	return h.digest()
+
+
+def relation_fingerprint(relation_extractor):
+	"""
+	:return: the fingerprint of the definition of a relation (bytes), i.e. of its name, initial seeds and threshold
+	"""
+	return hashlib.sha1(json.dumps([relation_extractor.name, relation_extractor.initial_seeds,
+									relation_extractor.similarity_threshold]).encode("utf8")).digest()
+
+
+class IncrementalStore(object):
+	"""
+	The SQLite store of an incremental run (see the module documentation).
+	"""
+
+	def __init__(self, db_path):
+		self.db = sqlite3.connect(db_path)
+		self.db.executescript(SCHEMA)
+		self.run = None
+
+	def close(self):
+		self.db.close()
+
+	def begin_run(self, relation_extractors, relation_fingerprints):
+		"""
+		Start a new run: remove the relations which are not in the seed file anymore
+		and restore the promoted seeds of the unchanged relations.
+		:param relation_extractors: a list of RelationExtractor objects, with only their initial seeds
+		:param relation_fingerprints: the list of their fingerprints (see relation_fingerprint)
+		"""
+		self.run = self.db.execute("INSERT INTO runs (start) VALUES (?)",
+								   (str(datetime.datetime.now()),)).lastrowid
+		names = [r.name for r in relation_extractors]
+		for (name,) in self.db.execute("SELECT name FROM relations").fetchall():
+			if name not in names:
+				log_print("Incremental store: removing relation " + name)
+				for table in ["processed", "triples"]:
+					self.db.execute("DELETE FROM %s WHERE relation = ?" % table, (name,))
+				self.db.execute("DELETE FROM relations WHERE name = ?", (name,))
+
+		for r, fingerprint in zip(relation_extractors, relation_fingerprints):
+			row = self.db.execute("SELECT fingerprint, promoted_seeds FROM relations WHERE name = ?",
+								  (r.name,)).fetchone()
+			if row is not None and row[0] == fingerprint:
+				r.restore_promoted_seeds([tuple(s) for s in json.loads(row[1])])
+			else:
+				log_print("Incremental store: relation " + r.name + " is new or changed")
+		self.db.commit()
+
+	def processed_fingerprints(self, page_name):
+		"""
+		:return: a dictionary from relation_name to the tuple (page_fingerprint, relation_fingerprint)
+			with which the page has been analyzed for that relation.
+		"""
+		return dict((relation, (page_fp, relation_fp)) for relation, page_fp, relation_fp in self.db.execute(
+			"SELECT relation, page_fingerprint, relation_fingerprint FROM processed WHERE page = ?", (page_name,)))
+
+	def touch_page(self, page_name, page_order):
+		"""
+		Record that a page is still in the corpus, and its position in it.
+		"""
+		self.db.execute("INSERT OR REPLACE INTO pages (name, page_order, run) VALUES (?, ?, ?)",
+						(page_name, page_order, self.run))
+
+	def replace_triples(self, page_name, page_fp, relations, instances):
+		"""
+		Replace the triples found in a page for some relations.
+		:param page_name: the name of the page
+		:param page_fp: the fingerprint of the page
+		:param relations: a list of tuples (relation_name, relation_fingerprint), i.e. the relations analyzed
+		:param instances: the list of RelationExtraction objects found in the page for those relations
+		"""
+		for relation_name, relation_fp in relations:
+			self.db.execute("DELETE FROM triples WHERE page = ? AND relation = ?", (page_name, relation_name))
+			self.db.execute("INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?)",
+							(page_name, relation_name, page_fp, relation_fp))
+		self.db.executemany("INSERT INTO triples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+			(page_name, i.relation_name, position,
+			 i.left_concept.mention, i.left_concept.babelNetID, i.left_concept.type,
+			 i.right_concept.mention, i.right_concept.babelNetID, i.right_concept.type,
+			 i.source)
+			for position, i in enumerate(instances)])
+
+	def save_relations(self, relation_extractors, relation_fingerprints):
+		"""
+		Save the fingerprints and the promoted seeds of the relations, and commit.
+		"""
+		for r, fingerprint in zip(relation_extractors, relation_fingerprints):
+			self.db.execute("INSERT OR REPLACE INTO relations VALUES (?, ?, ?)",
+							(r.name, fingerprint, json.dumps(r.get_promoted_seeds())))
+		self.db.commit()
+
+	def end_run(self):
+		"""
+		Remove the pages which have not been seen in the current run (i.e. removed from the corpus), and commit.
+		"""
+		removed = "(SELECT name FROM pages WHERE run != ?)"
+		for table in ["processed", "triples"]:
+			self.db.execute("DELETE FROM %s WHERE page IN %s" % (table, removed), (self.run,))
+		self.db.execute("DELETE FROM pages WHERE run != ?", (self.run,))
+		self.db.commit()
+
+	def iter_triples(self):
+		"""
+		:return: yield all the triples of the store as RelationExtraction objects,
+			in the order of the pages in the corpus.
+		"""
+		for row in self.db.execute("SELECT t.relation, t.left_mention, t.left_babelNetID, t.left_type, "
+								   "t.right_mention, t.right_babelNetID, t.right_type, t.source "
+								   "FROM triples t JOIN pages p ON t.page = p.name "
+								   "ORDER BY p.page_order, t.position, t.relation"):
+			relation_name, left_mention, left_bid, left_type, right_mention, right_bid, right_type, source = row
+			yield relext.RelationExtraction(relation_name, BabelNetConcept(left_mention, left_bid, left_type),
+											BabelNetConcept(right_mention, right_bid, right_type), source)
+
+
+def update_store(data_dir, relation_extractors, store):
+	"""
+	Analyze the pairs (page, relation) which changed since the last run, and update the store.
+	:param data_dir: the path to the dataset directory, or to a corpus index built with utils.corpus_index
+	:param relation_extractors: a list of RelationExtractor objects
+	:param store: an IncrementalStore
+	:return: yield the new RelationExtraction objects
+	"""
+	corpus = corpus_index.open_corpus(data_dir)
+	relation_fingerprints = [relation_fingerprint(r) for r in relation_extractors]
+	store.begin_run(relation_extractors, relation_fingerprints)
+
+	# the RelationClassifier of every set of relations to be analyzed again:
+	# usually there are only two of them (all the relations for the changed pages, the changed relations for the others)
+	relation_classifiers = {}
+	page_order = itertools.count()
+	for subdir, page_list in corpus.get_docs_list_by_subdir():
+		start_subdir = datetime.datetime.now()
+		num_updated_pages = 0
+
+		pages = _pages_to_update(corpus, page_list, store, relation_extractors, relation_fingerprints, page_order)
+		# consecutive pages with the same relations to be analyzed are parsed in the same batches
+		for affected, group in itertools.groupby(pages, key=lambda page: page[0][2]):
+			if affected not in relation_classifiers:
+				relation_classifiers[affected] = RelationClassifier([relation_extractors[k] for k in affected])
+			for (page_name, page_fp, _), instances in _analyze_pages(group, relation_classifiers[affected]):
+				store.replace_triples(page_name, page_fp, [(relation_extractors[k].name, relation_fingerprints[k])
+														   for k in affected], instances)
+				num_updated_pages += 1
+				for inst in instances:
+					yield inst
+
+		store.save_relations(relation_extractors, relation_fingerprints)
+		log_print(datetime.datetime.now(), "Subdir %03d: %d pages updated, Time elapsed: " % (subdir, num_updated_pages),
+				  datetime.datetime.now() - start_subdir)
+
+	store.end_run()
+
+
+def _pages_to_update(corpus, page_list, store, relation_extractors, relation_fingerprints, page_order):
+	"""
+	Read the pages of a list and yield the ones with some relation to be analyzed again.
+	All the pages of the list are marked as seen, also the ones which cannot be read:
+	a page still in the corpus keeps its triples (see IncrementalStore.end_run).
+	:return: yield tuples (page_id, sentences, annotations),
+		where page_id is a tuple (page_name, page_fingerprint, indexes of the relations to be analyzed)
+	"""
+	for page in page_list:
+		store.touch_page(str(corpus.page_name(page)), next(page_order))
+	for page_name, sentences, annotations in relext._load_pages(corpus, page_list):
+		page_name = str(page_name)
+		page_fp = page_fingerprint(sentences, annotations)
+		processed = store.processed_fingerprints(page_name)
+		affected = tuple(k for k, (r, relation_fp) in enumerate(zip(relation_extractors, relation_fingerprints))
+						 if processed.get(r.name) != (page_fp, relation_fp))
+		if len(affected) > 0:
+			yield (page_name, page_fp, affected), sentences, annotations
+
+
+def _analyze_pages(pages, relation_classifier):
+	"""
+	Same as relation_extractor.analyze_pages, but yield every page, also the ones without relation instances.
+	:return: yield tuples (page_id, list of RelationExtraction objects)
+	"""
+	# the pages read by analyze_pages, whose relation instances have not been yielded yet
+	consumed = collections.deque()
+
+	def consume():
+		for page in pages:
+			consumed.append(page[0])
+			yield page
+
+	instances = []
+	for page_id, inst in relext.analyze_pages(consume(), dep_parser.get_sentence_parser(), relation_classifier):
+		# the relation instances are yielded in the same order of the pages
+		while consumed[0] is not page_id:
+			yield consumed.popleft(), instances
+			instances = []
+		instances.append(inst)
+	while len(consumed) > 0:
+		yield consumed.popleft(), instances
+		instances = []
@@ -0,0 +1,109 @@
+"""
+Memory-bounded operation.
+The structures which grow during a run are bounded:
+	- the merged concepts of configurations.NEW_CONCEPTS (at most NEW_CONCEPTS_MAX_SIZE, the oldest are evicted);
+	- the promoted seeds of every relation (at most MAX_PROMOTED_SEEDS, then the compliant phrases are not promoted);
+	- the caches (the vectors of the relational phrases, the rejected phrases, the null concepts),
+	  which are bounded in size and, if a memory budget is set, are also released when the budget is exceeded.
+The resident set size of the process is checked every MEMORY_CHECK_EVERY_PAGES pages;
+if it is greater than the budget, all the registered caches are cleared (see register) and the garbage is collected.
+Every process (the main one and the workers) has its own budget.
+"""
+import gc
+import inspect
+import os
+import resource
+import sys
+import weakref
+
+import configurations as conf
+from utils.misc import log_print
+
+# the memory budget of this process, in megabytes (None: no budget)
+budget_mb = None
+num_pages = 0
+# the functions which release memory: weak references to bound methods, or the functions themselves
+_release_functions = []
+
+
+def current_rss_mb():
+	"""
+	:return: the resident set size of this process, in megabytes (its peak where /proc is not available)
+	"""
+	try:
+		with open("/proc/self/statm") as f:
+			return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / float(1 << 20)
+	except (IOError, OSError, ValueError):
+		return peak_rss_mb()
+
+
+def peak_rss_mb():
+	"""
+	:return: the peak resident set size of this process, in megabytes
+	"""
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# kilobytes on Linux, bytes on macOS
+	return peak / float(1 << 20) if sys.platform == "darwin" else peak / 1024.
+
+
+def configure(memory_budget_mb, max_promoted_seeds=None):
+	"""
+	Enable the memory budget in this process.
+	:param memory_budget_mb: the budget of the resident set size, in megabytes (None: no budget)
+	:param max_promoted_seeds: if not None, the maximum number of promoted seeds of every relation
+	"""
+	global budget_mb
+	budget_mb = memory_budget_mb
+	if max_promoted_seeds is not None:
+		conf.MAX_PROMOTED_SEEDS = max_promoted_seeds
+
+
+def get_settings():
+	"""
+	:return: the arguments of configure for the worker processes, or None if there is no budget and no limit
+	"""
+	if budget_mb is None and conf.MAX_PROMOTED_SEEDS is None:
+		return None
+	return budget_mb, conf.MAX_PROMOTED_SEEDS
+
+
+def register(release):
+	"""
+	Register a function which releases memory, e.g. the clear method of a cache.
+	Only a weak reference is kept to bound methods, so the registered objects can be freed.
+	"""
+	if inspect.ismethod(release):
+		_release_functions.append(weakref.WeakMethod(release))
+	else:
+		_release_functions.append(lambda: release)
+
+
+def release():
+	"""
+	Call all the registered functions, and collect the garbage.
+	"""
+	alive = []
+	for ref in _release_functions:
+		function = ref()
+		if function is not None:
+			function()
+			alive.append(ref)
+	_release_functions[:] = alive
+	gc.collect()
+
+
+def count_pages(n=1):
+	"""
+	Count the read pages and, every MEMORY_CHECK_EVERY_PAGES pages, release the caches if the budget is exceeded.
+	"""
+	global num_pages
+	if budget_mb is None:
+		return
+	num_pages += n
+	if num_pages // conf.MEMORY_CHECK_EVERY_PAGES == (num_pages - n) // conf.MEMORY_CHECK_EVERY_PAGES:
+		return
+	rss = current_rss_mb()
+	if rss > budget_mb:
+		release()
+		log_print("Memory budget exceeded (%.0f MB of %.0f MB): caches released, now %.0f MB"
+				  % (rss, budget_mb, current_rss_mb()))
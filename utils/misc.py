@@ -1,5 +1,5 @@
+import collections
 import configurations as conf
-from nltk import Tree
 import re
 import constants as c
 
@@ -30,11 +30,16 @@ def to_nltk_tree(node):
 	Returns a nltk.Tree object from a spaCy dependency graph.
 	It should be calld with node set as the root node of the dependency graph.
 	"""
+	# nltk is only needed for debugging: it is imported at the first use
+	from nltk import Tree
 	if node.n_lefts + node.n_rights > 0:
 		return Tree(tok_format(node), [to_nltk_tree(child) for child in node.children])
 	else:
 		return Tree(tok_format(node), [])
 
+# the substrings removed from the sentences by clean_sentence: the ones in brackets, and the quotation marks
+_BAD_SUBSTRINGS = re.compile(r" ?(\(|\[) .+? (\)|\])| ?``| ?''")
+
 def clean_sentence(sentence, disambiguations):
 	"""
 	Clean a sentence from some useless stuff (brackets, quotation marks etc.)
@@ -46,29 +51,38 @@ def clean_sentence(sentence, disambiguations):
 	# We need to recover the entire string, then delete bad substring
 	# and remove relative Disambiguation objects from the list "disambiguations".
 	sentence_string = " ".join(sentence)
+	# most sentences have no bad substrings: they are returned as they are, without copies
+	if "(" not in sentence_string and "[" not in sentence_string and \
+			"``" not in sentence_string and "''" not in sentence_string:
+		return sentence, disambiguations
 
-	ranges_to_delete = []
-	# regex that solves out problem
-	p = re.compile(" ?(\(|\[) .+? (\)|\])| ?``| ?''")
-	for m in p.finditer(sentence_string):
-		ranges_to_delete.append((m.start(), m.end()))
+	# the pieces of the sentence string between the matched substrings
+	pieces = []
+	previous_index = 0
+	for m in _BAD_SUBSTRINGS.finditer(sentence_string):
+		pieces.append(sentence_string[previous_index:m.start()])
+		previous_index = m.end()
 
-	if len(ranges_to_delete)!=0:
+	if len(pieces)!=0:
 		# build the new sentence, without the matched substrings
-		new_sentence = ""
-		previous_index = 0
-		for start_idx, end_idx in ranges_to_delete:
-			new_sentence = new_sentence + sentence_string[previous_index:start_idx]
-			previous_index = end_idx
-		new_sentence = new_sentence + sentence_string[previous_index:]
-		sentence = new_sentence.split()
-
-		# delete relative disambiguations
-		i = -1
-		for i, token in enumerate(sentence):
+		pieces.append(sentence_string[previous_index:])
+		sentence = "".join(pieces).split()
+
+		# delete relative disambiguations (in place, so a DisambiguatedSentence keeps its table):
+		# find the positions of the remaining tokens, then delete the runs between them from the end
+		kept = []
+		i = 0
+		for token in sentence:
 			while token != disambiguations[i].word:
-				del disambiguations[i]
-		del disambiguations[i+1:]
+				i += 1
+			kept.append(i)
+			i += 1
+		end = len(disambiguations)
+		for i in reversed(kept):
+			if i+1 < end:
+				del disambiguations[i+1:end]
+			end = i
+		del disambiguations[:end]
 
 	assert len(sentence)==len(disambiguations)
 	return sentence, disambiguations
@@ -93,4 +107,42 @@ def fix_concept(concept):
 		longest_rightmost_subconcept = max(rightmost_subconcepts, key=lambda x: -x.anchorStart)
 		return longest_rightmost_subconcept
 	else:
-		return concept
\ No newline at end of file
+		return concept
+
+class LRUCache(object):
+	"""
+	A dictionary with a maximum number of items:
+	when it is full, the least recently used item is evicted.
+	"""
+	def __init__(self, max_size):
+		self.max_size = max_size
+		self.items = collections.OrderedDict()
+
+	def __contains__(self, key):
+		return key in self.items
+
+	def __len__(self):
+		return len(self.items)
+
+	def __getitem__(self, key):
+		value = self.items[key]
+		self.items.move_to_end(key)
+		return value
+
+	def __setitem__(self, key, value):
+		self.items[key] = value
+		self.items.move_to_end(key)
+		if len(self.items) > self.max_size:
+			self.items.popitem(last=False)
+
+	def get(self, key, default=None):
+		try:
+			return self[key]
+		except KeyError:
+			return default
+
+	def pop(self, key, default=None):
+		return self.items.pop(key, default)
+
+	def clear(self):
+		self.items.clear()
@@ -0,0 +1,245 @@
+"""
+A per-page filter index of the corpus, to skip the pages which cannot give relation instances.
+It is built once, with a cheap pass over the corpus (the pages are read, but not disambiguated nor parsed),
+and it contains two bitmaps, with a bit for every page in the order of get_docs_list_by_subdir:
+	- structural.npy: the page has at least one sentence with PAGE_FILTER_MIN_SENTENCE_LENGTH words
+	  and PAGE_FILTER_MIN_ANNOTATIONS annotations. Since the right end of a candidate triple must be an annotated
+	  concept of the same sentence, with the default values a page without this bit cannot give any triple;
+	- lexical.npy: the text of the page contains one of the lexical cues of a relation of a seed file,
+	  i.e. the first letters of the content words of its seeds (see seed_cues).
+	  This is only an approximation: a relational phrase can be similar to a seed without sharing any word with it,
+	  so filtering with this bitmap can lose some triples (see configurations.PAGE_FILTER_LEXICAL_CUES).
+	  If a seed has only function words (e.g. "is a") every page has this bit.
+The bitmaps are packed (numpy.packbits); meta.json (written last) contains the number of pages,
+the position of the first page of every subdirectory with a checksum of the page names
+(a subdirectory which changed after the build is not filtered), and the cues of every relation.
+With configurations.PAGE_FILTER_DIR set, the corpora opened by utils.corpus_index.open_corpus are filtered.
+
+Usage:
+	python -m utils.page_filter <IN_datadir> <IN_relation_seeds_file> <OUT_filter_dir>
+"""
+import bisect
+import json
+import os
+import sys
+import zlib
+
+import numpy as np
+
+import configurations as conf
+import utils.corpus_index as corpus_index
+import utils.profiling as profiling
+from utils.misc import log_print
+
+META_FILE = "meta.json"
+STRUCTURAL_FILE = "structural.npy"
+LEXICAL_FILE = "lexical.npy"
+
+# the words of the seeds which are not used as lexical cues
+FUNCTION_WORDS = frozenset([
+	"a", "an", "the", "is", "are", "was", "were", "be", "been", "being", "am", "of", "in", "on", "at", "to", "for",
+	"from", "by", "with", "as", "into", "onto", "can", "could", "may", "might", "will", "would", "shall", "should",
+	"do", "does", "did", "has", "have", "had", "it", "its", "this", "that", "these", "those", "and", "or", "not",
+	"than", "like", "out", "up", "about", "over", "under", "which", "who", "what", "there", "also", "such", "very",
+])
+
+
+def cue(word, length=None):
+	"""
+	:param length: the length of the cue; if None, configurations.PAGE_FILTER_CUE_LENGTH
+	:return: the lexical cue of a word: its first letters, lowercase
+		(a rough stemming, e.g. "located" and "location" have the same cue)
+	"""
+	return word.lower()[:conf.PAGE_FILTER_CUE_LENGTH if length is None else length]
+
+
+def seed_cues(relation_specs, length=None):
+	"""
+	:param relation_specs: a list of tuples (relation_name, seeds, similarity_threshold), see utils.seed_parser
+	:param length: the length of the cues (see cue)
+	:return: a dictionary from the name of a relation to the sorted list of the cues of its seeds
+		(empty if a seed has only function words: then any page can have a phrase similar to it)
+	"""
+	relation_cues = {}
+	for name, seeds, _ in relation_specs:
+		seeds_cues = [set(cue(w, length) for w in seed.split() if w.lower() not in FUNCTION_WORDS) for seed in seeds]
+		relation_cues[name] = sorted(set.union(*seeds_cues)) if all(len(c) > 0 for c in seeds_cues) else []
+	return relation_cues
+
+
+def page_bits(sentences, annotations, relation_cues):
+	"""
+	:param relation_cues: a list of sets of cues, one per relation
+	:return: a tuple (structural, lexical) with the two bits of a page
+	"""
+	# the annotations of every sentence, as in disambiguation.babelfy_man.disambiguate_sentences
+	starts = []
+	start = 0
+	for sent in sentences:
+		starts.append(start)
+		start += len(sent) + 1
+	num_annotations = [0] * len(sentences)
+	for ann in annotations:
+		i = bisect.bisect_right(starts, int(ann.anchorStart)) - 1
+		if i >= 0 and int(ann.anchorEnd) < starts[i] + len(sentences[i]):
+			num_annotations[i] += 1
+	structural = any(len(sent) >= conf.PAGE_FILTER_MIN_SENTENCE_LENGTH and n >= conf.PAGE_FILTER_MIN_ANNOTATIONS
+					 for sent, n in zip(sentences, num_annotations))
+
+	page_cues = set(cue(w) for sent in sentences for w in sent)
+	lexical = any(len(cues) == 0 or not cues.isdisjoint(page_cues) for cues in relation_cues)
+	return structural, lexical
+
+
+def _checksum(corpus, page_list):
+	# the base names, so the checksum does not depend on the path of the dataset directory
+	return zlib.crc32("\n".join(os.path.basename(str(corpus.page_name(page))) for page in page_list).encode("utf-8"))
+
+
+def build_page_filter(data_dir, relation_specs, filter_dir):
+	"""
+	Read the whole corpus and write the filter index.
+	:param data_dir: the path to the dataset directory, or to a corpus index built with utils.corpus_index
+	:param relation_specs: a list of tuples (relation_name, seeds, similarity_threshold), see utils.seed_parser
+	:param filter_dir: the directory of the filter index (created if it does not exist)
+	"""
+	if not os.path.exists(filter_dir):
+		os.makedirs(filter_dir)
+	meta_path = os.path.join(filter_dir, META_FILE)
+	if os.path.exists(meta_path):
+		os.remove(meta_path)
+
+	corpus = corpus_index.open_corpus(data_dir, filtered=False)
+	cues = seed_cues(relation_specs)
+	relation_cues = [set(c) for c in cues.values()]
+	structural, lexical = [], []
+	subdirs = {}
+	for subdir, page_list in corpus.get_docs_list_by_subdir():
+		subdirs[str(subdir)] = [len(structural), len(page_list), _checksum(corpus, page_list)]
+		for page in page_list:
+			try:
+				with profiling.timer("xml_load"):
+					sentences, annotations = corpus.read_page(page)
+				bits = page_bits(sentences, annotations, relation_cues)
+			except Exception as e:
+				log_print("Problem with " + str(corpus.page_name(page)))
+				# a page which cannot be read is skipped by the runs anyway
+				bits = (False, False)
+			structural.append(bits[0])
+			lexical.append(bits[1])
+		log_print("Subdir %03d: %d pages, %d kept by the structural filter, %d by both filters"
+				  % (subdir, len(page_list), sum(structural[-len(page_list):]),
+					 sum(s and l for s, l in zip(structural[-len(page_list):], lexical[-len(page_list):]))))
+
+	np.save(os.path.join(filter_dir, STRUCTURAL_FILE), np.packbits(np.array(structural, dtype=bool)))
+	np.save(os.path.join(filter_dir, LEXICAL_FILE), np.packbits(np.array(lexical, dtype=bool)))
+	with open(meta_path, "w") as f:
+		json.dump({"num_pages": len(structural), "num_of_sentences": corpus.num_of_sentences,
+				   "subdirs": subdirs, "cues": cues,
+				   "min_sentence_length": conf.PAGE_FILTER_MIN_SENTENCE_LENGTH,
+				   "min_annotations": conf.PAGE_FILTER_MIN_ANNOTATIONS}, f)
+	log_print("%d pages, %d kept by the structural filter, %d by both filters"
+			  % (len(structural), sum(structural), sum(s and l for s, l in zip(structural, lexical))))
+
+
+class PageFilter(object):
+	"""
+	The filter index built by build_page_filter.
+	"""
+	def __init__(self, filter_dir, lexical=None):
+		"""
+		:param filter_dir: a directory written by build_page_filter
+		:param lexical: if True, the pages are filtered also with the lexical bitmap;
+			if None, configurations.PAGE_FILTER_LEXICAL_CUES
+		"""
+		if lexical is None:
+			lexical = conf.PAGE_FILTER_LEXICAL_CUES
+		meta_path = os.path.join(filter_dir, META_FILE)
+		if not os.path.exists(meta_path):
+			raise Exception("%s is not a page filter index (or its build is incomplete)" % filter_dir)
+		with open(meta_path) as f:
+			self.meta = json.load(f)
+		self.keep = np.load(os.path.join(filter_dir, STRUCTURAL_FILE))
+		if lexical:
+			self.keep = self.keep & np.load(os.path.join(filter_dir, LEXICAL_FILE))
+		self.lexical = lexical
+
+	def covers(self, relation_specs):
+		"""
+		:param relation_specs: a list of tuples (relation_name, seeds, similarity_threshold)
+		:return: True if the lexical bitmap is valid for the relations, i.e. every relation has some cues,
+			and all of them are cues of the filter (so the pages without its bit have none of them);
+			otherwise the lexical bitmap must not be used
+		"""
+		filter_cues = set(c for cues in self.meta["cues"].values() for c in cues)
+		return all(len(cues) > 0 and filter_cues.issuperset(cues) for cues in seed_cues(relation_specs).values())
+
+	def filter_pages(self, subdir, page_list, corpus):
+		"""
+		:return: the pages of a subdirectory which can give relation instances
+			(all of them, if the subdirectory is not in the filter or it changed after the build)
+		"""
+		entry = self.meta["subdirs"].get(str(subdir))
+		if entry is None or entry[1] != len(page_list) or entry[2] != _checksum(corpus, page_list):
+			log_print("Subdir %03d is not in the page filter (or it changed): no page is skipped" % subdir)
+			return page_list
+		positions = np.arange(entry[0], entry[0] + entry[1])
+		bits = (self.keep[positions >> 3] >> (7 - (positions & 7))) & 1
+		return [page for page, bit in zip(page_list, bits) if bit]
+
+
+class FilteredCorpus(object):
+	"""
+	A corpus (file_manager.XmlCorpus or corpus_index.CorpusIndex) without the pages skipped by a PageFilter,
+	with the same interface.
+	"""
+	def __init__(self, corpus, page_filter):
+		if page_filter.meta["num_of_sentences"] != corpus.num_of_sentences:
+			raise Exception("The page filter was built reading %d sentences per page, not %d"
+							% (page_filter.meta["num_of_sentences"], corpus.num_of_sentences))
+		self.corpus = corpus
+		self.page_filter = page_filter
+		self.num_of_sentences = corpus.num_of_sentences
+
+	def get_docs_list_by_subdir(self):
+		num_pages = num_kept = 0
+		for subdir, page_list in self.corpus.get_docs_list_by_subdir():
+			kept = self.page_filter.filter_pages(subdir, page_list, self.corpus)
+			num_pages += len(page_list)
+			num_kept += len(kept)
+			log_print("Subdir %03d: %d pages of %d skipped by the page filter" % (subdir, len(page_list) - len(kept),
+																				   len(page_list)))
+			yield subdir, kept
+		log_print("%d pages of %d skipped by the page filter" % (num_pages - num_kept, num_pages))
+
+	def read_page(self, page):
+		return self.corpus.read_page(page)
+
+	def page_name(self, page):
+		return self.corpus.page_name(page)
+
+
+def check_relations(relation_specs):
+	"""
+	Disable the lexical bitmap of configurations.PAGE_FILTER_DIR if it was built for other seeds.
+	:param relation_specs: a list of tuples (relation_name, seeds, similarity_threshold)
+	"""
+	if conf.PAGE_FILTER_DIR is None or not conf.PAGE_FILTER_LEXICAL_CUES:
+		return
+	if not PageFilter(conf.PAGE_FILTER_DIR, lexical=False).covers(relation_specs):
+		log_print("The page filter was built for other seeds: only its structural bitmap is used")
+		conf.PAGE_FILTER_LEXICAL_CUES = False
+
+
+def main():
+	if len(sys.argv) != 4:
+		print("Usage:")
+		print("python -m utils.page_filter <IN_datadir> <IN_relation_seeds_file> <OUT_filter_dir>")
+		return -1
+	import utils.seed_parser as seed_parser
+	build_page_filter(sys.argv[1], seed_parser.parse_seed_specs(sys.argv[2]), sys.argv[3])
+	return 0
+
+
+if __name__ == '__main__':
+	main()
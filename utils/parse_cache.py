@@ -0,0 +1,237 @@
+"""
+A persistent, content-addressed cache of spaCy parses.
+The parses are stored on local disk as shards of serialized DocBin objects;
+every shard has a companion file with the keys (i.e. the SHA-1 digests of the parsed texts) of its documents.
+The cache directory is namespaced by spaCy and model version (and by the components of the model),
+so a new model never reads stale parses.
+"""
+import collections
+import hashlib
+import os
+import shutil
+import uuid
+
+import spacy
+from spacy.tokens import DocBin
+
+import configurations as conf
+from utils.misc import log_print
+
+# the attributes serialized for every parsed document
+DOC_ATTRS = ["ORTH", "LEMMA", "TAG", "POS", "HEAD", "DEP", "ENT_IOB", "ENT_TYPE"]
+
+# extensions of the files of a shard
+SHARD_EXT = ".spacy"
+KEYS_EXT = ".keys"
+# name of the file which marks a directory as a namespace of the cache
+META_FILENAME = "parse_cache.meta"
+
+DIGEST_SIZE = hashlib.sha1().digest_size
+
+
+def text_key(text):
+	"""
+	The key of a text in the cache.
+	"""
+	return hashlib.sha1(text.encode("utf8")).digest()
+
+
+class ParseCache(object):
+	"""
+	A wrapper of the spaCy model which looks up the parses in the cache before computing them.
+	It offers the same "pipe" and "__call__" methods of the spaCy model.
+	The total size of the shards on disk is bounded by max_size_mb: when it is exceeded,
+	the least recently used shards are deleted.
+	"""
+
+	def __init__(self, nlp, cache_dir, max_size_mb=conf.PARSE_CACHE_MAX_SIZE_MB,
+				 shard_size=conf.PARSE_CACHE_SHARD_SIZE, max_loaded_shards=conf.PARSE_CACHE_LOADED_SHARDS):
+		"""
+		:param nlp: the spaCy model
+		:param cache_dir: the root directory of the cache
+		:param max_size_mb: the maximum size on disk of the shards of the current model, in megabytes
+		:param shard_size: the number of parsed documents per shard
+		:param max_loaded_shards: the number of shards kept deserialized in memory
+		"""
+		self.nlp = nlp
+		self.max_size = max_size_mb * 1024 * 1024
+		self.shard_size = shard_size
+		self.max_loaded_shards = max_loaded_shards
+
+		self.namespace = "%s_%s-%s_%s_spacy-%s" % (nlp.meta.get("lang"), nlp.meta.get("name"), nlp.meta.get("version"),
+												   "-".join(nlp.pipe_names), spacy.__version__)
+		self.cache_dir = os.path.join(cache_dir, self.namespace)
+		self._invalidate_other_namespaces(cache_dir)
+		if not os.path.isdir(self.cache_dir):
+			os.makedirs(self.cache_dir)
+			with open(os.path.join(self.cache_dir, META_FILENAME), "w") as f:
+				f.write(self.namespace)
+
+		# a dictionary from the key of a text to a tuple (shard_name, position_in_the_shard)
+		self.index = {}
+		# a dictionary from shard_name to its size on disk, ordered from the least to the most recently used
+		self.shards = collections.OrderedDict()
+		self._read_index()
+
+		# the shards kept in memory: a dictionary from shard_name to a dictionary from position to Doc
+		self.loaded_shards = collections.OrderedDict()
+
+		# the parses not yet written on disk (and their keys as a set, so that a text is written only once)
+		self.pending_keys = []
+		self.pending_key_set = set()
+		self.pending_doc_bin = DocBin(attrs=DOC_ATTRS)
+
+		self.hits = 0
+		self.misses = 0
+
+	def __call__(self, text):
+		return self.pipe([text])[0]
+
+	def pipe(self, texts, batch_size=conf.PARSER_BATCH_SIZE):
+		"""
+		Parse a list of texts; only the texts not found in the cache are parsed by the spaCy model.
+		:param texts: an iterable of strings
+		:param batch_size: the batch size used with the spaCy "pipe" API
+		:return: a list of Doc objects, in the same order of the texts
+		"""
+		texts = list(texts)
+		keys = [text_key(t) for t in texts]
+		docs = [self._lookup(k) for k in keys]
+
+		missing = [i for i, doc in enumerate(docs) if doc is None]
+		self.hits += len(texts) - len(missing)
+		self.misses += len(missing)
+		for i, doc in zip(missing, self.nlp.pipe([texts[i] for i in missing], batch_size=batch_size)):
+			# the document is serialized now, before it is modified by the following stages
+			self._store(keys[i], doc)
+			docs[i] = doc
+		return docs
+
+	def flush(self):
+		"""
+		Write the pending parses on disk as a new shard, then evict the old shards if the cache is too big.
+		"""
+		if len(self.pending_keys) == 0:
+			return
+		# a unique name, since more processes (and runs) may write in the same directory
+		shard_name = uuid.uuid4().hex
+		shard_path = os.path.join(self.cache_dir, shard_name)
+
+		# write to temporary files first, so that a crash never leaves a truncated shard
+		for ext, data in [(SHARD_EXT, self.pending_doc_bin.to_bytes()), (KEYS_EXT, b"".join(self.pending_keys))]:
+			with open(shard_path + ext + ".tmp", "wb") as f:
+				f.write(data)
+			os.replace(shard_path + ext + ".tmp", shard_path + ext)
+
+		for position, key in enumerate(self.pending_keys):
+			self.index[key] = (shard_name, position)
+		self.shards[shard_name] = self._shard_size_on_disk(shard_name)
+		self.pending_keys = []
+		self.pending_key_set = set()
+		self.pending_doc_bin = DocBin(attrs=DOC_ATTRS)
+
+		self._evict()
+		log_print("Parse cache: %d hits, %d misses" % (self.hits, self.misses), verbosity=2)
+
+	def _lookup(self, key):
+		location = self.index.get(key)
+		if location is None:
+			return None
+		shard_name, position = location
+		if shard_name not in self.loaded_shards:
+			try:
+				self._load_shard(shard_name)
+			except IOError:
+				# the shard has been evicted by another process
+				self._forget_shard(shard_name)
+				return None
+		self.loaded_shards.move_to_end(shard_name)
+		self.shards.move_to_end(shard_name)
+
+		# every Doc is handed out only once, since the following stages modify it;
+		# if the same text is requested again, the shard is deserialized again.
+		doc = self.loaded_shards[shard_name].pop(position, None)
+		if doc is None:
+			del self.loaded_shards[shard_name]
+			return self._lookup(key)
+		return doc
+
+	def _store(self, key, doc):
+		if key in self.index or key in self.pending_key_set:
+			return
+		self.pending_keys.append(key)
+		self.pending_key_set.add(key)
+		self.pending_doc_bin.add(doc)
+		if len(self.pending_keys) >= self.shard_size:
+			self.flush()
+
+	def _load_shard(self, shard_name):
+		with open(os.path.join(self.cache_dir, shard_name + SHARD_EXT), "rb") as f:
+			doc_bin = DocBin(attrs=DOC_ATTRS).from_bytes(f.read())
+		self.loaded_shards[shard_name] = dict(enumerate(doc_bin.get_docs(self.nlp.vocab)))
+		# mark the shard as recently used, also for the other processes sharing the cache
+		os.utime(os.path.join(self.cache_dir, shard_name + SHARD_EXT))
+		while len(self.loaded_shards) > self.max_loaded_shards:
+			self.loaded_shards.popitem(last=False)
+
+	def _read_index(self):
+		"""
+		Build the index from the keys files, visiting the shards from the least to the most recently used.
+		"""
+		shard_names = [f[:-len(SHARD_EXT)] for f in os.listdir(self.cache_dir) if f.endswith(SHARD_EXT)]
+		shard_names.sort(key=lambda name: os.path.getmtime(os.path.join(self.cache_dir, name + SHARD_EXT)))
+		for shard_name in shard_names:
+			keys = self._read_keys(shard_name)
+			if keys is None:
+				continue
+			for position, key in enumerate(keys):
+				self.index[key] = (shard_name, position)
+			self.shards[shard_name] = self._shard_size_on_disk(shard_name)
+
+	def _evict(self):
+		while sum(self.shards.values()) > self.max_size and len(self.shards) > 1:
+			shard_name = next(iter(self.shards))
+			keys = self._read_keys(shard_name)
+			for ext in [SHARD_EXT, KEYS_EXT]:
+				try:
+					os.remove(os.path.join(self.cache_dir, shard_name + ext))
+				except OSError:
+					pass
+			self._forget_shard(shard_name, keys)
+
+	def _forget_shard(self, shard_name, keys=None):
+		self.shards.pop(shard_name, None)
+		self.loaded_shards.pop(shard_name, None)
+		if keys is None:
+			self.index = {k: v for k, v in self.index.items() if v[0] != shard_name}
+		else:
+			for key in keys:
+				if self.index.get(key, (None,))[0] == shard_name:
+					del self.index[key]
+
+	def _read_keys(self, shard_name):
+		"""
+		:return: the list of keys of a shard, or None if the keys file cannot be read.
+		"""
+		try:
+			with open(os.path.join(self.cache_dir, shard_name + KEYS_EXT), "rb") as f:
+				keys = f.read()
+		except IOError:
+			return None
+		return [keys[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE] for i in range(len(keys) // DIGEST_SIZE)]
+
+	def _shard_size_on_disk(self, shard_name):
+		return sum(os.path.getsize(os.path.join(self.cache_dir, shard_name + ext)) for ext in [SHARD_EXT, KEYS_EXT])
+
+	def _invalidate_other_namespaces(self, cache_dir):
+		"""
+		Delete the parses computed with other versions of spaCy or of the model.
+		Only the directories created by a ParseCache are deleted.
+		"""
+		if not os.path.isdir(cache_dir):
+			return
+		for namespace in os.listdir(cache_dir):
+			namespace_dir = os.path.join(cache_dir, namespace)
+			if namespace != self.namespace and os.path.isfile(os.path.join(namespace_dir, META_FILENAME)):
+				log_print("Parse cache: removing stale parses in " + namespace_dir)
+				shutil.rmtree(namespace_dir, ignore_errors=True)
@@ -0,0 +1,190 @@
+"""
+A store of precomputed vectors of relational phrases, to match the relations without the spaCy model.
+The vectors of the seeds of a seed file and of the relational phrases of a corpus (the distinct phrases of a
+candidate store built with utils.candidate_store, or a text file with one phrase per line) are computed once,
+with utils.similarity.PhraseEmbedder, and written to a directory:
+	- vectors.npy: the vectors of the phrases, a float32 matrix with a row per phrase;
+	- one_sentence.npy: for every phrase, whether its artificial sentence is parsed as a single sentence;
+	- phrases.json: the phrases, in the order of the rows;
+	- meta.json: the number of phrases, the size of the vectors and the spaCy model which computed them.
+	  It is written last: a directory without it is an incomplete export.
+The matrices are memory-mapped (see PhraseVectorStore): the processes which open the same store share
+its pages through the page cache, and only the rows which are read are loaded.
+
+Usage:
+	python -m utils.phrase_vectors <IN_relation_seeds_file> <IN_candidates.sqlite | IN_phrases.txt> <OUT_dir>
+"""
+import json
+import os
+import sys
+
+import numpy as np
+
+import configurations as conf
+import utils.similarity as similarity
+from utils.misc import log_print
+
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.npy"
+ONE_SENTENCE_FILE = "one_sentence.npy"
+PHRASES_FILE = "phrases.json"
+
+
+class PhraseVectorStore(object):
+	"""
+	The vectors of the relational phrases of an exported directory, with the same API of PhraseEmbedder
+	(embed and embed_many), so it can replace it as utils.similarity.phrase_embedder.
+	A phrase which is not in the store is embedded with a PhraseEmbedder (the spaCy model is loaded
+	at the first such phrase) or, if there is no fallback, it raises a KeyError.
+	The model of the fallback must have vectors of the same size of the store, otherwise the phrases cannot be compared.
+	"""
+	def __init__(self, store_dir, fallback=conf.PHRASE_VECTOR_STORE_FALLBACK):
+		"""
+		:param store_dir: a directory written by export
+		:param fallback: if True, the phrases which are not in the store are embedded with the spaCy model
+		"""
+		meta_path = os.path.join(store_dir, META_FILE)
+		if not os.path.exists(meta_path):
+			raise Exception("%s is not a phrase vector store (or its export is incomplete)" % store_dir)
+		with open(meta_path) as f:
+			self.meta = json.load(f)
+		self.vectors = np.load(os.path.join(store_dir, VECTORS_FILE), mmap_mode="r")
+		self.one_sentence = np.load(os.path.join(store_dir, ONE_SENTENCE_FILE), mmap_mode="r")
+		with open(os.path.join(store_dir, PHRASES_FILE)) as f:
+			self.rows = {phrase: row for row, phrase in enumerate(json.load(f))}
+		if len(self.rows) != self.meta["num_phrases"] or len(self.vectors) != self.meta["num_phrases"]:
+			raise Exception("The phrase vector store %s is corrupted" % store_dir)
+		self.fallback = similarity.PhraseEmbedder() if fallback else None
+		# the number of phrases embedded with the fallback
+		self.num_missing = 0
+		self.fallback_checked = False
+
+	def __len__(self):
+		return len(self.rows)
+
+	def __contains__(self, relational_phrase):
+		return relational_phrase in self.rows
+
+	def embed(self, relational_phrase):
+		"""
+		:return: a tuple (is_one_sentence, vector), as PhraseEmbedder.embed
+		"""
+		row = self.rows.get(relational_phrase)
+		if row is None:
+			self._count_missing(1)
+			return self.fallback.embed(relational_phrase)
+		return bool(self.one_sentence[row]), np.asarray(self.vectors[row])
+
+	def embed_many(self, relational_phrases):
+		"""
+		Same as embed, for a list of relational phrases; the ones not in the store are embedded in a single batch.
+		:return: a list of tuples (is_one_sentence, vector)
+		"""
+		missing = [ph for ph in set(relational_phrases) if ph not in self.rows]
+		if len(missing) > 0:
+			self._count_missing(len(missing))
+			self.fallback.embed_many(missing)
+		return [self.embed(ph) for ph in relational_phrases]
+
+	def _count_missing(self, n):
+		if self.fallback is None:
+			raise KeyError("Relational phrase not in the phrase vector store")
+		self._check_fallback()
+		if self.num_missing == 0:
+			log_print("Some relational phrases are not in the phrase vector store: they are embedded with the spaCy model")
+		self.num_missing += n
+
+	def _check_fallback(self):
+		if self.fallback_checked:
+			return
+		parser = self.fallback.get_parser()
+		if parser.vocab.vectors_length != self.meta["vector_size"]:
+			raise Exception("The phrase vector store has vectors of size %d (computed by %s), the spaCy model %s of size %d"
+							% (self.meta["vector_size"], self.meta["model"], model_name(parser.meta),
+							   parser.vocab.vectors_length))
+		if model_name(parser.meta) != self.meta["model"]:
+			log_print("The phrase vector store was computed by %s, the phrases not in it are embedded by %s"
+					  % (self.meta["model"], model_name(parser.meta)))
+		self.fallback_checked = True
+
+
+def model_name(model_meta):
+	"""
+	:param model_meta: the meta of a spaCy model
+	:return: the name of the model, with its language and version
+	"""
+	return "%s_%s-%s" % (model_meta.get("lang"), model_meta.get("name"), model_meta.get("version"))
+
+
+def export(phrases, out_dir, batch_size=conf.PHRASE_VECTOR_EXPORT_BATCH_SIZE):
+	"""
+	Embed the relational phrases and write them to a new store.
+	The vectors are written batch by batch to the memory-mapped matrix, so they are never all in memory.
+	:param phrases: an iterable of relational phrases; the repeated ones are stored only once
+	:param out_dir: the directory of the store (created if it does not exist)
+	:param batch_size: the number of phrases embedded at once
+	:return: the number of stored phrases
+	"""
+	phrases = list(dict.fromkeys(phrases))
+	if len(phrases) == 0:
+		raise Exception("No relational phrases to export")
+	if not os.path.exists(out_dir):
+		os.makedirs(out_dir)
+	meta_path = os.path.join(out_dir, META_FILE)
+	if os.path.exists(meta_path):
+		os.remove(meta_path)
+
+	embedder = similarity.PhraseEmbedder(cache_size=batch_size)
+	vectors = None
+	one_sentence = np.lib.format.open_memmap(os.path.join(out_dir, ONE_SENTENCE_FILE), mode="w+",
+											 dtype=np.bool_, shape=(len(phrases),))
+	for start in range(0, len(phrases), batch_size):
+		embeddings = embedder.embed_many(phrases[start:start + batch_size])
+		if vectors is None:
+			vectors = np.lib.format.open_memmap(os.path.join(out_dir, VECTORS_FILE), mode="w+",
+												dtype=np.float32, shape=(len(phrases), len(embeddings[0][1])))
+		for i, (is_one_sentence, vector) in enumerate(embeddings):
+			one_sentence[start + i] = is_one_sentence
+			vectors[start + i] = vector
+		log_print("%d/%d relational phrases embedded" % (min(start + batch_size, len(phrases)), len(phrases)))
+	vectors.flush()
+	one_sentence.flush()
+	with open(os.path.join(out_dir, PHRASES_FILE), "w") as f:
+		json.dump(phrases, f)
+
+	with open(meta_path, "w") as f:
+		json.dump({"num_phrases": len(phrases), "vector_size": vectors.shape[1],
+				   "model": model_name(embedder.get_parser().meta),
+				   "light": embedder.light_components is not None}, f)
+	return len(phrases)
+
+
+def read_phrases(path):
+	"""
+	:param path: a candidate store built with utils.candidate_store (.sqlite), or a text file with a phrase per line
+	:return: the list of the relational phrases
+	"""
+	if path.endswith(".sqlite"):
+		from utils.candidate_store import CandidateStore
+		store = CandidateStore(path)
+		phrases = [phrase for _, phrase, _ in store.iter_phrases()]
+		store.close()
+		return phrases
+	with open(path) as f:
+		return [line.strip() for line in f if line.strip() != ""]
+
+
+def main():
+	if len(sys.argv) != 4:
+		print("Usage:")
+		print("python -m utils.phrase_vectors <IN_relation_seeds_file> <IN_candidates.sqlite | IN_phrases.txt> <OUT_dir>")
+		return -1
+	import utils.seed_parser as seed_parser
+	seeds = [seed for _, relation_seeds, _ in seed_parser.parse_seed_specs(sys.argv[1]) for seed in relation_seeds]
+	num_phrases = export(seeds + read_phrases(sys.argv[2]), sys.argv[3])
+	log_print("%d relational phrases written to %s" % (num_phrases, sys.argv[3]))
+	return 0
+
+
+if __name__ == '__main__':
+	main()
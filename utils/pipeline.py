@@ -0,0 +1,269 @@
+"""
+A pipeline of the stages of a run over the whole dataset, alternative to the chain of generators
+of utils.relation_extractor.find_relation_from_datadir:
+	reader -> disambiguation -> parser -> graph -> outputs (e.g. the Q/A generation, then the writer of the triples)
+The stages are connected by bounded queues and driven by an asyncio event loop, and a full queue blocks
+the stage before it (backpressure). The spaCy model (and its vocabulary) is not thread-safe: the stages which use it
+(the parser, the graph, which merges spans and embeds the relational phrases, and the disambiguation
+with the sentence prefilter, which looks for the nearest words of the seeds) run their work in the same thread,
+one item at a time. The other stages run in their own threads, so they overlap with it
+(e.g. the next pages are read while the previous ones are parsed).
+Every stage handles its items in order, so the relation instances are found (and the seeds promoted)
+in the same order of find_relation_from_datadir.
+Periodically, the depth of every queue and the time every stage spent working, waiting for its input (starved)
+and waiting for room in the next queue (blocked) are logged: the pipeline is stalled by the busy stage
+whose input queue is full.
+"""
+import asyncio
+import concurrent.futures
+import time
+
+import configurations as conf
+import utils.corpus_index as corpus_index
+import utils.dependency_parser as dep_parser
+import utils.profiling as profiling
+import utils.relation_extractor as relext
+import utils.sentence_filter as sentence_filter
+from utils.misc import log_print
+from utils.seeds import as_relation_classifier
+
+# the marker of the end of the items
+_END = object()
+
+
+class SubdirDone(object):
+	"""
+	The marker of the end of a subdirectory, passed through the stages after all its pages.
+	"""
+	def __init__(self, subdir, page_list):
+		self.subdir = subdir
+		self.page_list = page_list
+
+
+class StageStats(object):
+	"""
+	The time spent by a stage working, waiting for its input and waiting for room in its output queue.
+	"""
+	def __init__(self, name):
+		self.name = name
+		self.items = 0
+		self.busy = 0.
+		self.starved = 0.
+		self.blocked = 0.
+
+	def __str__(self):
+		total = max(self.busy + self.starved + self.blocked, 1e-9)
+		return "%s: %d items, busy %.0f%%, starved %.0f%%, blocked %.0f%%" % (
+			self.name, self.items, 100 * self.busy / total, 100 * self.starved / total, 100 * self.blocked / total)
+
+
+def find_relation_pipeline(data_dir, relation_extractors, outputs, done_subdirs=(), on_subdir_done=None,
+						   queue_size=conf.PIPELINE_QUEUE_SIZE, report_interval=conf.PIPELINE_REPORT_INTERVAL):
+	"""
+	Iterate over the whole dataset with a Pipeline, and pass every relation instance found to the outputs.
+	:param data_dir: the path to the dataset directory, or to a corpus index built with utils.corpus_index
+	:param relation_extractors: a list of RelationExtractor objects
+	:param outputs: a list of tuples (stage_name, function); every function is called with every relation instance,
+		in its own stage, in the order of the list.
+	:param done_subdirs: the subdirectories to skip (see relation_extractor.find_relation_from_datadir)
+	:param on_subdir_done: a function called with (subdir, page_list) when all the relation instances
+		of a subdirectory have passed through all the outputs. If it is given, the end of every subdirectory
+		is a barrier: the next subdirectory is read only after the function has returned
+		(e.g. a checkpoint must not see the relation instances of the next subdirectory).
+	:param queue_size: the maximum number of items (pages) in every queue
+	:param report_interval: the number of seconds between two reports of the queue depths
+	"""
+	pipeline = Pipeline(corpus_index.open_corpus(data_dir), relation_extractors, outputs, done_subdirs,
+						on_subdir_done, queue_size, report_interval)
+	loop = asyncio.new_event_loop()
+	try:
+		loop.run_until_complete(pipeline.run())
+	finally:
+		loop.close()
+	pipeline.report()
+
+
+class Pipeline(object):
+	"""
+	The stages of the pipeline (see the module documentation). The items passed between the stages are:
+		- reader -> disambiguation: tuples (page_name, sentences, annotations);
+		- disambiguation -> parser: tuples (page_name, prepared_sentences), see relation_extractor.prepare_page;
+		- parser -> graph: tuples (page_name, prepared_sentences, parsed_sentences);
+		- graph -> outputs: tuples (page_name, list of RelationExtraction objects);
+	and the SubdirDone markers.
+	"""
+
+	def __init__(self, corpus, relation_extractors, outputs, done_subdirs=(), on_subdir_done=None,
+				 queue_size=conf.PIPELINE_QUEUE_SIZE, report_interval=conf.PIPELINE_REPORT_INTERVAL,
+				 batch_size=conf.PARSER_BATCH_SIZE):
+		self.corpus = corpus
+		self.relation_classifier = as_relation_classifier(relation_extractors)
+		self.sentence_prefilter = sentence_filter.get_sentence_prefilter(self.relation_classifier)
+		self.done_subdirs = done_subdirs
+		self.on_subdir_done = on_subdir_done
+		self.queue_size = queue_size
+		self.report_interval = report_interval
+		self.batch_size = batch_size
+
+		# the stages after the reader: tuples (name, process, uses_spacy), where process is called with every item
+		# (and at last with _END) and returns the list of the items for the next stage,
+		# and uses_spacy is True if it uses the spaCy model (then it runs in the spaCy thread, see run).
+		self.stages = [("disambiguation", self._disambiguate, self.sentence_prefilter is not None),
+					   ("parser", self._parse, True), ("graph", self._analyze, True)] + \
+					  [(name, _output_process(output), False) for name, output in outputs]
+		self.stats = [StageStats("reader")] + [StageStats(name) for name, _, _ in self.stages]
+		self.queues = []
+
+		# the pages waiting to be parsed together
+		self.batch = []
+		self.batch_sentences = 0
+
+	async def run(self):
+		loop = asyncio.get_event_loop()
+		executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(self.stages) + 1)
+		# a single thread for all the calls to the spaCy model
+		spacy_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+		self.queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+		# the end of a subdirectory has been handled by all the stages (see find_relation_pipeline)
+		subdir_drained = asyncio.Event()
+
+		tasks = [loop.create_task(self._reader(loop, executor, self.queues[0], self.stats[0], subdir_drained))]
+		for k, (name, process, uses_spacy) in enumerate(self.stages):
+			out_queue = self.queues[k + 1] if k + 1 < len(self.stages) else None
+			tasks.append(loop.create_task(self._stage(loop, spacy_executor if uses_spacy else executor, process,
+													  self.queues[k], out_queue, self.stats[k + 1], subdir_drained)))
+		monitor = loop.create_task(self._monitor())
+		try:
+			done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+			for task in pending:
+				task.cancel()
+			for task in done:
+				# raise the exception of a failed stage, if any
+				task.result()
+		finally:
+			monitor.cancel()
+			executor.shutdown(wait=True)
+			spacy_executor.shutdown(wait=True)
+
+	async def _reader(self, loop, executor, out_queue, stats, subdir_drained):
+		items = self._read()
+		while True:
+			start = time.perf_counter()
+			item = await loop.run_in_executor(executor, next, items, _END)
+			stats.busy += time.perf_counter() - start
+
+			start = time.perf_counter()
+			await out_queue.put(item)
+			if isinstance(item, SubdirDone) and self.on_subdir_done is not None:
+				subdir_drained.clear()
+				await subdir_drained.wait()
+			stats.blocked += time.perf_counter() - start
+			if item is _END:
+				return
+			stats.items += 1
+
+	async def _stage(self, loop, executor, process, in_queue, out_queue, stats, subdir_drained):
+		while True:
+			start = time.perf_counter()
+			item = await in_queue.get()
+			stats.starved += time.perf_counter() - start
+
+			start = time.perf_counter()
+			results = await loop.run_in_executor(executor, process, item)
+			if out_queue is None and isinstance(item, SubdirDone) and self.on_subdir_done is not None:
+				# the last stage: all the relation instances of the subdirectory have been handled
+				await loop.run_in_executor(executor, self.on_subdir_done, item.subdir, item.page_list)
+				subdir_drained.set()
+			stats.busy += time.perf_counter() - start
+
+			start = time.perf_counter()
+			if out_queue is not None:
+				for result in results:
+					await out_queue.put(result)
+				if item is _END:
+					await out_queue.put(_END)
+			stats.blocked += time.perf_counter() - start
+			if item is _END:
+				return
+			stats.items += 1
+
+	async def _monitor(self):
+		while True:
+			await asyncio.sleep(self.report_interval)
+			self.report()
+
+	def report(self):
+		"""
+		Log the depth of every queue and the statistics of every stage.
+		"""
+		depths = ["%s %d/%d" % (name, q.qsize(), self.queue_size) for (name, _, _), q in zip(self.stages, self.queues)]
+		log_print("Pipeline queues: " + ", ".join(depths))
+		for stats in self.stats:
+			log_print("Pipeline stage " + str(stats))
+		if self.sentence_prefilter is not None:
+			log_print(self.sentence_prefilter.report())
+
+	def _read(self):
+		"""
+		:return: yield the pages of the corpus, and a SubdirDone after the pages of every subdirectory
+		"""
+		for subdir, page_list in self.corpus.get_docs_list_by_subdir():
+			if subdir in self.done_subdirs:
+				continue
+			log_print("Loading from subdir %03d" % subdir)
+			for page in relext._load_pages(self.corpus, page_list):
+				yield page
+			yield SubdirDone(subdir, page_list)
+
+	def _disambiguate(self, item):
+		if item is _END or isinstance(item, SubdirDone):
+			return [item] if item is not _END else []
+		page_name, sentences, annotations = item
+		prepared_sentences = relext.prepare_page(sentences, annotations)
+		if self.sentence_prefilter is not None:
+			with profiling.timer("sentence_prefilter", len(prepared_sentences)):
+				prepared_sentences = self.sentence_prefilter.filter(prepared_sentences)
+		return [(page_name, prepared_sentences)]
+
+	def _parse(self, item):
+		if item is not _END and not isinstance(item, SubdirDone):
+			self.batch.append(item)
+			self.batch_sentences += len(item[1])
+			if self.batch_sentences < self.batch_size:
+				return []
+
+		# parse the batch when it is full, at the end of a subdirectory and at the end
+		texts = [" ".join(sent) for _, prepared_sentences in self.batch for _, sent, _ in prepared_sentences]
+		with profiling.timer("spacy_parse", len(texts)):
+			parsed_sentences = iter(list(dep_parser.get_sentence_parser().pipe(texts, batch_size=self.batch_size)))
+		results = [(page_name, prepared_sentences, [next(parsed_sentences) for _ in prepared_sentences])
+				   for page_name, prepared_sentences in self.batch]
+		self.batch = []
+		self.batch_sentences = 0
+		if isinstance(item, SubdirDone):
+			results.append(item)
+		return results
+
+	def _analyze(self, item):
+		if item is _END or isinstance(item, SubdirDone):
+			return [item] if item is not _END else []
+		page_name, prepared_sentences, parsed_sentences = item
+		instances = list(relext.analyze_parsed_page(prepared_sentences, parsed_sentences, self.relation_classifier))
+		for _ in instances:
+			log_print(page_name)
+		return [(page_name, instances)]
+
+
+def _output_process(output):
+	"""
+	:param output: a function called with every relation instance
+	:return: the process of an output stage
+	"""
+	def process(item):
+		if item is _END:
+			return []
+		if not isinstance(item, SubdirDone):
+			for inst in item[1]:
+				output(inst)
+		return [item]
+	return process
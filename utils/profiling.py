@@ -0,0 +1,211 @@
+"""
+Instrumentation of the hot paths of a run.
+For every stage (e.g. "xml_load", "spacy_parse", "is_compliant") the cumulative time, the number of calls
+and the number of items (e.g. sentences) are recorded, together with the peak resident set size of the process
+at the end of the stage and how much the stage raised it; the report, with the throughput of every stage,
+is written as JSON and CSV at the end of the run and, optionally, every N pages.
+The instrumentation is disabled by default: then timer returns a context manager which does nothing.
+Optionally, every process (the main one and the workers) is also profiled with cProfile.
+The statistics of the worker processes are sent back to the main process (see take and merge).
+"""
+import cProfile
+import csv
+import json
+import os
+import time
+
+import utils.memory as memory
+from utils.misc import log_print
+
+REPORT_COLUMNS = ["stage", "calls", "items", "seconds", "items_per_second", "ms_per_call",
+				  "peak_rss_mb", "peak_rss_growth_mb"]
+
+enabled = False
+# a dictionary from stage name to a list [calls, items, seconds, peak_rss_mb, peak_rss_growth_mb]
+stats = {}
+
+# the path prefix of the report (None in the worker processes), and the number of pages between two reports
+report_path = None
+report_every_pages = 0
+num_pages = 0
+start_time = time.perf_counter()
+# the cProfile.Profile of this process, and the path prefix of its statistics, if enabled
+profiler = None
+cprofile_path = None
+
+
+class _Timer(object):
+	__slots__ = ("name", "items", "start", "start_peak_rss")
+
+	def __init__(self, name, items):
+		self.name = name
+		self.items = items
+
+	def __enter__(self):
+		self.start_peak_rss = memory.peak_rss_mb()
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		seconds = time.perf_counter() - self.start
+		peak_rss = memory.peak_rss_mb()
+		record(self.name, seconds, self.items, peak_rss, peak_rss - self.start_peak_rss)
+
+
+class _NullTimer(object):
+	__slots__ = ()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name, items=1):
+	"""
+	A context manager which measures a call of a stage:
+		with profiling.timer("spacy_parse", len(texts)):
+			...
+	:param name: the name of the stage
+	:param items: the number of items handled by the call
+	"""
+	if not enabled:
+		return _NULL_TIMER
+	return _Timer(name, items)
+
+
+def record(name, seconds, items=1, peak_rss=0., peak_rss_growth=0.):
+	s = stats.get(name)
+	if s is None:
+		s = stats[name] = [0, 0, 0., 0., 0.]
+	s[0] += 1
+	s[1] += items
+	s[2] += seconds
+	s[3] = max(s[3], peak_rss)
+	s[4] += peak_rss_growth
+
+
+def configure(path=None, every_pages=0, cprofile_path_prefix=None):
+	"""
+	Enable the instrumentation in this process.
+	:param path: the path prefix of the report (path.json and path.csv); None in the worker processes
+	:param every_pages: if greater than 0, the report is written every every_pages pages
+	:param cprofile_path_prefix: if not None, this process is also profiled with cProfile (see dump_cprofile)
+	"""
+	global enabled, report_path, report_every_pages, start_time, profiler, cprofile_path
+	enabled = True
+	report_path = path
+	report_every_pages = every_pages
+	start_time = time.perf_counter()
+	cprofile_path = cprofile_path_prefix
+	if cprofile_path is not None and profiler is None:
+		profiler = cProfile.Profile()
+		profiler.enable()
+
+
+def get_settings():
+	"""
+	:return: the arguments of configure for the worker processes, or None if the instrumentation is disabled
+	"""
+	if not enabled:
+		return None
+	return None, 0, cprofile_path
+
+
+def count_pages(n=1):
+	"""
+	Count the analyzed pages, and write the report every report_every_pages pages.
+	"""
+	global num_pages
+	if not enabled:
+		return
+	num_pages += n
+	if report_path is not None and report_every_pages > 0 and \
+			num_pages // report_every_pages != (num_pages - n) // report_every_pages:
+		write_report()
+
+
+def take():
+	"""
+	:return: the statistics recorded since the last call (e.g. by a worker process), which are reset
+	"""
+	global stats
+	taken, stats = stats, {}
+	return taken
+
+
+def merge(other_stats):
+	"""
+	Add the statistics returned by take (e.g. in another process);
+	the peak resident set size of a stage is the greatest one among the processes.
+	"""
+	for name, (calls, items, seconds, peak_rss, peak_rss_growth) in other_stats.items():
+		s = stats.get(name)
+		if s is None:
+			s = stats[name] = [0, 0, 0., 0., 0.]
+		s[0] += calls
+		s[1] += items
+		s[2] += seconds
+		s[3] = max(s[3], peak_rss)
+		s[4] += peak_rss_growth
+
+
+def report():
+	"""
+	:return: a list of dictionaries, one per stage (see REPORT_COLUMNS), from the slowest stage
+	"""
+	rows = []
+	for name, (calls, items, seconds, peak_rss, peak_rss_growth) in sorted(stats.items(), key=lambda s: -s[1][2]):
+		rows.append({
+			"stage": name,
+			"calls": calls,
+			"items": items,
+			"seconds": round(seconds, 6),
+			"items_per_second": round(items / seconds, 3) if seconds > 0 else None,
+			"ms_per_call": round(1000 * seconds / calls, 6),
+			"peak_rss_mb": round(peak_rss, 1),
+			"peak_rss_growth_mb": round(peak_rss_growth, 1),
+		})
+	return rows
+
+
+def write_report(path=None):
+	"""
+	Write the report as JSON (path.json) and CSV (path.csv); the files are replaced atomically.
+	:param path: the path prefix; if None, the one given to configure
+	"""
+	path = path or report_path
+	rows = report()
+	with open(path + ".json.tmp", "w") as f:
+		json.dump({"pages": num_pages, "elapsed_seconds": round(time.perf_counter() - start_time, 3),
+				   "peak_rss_mb": round(memory.peak_rss_mb(), 1), "stages": rows}, f, indent=1)
+	os.replace(path + ".json.tmp", path + ".json")
+	with open(path + ".csv.tmp", "w", newline="") as f:
+		writer = csv.DictWriter(f, REPORT_COLUMNS)
+		writer.writeheader()
+		writer.writerows(rows)
+	os.replace(path + ".csv.tmp", path + ".csv")
+	log_print("Profiling report written to %s.json and %s.csv (%d pages)" % (path, path, num_pages))
+
+
+def dump_cprofile():
+	"""
+	Write the cProfile statistics of this process (if enabled) to <cprofile_path>.<pid>.prof;
+	they can be read with the pstats module.
+	"""
+	if profiler is not None:
+		profiler.dump_stats("%s.%d.prof" % (cprofile_path, os.getpid()))
+
+
+def finish():
+	"""
+	Write the final report and the cProfile statistics of this process.
+	"""
+	if not enabled or report_path is None:
+		return
+	write_report()
+	dump_cprofile()
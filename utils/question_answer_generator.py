@@ -8,9 +8,10 @@ class QuestionAnswerGenerator(object):
 		- relation2patterns: a dict from relation_name to list of QuestionPattern object (defined in utils.question_pattern_parser.py)
 		- batch_size: the max size of the buffer. When the buffer is full, it starts the generation of Q/A pairs.
 			the output is flushed into the file descriptor relative to outfilepath
+		- mode: the mode used to open the output file ("a" to append to it, e.g. when a run is resumed)
 	"""
-	def __init__(self, outfilepath, relation2patterns, batch_size=10):
-		self.outfile = open(outfilepath, "w")
+	def __init__(self, outfilepath, relation2patterns, batch_size=10, mode="w"):
+		self.outfile = open(outfilepath, mode)
 		self.relation2patterns = relation2patterns
 		# a dictionary from relation_name to the relative buffer (i.e.: list of RelationExtraction objects).
 		self.sampled_instances = dict([(relation_name,[]) for relation_name in relation2patterns])
@@ -1,74 +1,199 @@
-from sqlalchemy.sql.functions import current_date
-
+import itertools
+import multiprocessing
 import utils.file_manager as fman
+import utils.corpus_index as corpus_index
 import configurations as conf
 import datetime
 import constants as c
 import utils.misc as misc
 import utils.semantic_graph_builder as sgb
 import utils.graph_utils as gu
-from utils.misc import log_print, to_nltk_tree
+from utils.misc import log_print
 import disambiguation.babelfy_man as bfm
 import utils.dependency_parser as dep_parser
+import utils.memory as memory
+import utils.profiling as profiling
+import utils.sentence_filter as sentence_filter
+from disambiguation.BabelNetConcept import get_null_concept
+from utils.seeds import RelationExtractor, RelationClassifier, as_relation_classifier
 
+# the null concepts shared among the sentences are released when the memory budget is exceeded (see utils.memory)
+memory.register(get_null_concept.cache_clear)
 
-def find_relation_from_filelist(filepath_list, relation_extractors):
-    for xml_path in filepath_list:
 
-        try:
-            cur_xml_man = fman.LxmlParser(xml_path)
-        except Exception as e:
-            log_print("Problem with " + xml_path)
-            continue
+def find_relation_from_filelist(filepath_list, relation_extractors):
+    corpus = fman.XmlCorpus(None, conf.NUM_FIRST_WIKI_SENTENCES, conf.STREAMING_XML_READER)
+    for inst in _find_relation_from_pages(corpus, filepath_list, as_relation_classifier(relation_extractors)):
+        yield inst
 
-        cur_sentences = list(cur_xml_man.get_sentences(num_of_sentences=conf.NUM_FIRST_WIKI_SENTENCES))
-        len_sentences = sum(len(sent) for sent in cur_sentences) + len(cur_sentences)
-        cur_annotations = list(
-            cur_xml_man.get_annotations_by_range(0, len_sentences))
 
-        for inst in analyze_xml(cur_sentences, cur_annotations, dep_parser.get_spacy_parser(), relation_extractors):
-            log_print(xml_path)
+def find_relation_from_datadir(data_dir, relation_extractors, num_workers=conf.NUM_WORKERS,
+                               done_subdirs=(), on_subdir_done=None):
+    """
+	Iterate over the whole dataset and yield every relation instance found.
+	If num_workers is greater than 1, the subdirectories are sharded across a pool of processes
+	(see find_relation_from_corpus_parallel); the relation instances are yielded in the same order in both cases.
+	:param data_dir: the path to the dataset directory, or to a corpus index built with utils.corpus_index
+	:param relation_extractors: a list of RelationExtractor objects
+	:param num_workers: the number of worker processes
+	:param done_subdirs: the subdirectories to skip (e.g. the ones already analyzed by an interrupted run)
+	:param on_subdir_done: a function called with (subdir, page_list) when all the relation instances of a subdirectory
+		have been yielded (and consumed); used to checkpoint the run (see utils.checkpoint).
+	:return: yield RelationExtraction objects
+	"""
+    corpus = corpus_index.open_corpus(data_dir)
+    subdirs = ((subdir, page_list) for subdir, page_list in corpus.get_docs_list_by_subdir()
+               if subdir not in done_subdirs)
+    if num_workers > 1:
+        for inst in find_relation_from_corpus_parallel(corpus, relation_extractors, num_workers, subdirs,
+                                                       on_subdir_done):
             yield inst
-    pass
+        return
 
+    # all the relations are evaluated at once
+    relation_classifier = as_relation_classifier(relation_extractors)
 
-def find_relation_from_datadir(data_dir, relation_extractors):
     # Iterate over the whole dataset.
     # subdir is the integer representing the current subdirectory that is under analysis;
-    # xml_path_list is the list of filepaths of the files in that subdirectoy
-    for subdir, xml_path_list in fman.get_docs_list_by_subdir(data_dir):
+    # page_list is the list of pages in that subdirectoy (filepaths, or positions in the corpus index)
+    for subdir, page_list in subdirs:
 
         # time measurement
         start_subdir = datetime.datetime.now()
+        log_print(start_subdir, "Loading from subdir %03d" % subdir)
 
-        start = datetime.datetime.now()
-        log_print(start, "Loading from subdir %03d" % subdir)
-        cur_xml_list = []
-
-        for xml_path in xml_path_list:
-            try:
-                # XML manager for parse the Wikipedia page in XML format
-                cur_xml_man = fman.LxmlParser(xml_path)
-            except Exception as e:
-                log_print("Problem with " + xml_path)
-                continue
-
-            # read the first default number of sentences.
-            cur_sentences = list(cur_xml_man.get_sentences(num_of_sentences=conf.NUM_FIRST_WIKI_SENTENCES))
-
-            # retrieve only the usable annotations, relative to only the retrieved sentences
-            len_sentences = sum(len(sent) for sent in cur_sentences) + len(cur_sentences)
-            cur_annotations = list(cur_xml_man.get_annotations_by_range(0, len_sentences))
-
-            # for every RelationExtraction object (i.e.: relation instance) retrieved, yield it.
-            for inst in analyze_xml(cur_sentences, cur_annotations, dep_parser.get_spacy_parser(), relation_extractors):
-                log_print(xml_path)
-                yield inst
+        for inst in _find_relation_from_pages(corpus, page_list, relation_classifier):
+            yield inst
+        if on_subdir_done is not None:
+            on_subdir_done(subdir, page_list)
 
         log_print(datetime.datetime.now(), "Total Time elapsed: ", datetime.datetime.now() - start_subdir)
         log_print("-" * 50)
 
 
+def find_relation_from_corpus_parallel(corpus, relation_extractors, num_workers, subdirs=None, on_subdir_done=None):
+    """
+	Process-pool version of find_relation_from_datadir.
+	Every subdirectory is a unit of work: the workers load the spaCy model once (in _init_worker)
+	and return all the relation instances found in a subdirectory.
+	Results are collected with an ordered imap, so the relation instances are yielded
+	subdirectory by subdirectory, in the same order of the sequential version.
+	Every subdirectory is analyzed from the seeds of the relation_extractors (see _analyze_subdir):
+	the seeds promoted in a subdirectory are not used in the others, and they are not returned,
+	so the output does not depend on which worker analyzes which subdirectory, but its content differs
+	from the sequential version, unless the seeds are frozen (e.g. by utils.seed_expansion).
+	:param corpus: a file_manager.XmlCorpus or a corpus_index.CorpusIndex object
+	:param relation_extractors: a list of RelationExtractor objects
+	:param num_workers: the number of worker processes
+	:param subdirs: the tuples (subdir, page_list) to analyze; if None, all the ones of the corpus
+	:param on_subdir_done: see find_relation_from_datadir
+	:return: yield RelationExtraction objects
+	"""
+    if subdirs is None:
+        subdirs = corpus.get_docs_list_by_subdir()
+    relation_specs = [(r.name, r.initial_seeds, r.similarity_threshold, r.get_promoted_seeds(), r.frozen)
+                      for r in relation_extractors]
+    pool = multiprocessing.Pool(num_workers, initializer=_init_worker,
+                                initargs=(corpus, relation_specs, profiling.get_settings(), memory.get_settings()))
+    try:
+        start = datetime.datetime.now()
+        for subdir, page_list, instances, profiling_stats in pool.imap(_analyze_subdir, subdirs):
+            log_print(datetime.datetime.now(), "Done subdir %03d" % subdir,
+                      "Total Time elapsed: ", datetime.datetime.now() - start)
+            profiling.merge(profiling_stats)
+            profiling.count_pages(len(page_list))
+            for inst in instances:
+                yield inst
+            if on_subdir_done is not None:
+                on_subdir_done(subdir, page_list)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+# the corpus and the relations of the current worker process (see find_relation_from_corpus_parallel)
+_worker_corpus = None
+_worker_relation_specs = None
+
+
+def _init_worker(corpus, relation_specs, profiling_settings=None, memory_settings=None):
+    """
+	Initializer of the worker processes: load the spaCy model, only once per process.
+	:param corpus: a file_manager.XmlCorpus or a corpus_index.CorpusIndex object
+	:param relation_specs: a list of tuples (name, seeds, similarity_threshold, promoted_seeds, frozen)
+	:param profiling_settings: the arguments of profiling.configure, or None if the instrumentation is disabled
+	:param memory_settings: the arguments of memory.configure, or None if there is no memory budget
+	"""
+    global _worker_corpus, _worker_relation_specs
+    if profiling_settings is not None:
+        profiling.configure(*profiling_settings)
+    if memory_settings is not None:
+        memory.configure(*memory_settings)
+    dep_parser.get_sentence_parser()
+    _worker_corpus = corpus
+    _worker_relation_specs = relation_specs
+
+
+def _build_relation_classifier(relation_specs):
+    """
+	:param relation_specs: a list of tuples (name, seeds, similarity_threshold, promoted_seeds, frozen)
+	:return: a RelationClassifier of new RelationExtractor objects
+	"""
+    relation_extractors = []
+    for name, seeds, similarity_threshold, promoted_seeds, frozen in relation_specs:
+        r = RelationExtractor(name, seeds, similarity_threshold)
+        r.restore_promoted_seeds(promoted_seeds)
+        if frozen:
+            r.freeze()
+        relation_extractors.append(r)
+    return RelationClassifier(relation_extractors)
+
+
+def _analyze_subdir(subdir_and_pages):
+    """
+	Unit of work of a worker process.
+	The RelationExtractor objects are built again for every subdirectory (the vectors of the seeds are cached),
+	so the relation instances of a subdirectory depend only on its pages, not on the ones analyzed before by the worker.
+	:param subdir_and_pages: a tuple (subdir, page_list), as yielded by get_docs_list_by_subdir
+	:return: a tuple (subdir, page_list, list of RelationExtraction objects, profiling statistics of the subdir)
+	"""
+    subdir, page_list = subdir_and_pages
+    relation_classifier = _build_relation_classifier(_worker_relation_specs)
+    instances = list(_find_relation_from_pages(_worker_corpus, page_list, relation_classifier))
+    # the pool may terminate the worker without running the exit handlers
+    dep_parser.flush_sentence_parser()
+    profiling.dump_cprofile()
+    return subdir, page_list, instances, profiling.take()
+
+
+def _load_pages(corpus, page_list):
+    """
+	Yield the pages of a list, skipping those which cannot be read.
+	:param corpus: a file_manager.XmlCorpus or a corpus_index.CorpusIndex object
+	:param page_list: a list of pages of the corpus
+	:return: yield tuples (page_name, sentences, annotations)
+	"""
+    for page in page_list:
+        try:
+            with profiling.timer("xml_load"):
+                sentences, annotations = corpus.read_page(page)
+        except Exception as e:
+            log_print("Problem with " + str(corpus.page_name(page)))
+            continue
+        yield corpus.page_name(page), sentences, annotations
+        profiling.count_pages()
+        memory.count_pages()
+
+
+def _find_relation_from_pages(corpus, page_list, relation_extractors):
+    # for every RelationExtraction object (i.e.: relation instance) retrieved, yield it.
+    for page_name, inst in analyze_pages(_load_pages(corpus, page_list), dep_parser.get_sentence_parser(),
+                                         relation_extractors):
+        log_print(page_name)
+        yield inst
+
+
 def analyze_xml(sentences, annotations, parser, relation_extractors):
     """
 	This is the core method that implements the described procedure.
@@ -79,42 +204,172 @@ def analyze_xml(sentences, annotations, parser, relation_extractors):
 		(defined in the module utils.seeds)
 	Yield the paths which are compliant with the RelationExtractor.
 	Iterate over all the RelationExtractors in input.
+	The procedure is split in four stages (see analyze_pages): prepare_page, the spaCy parsing,
+	extract_candidates (the candidate triples) and match_candidates (the relation matching).
+	The candidate triples can also be stored and matched later (see utils.candidate_store).
 	:param sentences: a list of splitted sentences
 	:param annotations: a list of annotations
 	:param parser: the spaCy parser
 	:param relation_extractors: a list of RelationExtraction object; each of them represents a relation we are looking for.
 	:return: a RelationExtraction (i.e.: a relation instance)
 	"""
+    for _, inst in analyze_pages([(None, sentences, annotations)], parser, relation_extractors):
+        yield inst
+
+
+def analyze_pages(pages, parser, relation_extractors, batch_size=conf.PARSER_BATCH_SIZE):
+    """
+	Batched version of analyze_xml.
+	The cleaned sentences of consecutive pages are collected until there are at least batch_size of them;
+	then they are parsed all together with the spaCy "pipe" API and every page is analyzed with its parsed sentences.
+	:param pages: an iterable of tuples (page_id, sentences, annotations);
+		page_id is an arbitrary identifier, returned together with the relation instances found in that page.
+	:param parser: the spaCy parser
+	:param relation_extractors: a list of RelationExtraction object; each of them represents a relation we are looking for.
+		It can also be a RelationClassifier (see utils.seeds), which evaluates all of them at once.
+	:param batch_size: the minimum number of sentences parsed in a single call to parser.pipe
+	:return: yield tuples (page_id, RelationExtraction), in the same order of the pages.
+	"""
+    relation_classifier = as_relation_classifier(relation_extractors)
+    # the sentences which cannot give relation instances are not parsed, if the prefilter is enabled
+    sentence_prefilter = sentence_filter.get_sentence_prefilter(relation_classifier)
+    for page_id, candidate in extract_candidates_from_pages(pages, parser, batch_size, sentence_prefilter):
+        for inst in match_candidates([candidate], relation_classifier):
+            yield page_id, inst
+    if sentence_prefilter is not None:
+        log_print(sentence_prefilter.report())
+
+
+def extract_candidates_from_pages(pages, parser, batch_size=conf.PARSER_BATCH_SIZE, sentence_prefilter=None):
+    """
+	The candidate generation of analyze_pages, without the relation matching.
+	:param pages: an iterable of tuples (page_id, sentences, annotations)
+	:param parser: the spaCy parser
+	:param batch_size: the minimum number of sentences parsed in a single call to parser.pipe
+	:param sentence_prefilter: if not None, a sentence_filter.SentencePrefilter: only the sentences it keeps are parsed
+	:return: yield tuples (page_id, CandidateTriple), in the same order of the pages.
+	"""
+    batch = []
+    batch_sentences = 0
+    for page_id, sentences, annotations in pages:
+        prepared_sentences = prepare_page(sentences, annotations)
+        if sentence_prefilter is not None:
+            with profiling.timer("sentence_prefilter", len(prepared_sentences)):
+                prepared_sentences = sentence_prefilter.filter(prepared_sentences)
+        batch.append((page_id, prepared_sentences))
+        batch_sentences += len(prepared_sentences)
+        if batch_sentences >= batch_size:
+            for res in _analyze_batch(batch, parser, batch_size):
+                yield res
+            batch = []
+            batch_sentences = 0
+
+    for res in _analyze_batch(batch, parser, batch_size):
+        yield res
+
+
+def _analyze_batch(batch, parser, batch_size):
+    """
+	Parse all the sentences of a batch of pages and extract the candidate triples of each page.
+	:param batch: a list of tuples (page_id, prepared_sentences), where prepared_sentences is returned by prepare_page
+	:return: yield tuples (page_id, CandidateTriple)
+	"""
+    texts = [" ".join(sent) for _, prepared_sentences in batch for _, sent, _ in prepared_sentences]
+    with profiling.timer("spacy_parse", len(texts)):
+        parsed_sentences = iter(list(parser.pipe(texts, batch_size=batch_size)))
+    for page_id, prepared_sentences in batch:
+        docs = list(itertools.islice(parsed_sentences, len(prepared_sentences)))
+        for candidate in extract_candidates(prepared_sentences, docs):
+            yield page_id, candidate
+
+
+def prepare_page(sentences, annotations):
+    """
+	First stage of analyze_xml: disambiguate the sentences of a page and clean them.
+	:param sentences: a list of splitted sentences
+	:param annotations: a list of annotations
+	:return: a list of tuples (sent_idx, sentence, sentence_disambiguation), where:
+		- sent_idx is the index of the sentence in the page;
+		- sentence is the cleaned sentence (a list of words);
+		- sentence_disambiguation is the list of Disambiguation objects relative to the cleaned sentence.
+	"""
 
     # compute a list of disambiguated sentences. Each disambiguated sentence is a list of Disambiguation object.
     # the class Disambiguation is defined in disambiguation.Disambiguation
-    disambiguations = bfm.disambiguate_sentences(sentences, annotations)
+    with profiling.timer("disambiguate_sentences", len(sentences)):
+        disambiguations = bfm.disambiguate_sentences(sentences, annotations)
     if len(sentences) == 0 or len(disambiguations) == 0: return []
 
+    prepared_sentences = []
+    for sent_idx, (sent, sent_disambiguation) in enumerate(zip(sentences, disambiguations)):
+        try:
+            # try to clean the sentence from useless substrings
+            with profiling.timer("clean_sentence"):
+                sent, sent_disambiguation = misc.clean_sentence(sent, sent_disambiguation)
+        except:
+            continue
+        prepared_sentences.append((sent_idx, sent, sent_disambiguation))
+    return prepared_sentences
+
+
+def analyze_parsed_page(prepared_sentences, parsed_sentences, relation_classifier):
+    """
+	Last stage of analyze_xml: from the prepared sentences of a page and their spaCy parses,
+	build the syntactic-semantic graphs and yield the relation instances.
+	:param prepared_sentences: a list of tuples (sent_idx, sentence, sentence_disambiguation), as returned by prepare_page
+	:param parsed_sentences: a list of spaCy Doc objects, one per prepared sentence
+	:param relation_classifier: a RelationClassifier (see utils.seeds), which evaluates all the relations at once.
+	:return: a RelationExtraction (i.e.: a relation instance)
+	"""
+    return match_candidates(extract_candidates(prepared_sentences, parsed_sentences), relation_classifier)
+
+
+def match_candidates(candidates, relation_extractors):
+    """
+	Check, with all the RelationExtractors at once, with which relations every candidate triple is compliant.
+	The candidates must be in the same order they have been extracted, since the seeds promoted
+	by a candidate are used for the following ones.
+	:param candidates: an iterable of CandidateTriple objects
+	:param relation_extractors: a list of RelationExtractor objects, or a RelationClassifier
+	:return: yield RelationExtraction objects
+	"""
+    relation_classifier = as_relation_classifier(relation_extractors)
+    for candidate in candidates:
+        with profiling.timer("is_compliant"):
+            compliant_extractors = relation_classifier.compliant_extractors(candidate.relational_phrase)
+        for relation_extractor in compliant_extractors:
+            yield RelationExtraction(relation_extractor.name, candidate.left_concept, candidate.right_concept,
+                                     candidate.source)
+
+
+def extract_candidates(prepared_sentences, parsed_sentences):
+    """
+	From the prepared sentences of a page and their spaCy parses, build the syntactic-semantic graphs
+	and yield the candidate triples, i.e. the triples which could be relation instances.
+	:param prepared_sentences: a list of tuples (sent_idx, sentence, sentence_disambiguation), as returned by prepare_page
+	:param parsed_sentences: a list of spaCy Doc objects, one per prepared sentence
+	:return: yield CandidateTriple objects
+	"""
+
     # initialize the "concept of the page" to None
     # if it is found in the first sentence, it will be replaced to every subject in following sentences.
     main_concept_of_the_page = None
     main_concept_disambiguations = None
 
-    for sent_idx, (sent, sent_disambiguation) in enumerate(zip(sentences, disambiguations)):
+    for (sent_idx, sent, sent_disambiguation), parsed_sentence in zip(prepared_sentences, parsed_sentences):
         tok_to_sub = None
 
-        try:
-            # try to clean the sentence from useless substrings
-            sent, sent_disambiguation = misc.clean_sentence(sent, sent_disambiguation)
-        except:
-            continue
-
-        # parse the sentence with spaCy, producing a dependency parsed tree.
-        sents = list(parser(" ".join(sent)).sents)
+        # the sentence parsed with spaCy, i.e. a dependency parsed tree.
+        sents = list(parsed_sentence.sents)
         if len(sents) != 1:
             continue
         dependency_parsed_sentence = sents[0]
 
         try:
             # try to build the syntactic-semantic graph
-            semantic_graph, token2concept = sgb.build_one_semantic_graph(dependency_parsed_sentence,
-                                                                         sent_disambiguation)
+            with profiling.timer("build_one_semantic_graph"):
+                semantic_graph, token2concept = sgb.build_one_semantic_graph(dependency_parsed_sentence,
+                                                                             sent_disambiguation)
         except Exception as e:
             log_print("Exception on building semantic graph for: " + dependency_parsed_sentence.text)
             continue
@@ -142,37 +397,46 @@ def analyze_xml(sentences, annotations, parser, relation_extractors):
                 and main_concept_of_the_page != None:
             tok_to_sub = nsubj_tok
 
-        # find all the shortest paths from the subject of the sentence
-        paths_from_nsubj = gu.find_shortest_paths_from_source(semantic_graph, nsubj_tok)
-
-        # filter paths by some criteria (explained in the report)
-        filtered_paths = gu.filter_paths({nsubj_tok: paths_from_nsubj})
+        # find the shortest paths from the subject of the sentence,
+        # filtered by some criteria (explained in the report) while they are searched
+        with profiling.timer("path_search"):
+            filtered_paths = gu.find_filtered_paths_from_source(semantic_graph, nsubj_tok)
         triples = [gu.extract_triple(p) for p in filtered_paths]
 
-        # iterate for every candidate triple and for every RelationExtractor, check if
-        # the candidate triple is compliant with that relation.
         for t in triples:
-            for relation_extractor in relation_extractors:
-                if relation_extractor.is_compliant(" ".join(map(lambda x: x.text, t[1]))):
-                    # if some conditions hold, substitute the subject with the main concept of the page (if any)
-                    if tok_to_sub != None and t[
-                        0] == tok_to_sub and main_concept_of_the_page != None and main_concept_disambiguations != None:
-                        source_sentence = " ".join(sent).replace(t[0].text, main_concept_of_the_page.text, 1)
-                        left_concept = main_concept_disambiguations
-                    # otherwise, return the triple as is
-                    else:
-                        source_sentence = " ".join(sent)
-                        left_concept = token2concept[t[0].i]
-
-                    right_concept = token2concept[t[2].i]
-                    relation_name = relation_extractor.name
-
-                    # fix concept (i.e.: check if it is a CUSTOM_TYPE concept)
-                    # if it is the case, return the most compliant subconcept
-                    fixed_left_concept = misc.fix_concept(left_concept)
-                    fixed_right_concept = misc.fix_concept(right_concept)
-
-                    yield RelationExtraction(relation_name, fixed_left_concept, fixed_right_concept, source_sentence)
+            # if some conditions hold, substitute the subject with the main concept of the page (if any)
+            if tok_to_sub != None and t[
+                0] == tok_to_sub and main_concept_of_the_page != None and main_concept_disambiguations != None:
+                source_sentence = " ".join(sent).replace(t[0].text, main_concept_of_the_page.text, 1)
+                left_concept = main_concept_disambiguations
+            # otherwise, return the triple as is
+            else:
+                source_sentence = " ".join(sent)
+                left_concept = token2concept[t[0].i]
+
+            right_concept = token2concept[t[2].i]
+
+            # fix concept (i.e.: check if it is a CUSTOM_TYPE concept)
+            # if it is the case, return the most compliant subconcept
+            fixed_left_concept = misc.fix_concept(left_concept)
+            fixed_right_concept = misc.fix_concept(right_concept)
+
+            yield CandidateTriple(fixed_left_concept, " ".join(map(lambda x: x.text, t[1])), fixed_right_concept,
+                                  source_sentence)
+
+
+class CandidateTriple(object):
+    """
+	This class represent a candidate triple, i.e. a triple (left_concept, relational_phrase, right_concept)
+	found in a sentence, before checking with which relations it is compliant.
+	"""
+    __slots__ = ("left_concept", "relational_phrase", "right_concept", "source")
+
+    def __init__(self, left_concept, relational_phrase, right_concept, source):
+        self.left_concept = left_concept
+        self.relational_phrase = relational_phrase
+        self.right_concept = right_concept
+        self.source = source
 
 
 class RelationExtraction(object):
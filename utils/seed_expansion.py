@@ -0,0 +1,148 @@
+"""
+Deterministic seed expansion, independent of the order of the pages.
+In a normal run a RelationExtractor promotes a compliant relational phrase to seed as soon as it finds it,
+so the seeds (and then the triples) depend on the order in which the pages are analyzed,
+and the worker processes of a parallel run promote different seeds.
+Here the expansion is done in two phases:
+	1. the candidate relational phrases of the corpus are collected, with their frequencies
+	   (by utils.candidate_store extract);
+	2. the seeds are expanded over that vocabulary of phrases, with a bootstrapping iteration to a fixed point (expand):
+	   a phrase is promoted if the best score sim(phrase, seed) * similarity_handicap(seed) among the seeds
+	   reaches the similarity threshold, and its similarity handicap is that best score.
+	   At every iteration only the seeds promoted (or improved) by the previous one are compared
+	   with the whole vocabulary, with a matrix product.
+Then the RelationExtractor objects are frozen: they do not promote any other seed, so their decisions
+do not depend on the order of the phrases and they can be shared (read-only) by the worker processes.
+
+Usage:
+	python -m utils.seed_expansion <IN_relation_seeds_file> <IN_candidates.sqlite | IN_phrases.txt> [max_iterations]
+"""
+import sys
+
+import numpy as np
+
+import configurations as conf
+import utils.similarity as similarity
+from utils.misc import log_print
+
+
+def read_candidate_phrases(path):
+	"""
+	:param path: a candidate store built with utils.candidate_store (.sqlite), or a text file with a phrase per line,
+		optionally preceded by its frequency and a tab (as printed by "python -m utils.candidate_store phrases")
+	:return: a list of tuples (relational_phrase, frequency)
+	"""
+	if path.endswith(".sqlite"):
+		from utils.candidate_store import CandidateStore
+		store = CandidateStore(path)
+		phrases = [(phrase, frequency) for _, phrase, frequency in store.iter_phrases()]
+		store.close()
+		return phrases
+	phrases = []
+	with open(path) as f:
+		for line in f:
+			frequency, _, phrase = line.strip().rpartition("\t")
+			if phrase != "":
+				phrases.append((phrase, int(frequency) if frequency != "" else 1))
+	return phrases
+
+
+def embed_vocabulary(phrases, batch_size=conf.SEED_EXPANSION_BATCH_SIZE):
+	"""
+	:param phrases: a list of relational phrases
+	:return: a tuple (phrases, matrix) with the phrases which are parsed as a single sentence
+		and their vectors, normalized to unit length, as the rows of a matrix
+	"""
+	embedder = similarity.get_phrase_embedder()
+	kept, rows = [], []
+	# in batches, so that the vectors of a batch are still in the cache of the embedder
+	for start in range(0, len(phrases), batch_size):
+		batch = phrases[start:start + batch_size]
+		for phrase, (is_one_sentence, vector) in zip(batch, embedder.embed_many(batch)):
+			if is_one_sentence:
+				kept.append(phrase)
+				rows.append(similarity._normalize(vector))
+	if len(rows) == 0:
+		return kept, None
+	return kept, np.array(rows, dtype=np.float32)
+
+
+def expand_relation(relation_extractor, phrases, matrix, max_iterations=conf.SEED_EXPANSION_MAX_ITERATIONS):
+	"""
+	Expand the seeds of a relation over the vocabulary to a fixed point (or for at most max_iterations iterations).
+	The similarities are clipped to 1, so the score of a phrase cannot grow along a cycle of promotions.
+	:param relation_extractor: a RelationExtractor object (not modified)
+	:param phrases: the list of the phrases of the vocabulary
+	:param matrix: their normalized vectors (see embed_vocabulary)
+	:return: a tuple (promoted_seeds, iterations), where promoted_seeds is a list of tuples
+		(relational_phrase, similarity_handicap), sorted by decreasing similarity handicap
+		(then in the order of the vocabulary), and iterations is the number of iterations run
+	"""
+	seeds = relation_extractor.seed_matrix
+	is_seed = np.array([ph in relation_extractor.current_seeds_set for ph in phrases], dtype=bool)
+	best = np.zeros(len(phrases), dtype=np.float32)
+	frontier_rows, frontier_handicaps = seeds.rows[:len(seeds)], seeds.handicaps[:len(seeds)]
+	block_size = max(1, conf.SEED_EXPANSION_BLOCK_ELEMENTS // len(phrases))
+	iterations = 0
+	while len(frontier_rows) > 0 and iterations < max_iterations:
+		iterations += 1
+		scores = np.zeros(len(phrases), dtype=np.float32)
+		for start in range(0, len(frontier_rows), block_size):
+			block = np.minimum(matrix.dot(frontier_rows[start:start + block_size].T), 1.)
+			scores = np.maximum(scores, (block * frontier_handicaps[start:start + block_size]).max(axis=1))
+		improved = np.flatnonzero((scores > best) & (scores >= relation_extractor.similarity_threshold) & ~is_seed)
+		best[improved] = scores[improved]
+		frontier_rows, frontier_handicaps = matrix[improved], best[improved]
+	if len(frontier_rows) > 0:
+		log_print("%s: no fixed point after %d iterations" % (relation_extractor.name, iterations))
+
+	promoted = np.flatnonzero(best >= relation_extractor.similarity_threshold)
+	# a stable sort, so the ties are in the order of the vocabulary
+	promoted = promoted[np.argsort(-best[promoted], kind="stable")]
+	return [(phrases[i], float(best[i])) for i in promoted], iterations
+
+
+def expand(relation_extractors, candidate_phrases, min_frequency=conf.SEED_EXPANSION_MIN_FREQUENCY,
+		   max_iterations=conf.SEED_EXPANSION_MAX_ITERATIONS):
+	"""
+	Expand the seeds of the relations over the candidate phrases, then freeze them.
+	At most configurations.MAX_PROMOTED_SEEDS seeds (the ones with the greatest similarity handicap)
+	are promoted for every relation.
+	:param relation_extractors: a list of RelationExtractor objects
+	:param candidate_phrases: a list of tuples (relational_phrase, frequency), see read_candidate_phrases
+	:param min_frequency: the phrases less frequent than this are not in the vocabulary
+	:param max_iterations: the maximum number of iterations for every relation
+	"""
+	# the vocabulary is in a fixed order: by decreasing frequency, then alphabetical
+	phrases = [ph for ph, frequency in sorted(candidate_phrases, key=lambda x: (-x[1], x[0]))
+			   if frequency >= min_frequency]
+	phrases, matrix = embed_vocabulary(phrases)
+	log_print("Seed expansion over %d relational phrases" % len(phrases))
+	for r in relation_extractors:
+		if matrix is not None:
+			promoted_seeds, iterations = expand_relation(r, phrases, matrix, max_iterations)
+			if conf.MAX_PROMOTED_SEEDS is not None:
+				promoted_seeds = promoted_seeds[:max(conf.MAX_PROMOTED_SEEDS - len(r.get_promoted_seeds()), 0)]
+			r.restore_promoted_seeds(promoted_seeds)
+			log_print("%s: %d seeds promoted in %d iterations" % (r.name, len(promoted_seeds), iterations))
+		r.freeze()
+
+
+def main():
+	if len(sys.argv) not in [3, 4]:
+		print("Usage:")
+		print("python -m utils.seed_expansion <IN_relation_seeds_file> <IN_candidates.sqlite | IN_phrases.txt> [max_iterations]")
+		return -1
+	import utils.seed_parser as seed_parser
+	relation_extractors = seed_parser.parse_seed_file(sys.argv[1])
+	expand(relation_extractors, read_candidate_phrases(sys.argv[2]),
+		   max_iterations=int(sys.argv[3]) if len(sys.argv) == 4 else conf.SEED_EXPANSION_MAX_ITERATIONS)
+	for r in relation_extractors:
+		print(r.name)
+		for phrase, similarity_handicap in r.get_promoted_seeds():
+			print("\t%.4f\t%s" % (similarity_handicap, phrase))
+	return 0
+
+
+if __name__ == '__main__':
+	main()
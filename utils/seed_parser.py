@@ -5,15 +5,23 @@ def parse_seed_file(filepath):
 	Parse a seed file, with the format as specified in the README.
 	:return: a list of RelationExtractor objects.
 	"""
+	return [RelationExtractor(relation_name, seeds, sim_threshold)
+			for relation_name, seeds, sim_threshold in parse_seed_specs(filepath)]
+
+def parse_seed_specs(filepath):
+	"""
+	Parse a seed file, without building the RelationExtractor objects (so without embedding the seeds).
+	:return: a list of tuples (relation_name, seeds, similarity_threshold)
+	"""
 	with open(filepath, "r") as f:
 		s = f.read().strip("\n\t ")
 		relations_seeds = s.split(";")
 		if relations_seeds[-1]=="":
 			relations_seeds = relations_seeds[:-1]
 
-		relation_extractors = [get_relation_extractor(rel_string.strip("\n\t "))
-							   for rel_string in relations_seeds]
-	return relation_extractors
+		relation_specs = [get_relation_spec(rel_string.strip("\n\t "))
+						  for rel_string in relations_seeds]
+	return relation_specs
 
 def get_relation_extractor(relation_seeds_string):
 	"""
@@ -21,6 +29,14 @@ def get_relation_extractor(relation_seeds_string):
 	:param relation_seeds_string: "RELATION_NAME:relational_phrase1,relational_phrase2,...
 	:return: a RelationExtractor object
 	"""
+	return RelationExtractor(*get_relation_spec(relation_seeds_string))
+
+def get_relation_spec(relation_seeds_string):
+	"""
+
+	:param relation_seeds_string: "RELATION_NAME:relational_phrase1,relational_phrase2,...
+	:return: a tuple (relation_name, seeds, similarity_threshold)
+	"""
 
 	relation_name, seeds = relation_seeds_string.replace("\n","").replace("\t","").split(":")
 	seeds_and_sim = seeds.split("_")
@@ -32,5 +48,4 @@ def get_relation_extractor(relation_seeds_string):
 	else:
 		raise Exception("Badly formed seed file.")
 	splitted_seeds = list(map(lambda x: x.strip("\n\t "), splitted_seeds))
-	relation_extractor = RelationExtractor(relation_name, splitted_seeds, sim_threshold)
-	return relation_extractor
\ No newline at end of file
+	return relation_name, splitted_seeds, sim_threshold
\ No newline at end of file
@@ -1,7 +1,9 @@
-import utils.dependency_parser as dep_parser
-import configurations as conf
+import numpy as np
 
-parser = dep_parser.get_spacy_parser()
+import configurations as conf
+import utils.memory as memory
+import utils.similarity as similarity
+from utils.misc import LRUCache
 
 
 
@@ -15,16 +17,26 @@ class RelationExtractor(object):
 		self.initial_seeds = seeds
 		# a float
 		self.similarity_threshold = similarity_threshold
-		# a list of tuples in the form (dep_parsed_rel_phrase, similarity_handicap), where:
-		# 	- dep_parsed_rel_phrase is the object returned by the spaCy dependency parser
-		# 		over the fictitious sentence (adding "X" and "Y");
+		# the vectors of the seeds, with their similarity_handicap (see utils.similarity.SeedMatrix), where:
+		# 	- the vector is computed from the fictitious sentence (adding "X" and "Y") parsed with spaCy;
 		# 	- similarity_handicap is 1.0 for root seeds; for second or higher level seeds,
 		# 		this value is exactly the similarity that brings them in the RelationExtractor.
 		# 		It is used for decrease the computed similarity with not-root seeds
-		self.parsed_seeds = [(next(parser("X " + relational_phrase + " Y").sents), 1.) for relational_phrase in seeds]
+		self.seed_matrix = similarity.SeedMatrix()
+		for _, vector in similarity.get_phrase_embedder().embed_many(seeds):
+			self.seed_matrix.append(vector, 1.)
 
 		# a list of strings, contains zero-level seeds and higher-level ones when they are inserted.
 		self.current_seeds = seeds[:]
+		self.current_seeds_set = set(seeds)
+
+		# the decisions on the rejected relational phrases:
+		# a LRU dictionary from a relational phrase to the number of seeds already compared with it.
+		# Since the seeds are only appended, a rejected phrase is compared only with the seeds added later.
+		self.rejected_phrases = LRUCache(conf.REJECTED_PHRASES_CACHE_SIZE)
+		memory.register(self.rejected_phrases.clear)
+		# if True, no other seed is promoted (see freeze)
+		self.frozen = False
 
 	def is_compliant(self, relational_phrase):
 		"""
@@ -34,27 +46,157 @@ class RelationExtractor(object):
 			True if the relational phrase has enough similarity with at least one of the seeds;
 			False otherwise
 		"""
-		if relational_phrase in self.current_seeds:
+		if relational_phrase in self.current_seeds_set:
 			return True
 
-		# parse the relational phrase with two fictitious subject and objects
+		compared_seeds = self.rejected_phrases.get(relational_phrase, 0)
+		if compared_seeds == len(self.seed_matrix):
+			return False
+
+		# the relational phrase is parsed with two fictitious subject and objects
 		# however, these two tokens are not considered directly in the similarity computation
-		artificial_rel_ph = "X " + relational_phrase + " Y"
-		parsed_artificial_rel_ph =list(parser(artificial_rel_ph).sents)
+		is_one_sentence, vector = similarity.get_phrase_embedder().embed(relational_phrase)
 
 		# this "if" manages the case when the parser identify two sentences, instead than one.
-		if len(parsed_artificial_rel_ph) != 1:
+		if not is_one_sentence:
+			self.rejected_phrases[relational_phrase] = len(self.seed_matrix)
 			return False
-		else:
-			parsed_artificial_rel_ph =parsed_artificial_rel_ph[0]
 
-		for (s, sim_threshold) in self.parsed_seeds:
-			new_sim = s[1:-1].similarity(parsed_artificial_rel_ph[1:-1])
-			if new_sim*sim_threshold >= self.similarity_threshold:
-				self.parsed_seeds.append((parsed_artificial_rel_ph, new_sim*sim_threshold))
-				self.current_seeds.append(relational_phrase)
-				return True
-		return False
+		# the first seed s such that similarity(s, relational_phrase) * similarity_handicap(s) >= similarity_threshold
+		match = self.seed_matrix.first_match(vector, self.similarity_threshold, start=compared_seeds)
+		if match is None:
+			self.rejected_phrases[relational_phrase] = len(self.seed_matrix)
+			return False
+
+		_, new_similarity_handicap = match
+		if self.can_promote():
+			self.promote_seed(relational_phrase, vector, new_similarity_handicap)
+		return True
+
+	def can_promote(self):
+		"""
+		:return: False if the RelationExtractor is frozen, or it has already promoted configurations.MAX_PROMOTED_SEEDS
+			seeds; then the compliant relational phrases are accepted, but not promoted.
+		"""
+		return not self.frozen and (conf.MAX_PROMOTED_SEEDS is None or
+									len(self.current_seeds) - len(self.initial_seeds) < conf.MAX_PROMOTED_SEEDS)
+
+	def freeze(self):
+		"""
+		Stop promoting seeds (e.g. after utils.seed_expansion.expand): the decisions on the relational phrases
+		do not depend anymore on the order in which they are seen.
+		"""
+		self.frozen = True
+
+	def promote_seed(self, relational_phrase, vector, similarity_handicap):
+		"""
+		Add a higher-level seed.
+		"""
+		self.seed_matrix.append(vector, similarity_handicap)
+		self.current_seeds.append(relational_phrase)
+		self.current_seeds_set.add(relational_phrase)
+		self.rejected_phrases.pop(relational_phrase)
+
+	def get_promoted_seeds(self):
+		"""
+		:return: the list of the higher-level seeds, as tuples (relational_phrase, similarity_handicap),
+			in the order they have been promoted.
+		"""
+		num_initial_seeds = len(self.initial_seeds)
+		return [(seed, float(handicap)) for seed, handicap in
+				zip(self.current_seeds[num_initial_seeds:], self.seed_matrix.handicaps[num_initial_seeds:len(self.seed_matrix)])]
+
+	def restore_promoted_seeds(self, promoted_seeds):
+		"""
+		Add the higher-level seeds returned by get_promoted_seeds (e.g. by the RelationExtractor of an interrupted run).
+		The ones which are already seeds are skipped.
+		:param promoted_seeds: a list of tuples (relational_phrase, similarity_handicap)
+		"""
+		promoted_seeds = [(phrase, handicap) for phrase, handicap in promoted_seeds
+						  if phrase not in self.current_seeds_set]
+		phrases = [phrase for phrase, _ in promoted_seeds]
+		for (phrase, similarity_handicap), (_, vector) in zip(promoted_seeds,
+															  similarity.get_phrase_embedder().embed_many(phrases)):
+			self.promote_seed(phrase, vector, similarity_handicap)
 
 	def __str__(self):
 		return self.name + ":" + ",".join(self.current_seeds)+"\t"+str(self.similarity_threshold)
+
+
+class RelationClassifier(object):
+	"""
+	This class evaluates a list of RelationExtractor objects at once:
+	a relational phrase is embedded only once and it is compared with the seeds of all the relations
+	stacked in a single matrix, keeping the similarity threshold and the similarity handicaps of every relation.
+	The decisions are the same of calling is_compliant on every RelationExtractor,
+	and the promoted seeds are added to the relative RelationExtractor.
+	"""
+	def __init__(self, relation_extractors):
+		self.relation_extractors = list(relation_extractors)
+		self.similarity_thresholds = np.array([r.similarity_threshold for r in self.relation_extractors],
+											  dtype=np.float32)
+		# the seeds of all the relations; the rows are labelled with the index of the relation.
+		self.seed_matrix = similarity.SeedMatrix()
+		# the number of seeds of every RelationExtractor already copied in the seed_matrix
+		self.num_stacked_seeds = [0] * len(self.relation_extractors)
+		self._stack_new_seeds()
+
+		# a LRU dictionary from a relational phrase to the number of rows of the seed_matrix already compared with it
+		self.rejected_phrases = LRUCache(conf.REJECTED_PHRASES_CACHE_SIZE)
+		memory.register(self.rejected_phrases.clear)
+		# the lexical prefilter of the sentences (see utils.sentence_filter), built when first needed
+		self.sentence_prefilter = None
+
+	def __iter__(self):
+		return iter(self.relation_extractors)
+
+	def __len__(self):
+		return len(self.relation_extractors)
+
+	def compliant_extractors(self, relational_phrase):
+		"""
+		:param relational_phrase: a string
+		:return: the list of the RelationExtractor objects for which the relational phrase is compliant,
+			in the same order of the input list.
+		"""
+		# the RelationExtractor objects could have been promoted seeds on their own
+		self._stack_new_seeds()
+
+		accepted = [k for k, r in enumerate(self.relation_extractors) if relational_phrase in r.current_seeds_set]
+		compared_seeds = self.rejected_phrases.get(relational_phrase, 0)
+		if len(accepted) < len(self.relation_extractors) and compared_seeds < len(self.seed_matrix):
+			is_one_sentence, vector = similarity.get_phrase_embedder().embed(relational_phrase)
+			# the phrase is compared again the next time if it has been accepted, but not promoted
+			not_promoted = False
+			if is_one_sentence:
+				matches = self.seed_matrix.first_matches(vector, self.similarity_thresholds, start=compared_seeds)
+				for k in sorted(matches):
+					if k in accepted:
+						continue
+					_, new_similarity_handicap = matches[k]
+					if self.relation_extractors[k].can_promote():
+						self.relation_extractors[k].promote_seed(relational_phrase, vector, new_similarity_handicap)
+					else:
+						not_promoted = True
+					accepted.append(k)
+				self._stack_new_seeds()
+			if not not_promoted:
+				self.rejected_phrases[relational_phrase] = len(self.seed_matrix)
+
+		return [self.relation_extractors[k] for k in sorted(accepted)]
+
+	def _stack_new_seeds(self):
+		for k, r in enumerate(self.relation_extractors):
+			for i in range(self.num_stacked_seeds[k], len(r.seed_matrix)):
+				self.seed_matrix.append(r.seed_matrix.rows[i], r.seed_matrix.handicaps[i], relation=k)
+			self.num_stacked_seeds[k] = len(r.seed_matrix)
+
+
+def as_relation_classifier(relation_extractors):
+	"""
+	:param relation_extractors: a list of RelationExtractor objects, or a RelationClassifier
+	:return: a RelationClassifier
+	"""
+	if isinstance(relation_extractors, RelationClassifier):
+		return relation_extractors
+	return RelationClassifier(relation_extractors)
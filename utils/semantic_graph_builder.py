@@ -21,7 +21,7 @@ def build_one_semantic_graph(Gd, Sd):
 	"""
 
 	:param Gd: Dependency parsed sentence (through spaCy). The method does side-effect on this variable.
-	:param Sd: list of Disambiguation objects, one per word.
+	:param Sd: list of Disambiguation objects, one per word (usually a DisambiguatedSentence, whose table is read directly).
 	:return: A tuple of two elements:
 		0 - the same dependency parsed sentence, but with the nodes merged by following the disambiguations
 		1 - a mapping from indexes of the tags in the new parsed sentence to concepts.
@@ -43,23 +43,29 @@ def build_one_semantic_graph(Gd, Sd):
 	tot_lost_positions = 0
 	cur_index=0
 
+	# the table of the concepts of the sentence, built by disambiguation.babelfy_man:
+	# the length of the mention of every concept is computed only once
+	concepts, concept_indexes = _concept_table(Sd)
+	mention_lengths = [None] * len(concepts)
+
 	# merge nodes that belongs to the same super-concept
 	# through the spaCy API (the "merge" function)
-	for i, disambiguation in enumerate(Sd):
+	for i in range(len(Sd)):
 		if (lost_positions>0):
 			lost_positions-=1
 			continue
 
-		word = disambiguation.word
-		concept = disambiguation.concept
+		concept_index = concept_indexes[i]
+		concept = concepts[concept_index]
 
 		cur_index = i-tot_lost_positions
 		tokenIndex2concept_mapping[cur_index] = concept
-		concept_mention = concept.mention
-		concept_mention_length = len(concept_mention.split())
 
-		cur_span = Gd[cur_index: cur_index + concept_mention_length]
 		if not concept.isNullConcept():
+			concept_mention_length = mention_lengths[concept_index]
+			if concept_mention_length is None:
+				concept_mention_length = mention_lengths[concept_index] = len(concept.mention.split())
+			cur_span = Gd[cur_index: cur_index + concept_mention_length]
 			# If there is some subject or object in the element of the merge,
 			# Preserve it in the final merged node
 			if any(t.dep_ in c.SPECIAL_DEP_TAGS for t in cur_span):
@@ -82,6 +88,17 @@ def build_one_semantic_graph(Gd, Sd):
 	return Gd, tokenIndex2concept_mapping
 
 
+def _concept_table(Sd):
+	"""
+	:param Sd: a disambiguation.Disambiguation.DisambiguatedSentence, or a list of Disambiguation objects
+	:return: a tuple (concepts, concept_indexes): the distinct concepts of the sentence,
+		and the index (in concepts) of the concept of every word.
+	"""
+	if hasattr(Sd, "concept_indexes"):
+		return Sd.concepts, Sd.concept_indexes
+	return [d.concept for d in Sd], range(len(Sd))
+
+
 def merge_unfolded_nodes_from_tokenization(Gd, Sd):
 	"""
 	Fix some misalignment between the syntactic graph (Gd) and
@@ -0,0 +1,130 @@
+"""
+A lexical prefilter of the sentences, applied before parsing (see relation_extractor.analyze_pages).
+A sentence is parsed only if one of its words starts with a cue: the first SENTENCE_PREFILTER_CUE_LENGTH letters
+of a content word of the seeds (see page_filter.seed_cues), or of one of their nearest words
+in the word vectors of the spaCy model (at most SENTENCE_PREFILTER_NEIGHBOURS per word, with a cosine similarity
+of at least SENTENCE_PREFILTER_MIN_SIMILARITY). These three values are the trade-off between recall and speed:
+more neighbours, and shorter cues, skip less sentences and lose less triples.
+The sentences are already split in words and a cue must be at the start of a word, so the automaton
+which matches all the cues at once is a set lookup of the prefixes of every word (one per distinct length of the cues).
+
+The first sentence of a page is always parsed, since its subject is the main concept of the page.
+The cues of the seeds promoted during the run are added as soon as they are promoted;
+if a seed has only function words (e.g. "is a"), any sentence can be compliant and none is skipped.
+The prefilter can lose some triples, since a relational phrase can be similar to a seed without sharing
+any word with it: benchmarks.check_sentence_prefilter measures the loss on a sample of the corpus.
+"""
+import numpy as np
+
+import configurations as conf
+import utils.dependency_parser as dep_parser
+from utils.misc import log_print
+from utils.page_filter import FUNCTION_WORDS, cue, seed_cues
+
+
+class SentencePrefilter(object):
+	"""
+	The prefilter of the sentences for a list of RelationExtractor objects.
+	"""
+	def __init__(self, relation_extractors, neighbours=None, min_similarity=None, cue_length=None):
+		"""
+		:param relation_extractors: a list of RelationExtractor objects, or a RelationClassifier
+		:param neighbours: the number of nearest words added for every word of the seeds
+			(if None, configurations.SENTENCE_PREFILTER_NEIGHBOURS)
+		:param min_similarity: the minimum similarity of the nearest words
+			(if None, configurations.SENTENCE_PREFILTER_MIN_SIMILARITY)
+		:param cue_length: the length of the cues (if None, configurations.SENTENCE_PREFILTER_CUE_LENGTH)
+		"""
+		self.relation_extractors = list(relation_extractors)
+		self.neighbours = conf.SENTENCE_PREFILTER_NEIGHBOURS if neighbours is None else neighbours
+		self.min_similarity = conf.SENTENCE_PREFILTER_MIN_SIMILARITY if min_similarity is None else min_similarity
+		self.cue_length = conf.SENTENCE_PREFILTER_CUE_LENGTH if cue_length is None else cue_length
+		self.cues = set()
+		self.cue_lengths = []
+		# False if no sentence can be skipped
+		self.enabled = True
+		# the number of seeds of every RelationExtractor whose cues have been added
+		self.num_seeds = [0] * len(self.relation_extractors)
+		self.num_sentences = 0
+		self.num_skipped = 0
+		self._add_new_seeds()
+
+	def _add_new_seeds(self):
+		new_seeds = []
+		for k, r in enumerate(self.relation_extractors):
+			new_seeds.extend(r.current_seeds[self.num_seeds[k]:])
+			self.num_seeds[k] = len(r.current_seeds)
+		if len(new_seeds) == 0 or not self.enabled:
+			return
+		cues = seed_cues([(None, new_seeds, None)], self.cue_length)[None]
+		if len(cues) == 0:
+			log_print("A seed has only function words: the sentence prefilter does not skip any sentence")
+			self.enabled = False
+			return
+		words = set(w for seed in new_seeds for w in seed.split() if w.lower() not in FUNCTION_WORDS)
+		cues.extend(cue(w, self.cue_length) for w in nearest_words(sorted(words), self.neighbours, self.min_similarity))
+		self.cues.update(cues)
+		self.cue_lengths = sorted(set(len(c) for c in self.cues))
+
+	def matches(self, sentence):
+		"""
+		:param sentence: a list of words
+		:return: True if a word of the sentence starts with a cue
+		"""
+		cues = self.cues
+		for word in sentence:
+			word = word.lower()
+			for length in self.cue_lengths:
+				if word[:length] in cues:
+					return True
+		return False
+
+	def filter(self, prepared_sentences):
+		"""
+		:param prepared_sentences: the prepared sentences of a page, see relation_extractor.prepare_page
+		:return: the prepared sentences to be parsed
+		"""
+		self._add_new_seeds()
+		self.num_sentences += len(prepared_sentences)
+		if not self.enabled:
+			return prepared_sentences
+		kept = [prepared for prepared in prepared_sentences if prepared[0] == 0 or self.matches(prepared[1])]
+		self.num_skipped += len(prepared_sentences) - len(kept)
+		return kept
+
+	def report(self):
+		return "Sentence prefilter: %d sentences of %d skipped (%d cues)" % (self.num_skipped, self.num_sentences,
+																			 len(self.cues))
+
+
+def nearest_words(words, n, min_similarity):
+	"""
+	:return: the n nearest words to every word, with at least min_similarity, by the cosine similarity
+		of the word vectors of the spaCy model (none if the model has no word vectors)
+	"""
+	if n == 0 or len(words) == 0:
+		return []
+	vocab = dep_parser.get_spacy_parser().vocab
+	queries = [vocab.get_vector(w) for w in words if vocab.has_vector(w)]
+	if vocab.vectors.size == 0 or len(queries) == 0:
+		return []
+	keys, _, scores = vocab.vectors.most_similar(np.array(queries, dtype=np.float32), n=n)
+	neighbours = []
+	for key, score in zip(keys.ravel(), scores.ravel()):
+		if score >= min_similarity and int(key) in vocab.strings:
+			word = vocab.strings[int(key)]
+			if word.isalpha() and word.lower() not in FUNCTION_WORDS:
+				neighbours.append(word)
+	return neighbours
+
+
+def get_sentence_prefilter(relation_classifier):
+	"""
+	:param relation_classifier: a RelationClassifier
+	:return: its SentencePrefilter (built at the first call), or None if configurations.SENTENCE_PREFILTER is False
+	"""
+	if not conf.SENTENCE_PREFILTER:
+		return None
+	if relation_classifier.sentence_prefilter is None:
+		relation_classifier.sentence_prefilter = SentencePrefilter(relation_classifier)
+	return relation_classifier.sentence_prefilter
@@ -0,0 +1,232 @@
+"""
+Similarity between relational phrases, as used by the RelationExtractor objects (in utils.seeds).
+The similarity of two relational phrases is the cosine similarity between the averages of their word vectors,
+i.e. the value computed by spaCy's Span.similarity.
+Here the vectors of the relational phrases are computed only once (PhraseEmbedder, or read from the
+precomputed store of utils.phrase_vectors)
+and the vectors of the seeds are stacked in a matrix (SeedMatrix),
+so that a relational phrase is compared with all the seeds with a single dot product.
+"""
+import numpy as np
+
+import configurations as conf
+import utils.dependency_parser as dep_parser
+import utils.memory as memory
+import utils.profiling as profiling
+from utils.misc import LRUCache
+
+
+class PhraseEmbedder(object):
+	"""
+	Compute the vectors of relational phrases, keeping the most recent ones in a LRU cache.
+	As in the original procedure, a relational phrase is parsed with two fictitious subject and object ("X" and "Y"),
+	which are not considered in the vector.
+	In the light mode, the artificial sentence is only tokenized and processed by the components
+	of configurations.LIGHT_PHRASE_COMPONENTS (the parser, which decides the sentence boundaries),
+	and the vector is the average of the vectors of the vocabulary, i.e. the same value of Span.vector.
+	The light mode is used only if the model has word vectors and all those components;
+	otherwise the whole model is run.
+	"""
+	def __init__(self, parser=None, cache_size=conf.PHRASE_VECTOR_CACHE_SIZE, light=conf.LIGHT_PHRASE_EMBEDDING):
+		"""
+		:param parser: the spaCy model; if None, the one of utils.dependency_parser (loaded at the first use).
+		:param cache_size: the maximum number of cached vectors
+		:param light: if True, use the light mode (when possible)
+		"""
+		self.parser = parser
+		self.cache = LRUCache(cache_size)
+		memory.register(self.cache.clear)
+		self.light = light
+		# the components run in the light mode, or None if the whole model is run (decided at the first use)
+		self.light_components = None
+		self.light_mode_checked = False
+
+	def get_parser(self):
+		if self.parser is None:
+			self.parser = dep_parser.get_spacy_parser()
+		if not self.light_mode_checked:
+			pipeline = dict(self.parser.pipeline)
+			if self.light and self.parser.vocab.vectors.size > 0 and \
+					all(name in pipeline for name in conf.LIGHT_PHRASE_COMPONENTS):
+				self.light_components = [pipeline[name] for name in conf.LIGHT_PHRASE_COMPONENTS]
+			self.light_mode_checked = True
+		return self.parser
+
+	def _parse(self, text):
+		"""
+		:return: the parsed text (a spaCy Doc object), with the whole model or in the light mode
+		"""
+		nlp = self.get_parser()
+		if self.light_components is None:
+			return nlp(text)
+		doc = nlp.make_doc(text)
+		for component in self.light_components:
+			doc = component(doc)
+		return doc
+
+	def _parse_many(self, texts):
+		"""
+		:return: yield the parsed texts (spaCy Doc objects), with the whole model or in the light mode
+		"""
+		nlp = self.get_parser()
+		if self.light_components is None:
+			return nlp.pipe(texts)
+		docs = (nlp.make_doc(text) for text in texts)
+		for component in self.light_components:
+			docs = _apply_component(component, docs)
+		return docs
+
+	def embed(self, relational_phrase):
+		"""
+		:param relational_phrase: a string
+		:return: a tuple (is_one_sentence, vector), where:
+			- is_one_sentence is False if the parser splits the artificial sentence in more than one sentence;
+			- vector is the vector of the relational phrase (a numpy array), computed on the first sentence.
+		"""
+		embedding = self.cache.get(relational_phrase)
+		if embedding is None:
+			with profiling.timer("phrase_embedding"):
+				embedding = self._embed_parsed(self._parse(_artificial_sentence(relational_phrase)))
+			self.cache[relational_phrase] = embedding
+		return embedding
+
+	def embed_many(self, relational_phrases):
+		"""
+		Same as embed, for a list of relational phrases; the ones not in cache are parsed in a single batch.
+		:return: a list of tuples (is_one_sentence, vector)
+		"""
+		missing = [ph for ph in set(relational_phrases) if ph not in self.cache]
+		with profiling.timer("phrase_embedding", len(missing)):
+			for ph, parsed in zip(missing, self._parse_many([_artificial_sentence(ph) for ph in missing])):
+				self.cache[ph] = self._embed_parsed(parsed)
+		return [self.embed(ph) for ph in relational_phrases]
+
+	def _embed_parsed(self, parsed_artificial_rel_ph):
+		"""
+		:return: a tuple (is_one_sentence, vector), where vector is the one of the first sentence without its first
+			and last token (the whole relational phrase, if it is one sentence); it is zero if that span is empty
+			(e.g. the relational phrase starts with a punctuation mark which ends the first sentence)
+		"""
+		sents = list(parsed_artificial_rel_ph.sents)
+		span = sents[0][1:-1]
+		if len(span) == 0:
+			return len(sents) == 1, np.zeros(parsed_artificial_rel_ph.vocab.vectors_length, dtype=np.float32)
+		if self.light_components is not None:
+			# the average of the vectors of the vocabulary, summed in order as in Span.vector
+			vocab = parsed_artificial_rel_ph.vocab
+			return len(sents) == 1, np.array(sum(vocab.get_vector(t.orth) for t in span) / len(span), dtype=np.float32)
+		# the vector is copied, so that the parsed sentence can be freed
+		return len(sents) == 1, np.array(span.vector, dtype=np.float32)
+
+
+def _apply_component(component, docs):
+	"""
+	:return: yield the documents processed by a component of a spaCy model (in batches, if it supports them)
+	"""
+	if hasattr(component, "pipe"):
+		for doc in component.pipe(docs):
+			yield doc
+	else:
+		for doc in docs:
+			yield component(doc)
+
+
+def _artificial_sentence(relational_phrase):
+	return "X " + relational_phrase + " Y"
+
+
+# lazy initialization of the embedder shared by all the RelationExtractor objects:
+# the precomputed vectors of configurations.PHRASE_VECTOR_STORE, if set, otherwise a PhraseEmbedder
+phrase_embedder = None
+
+def get_phrase_embedder():
+	global phrase_embedder
+	if phrase_embedder is None:
+		if conf.PHRASE_VECTOR_STORE is not None:
+			from utils.phrase_vectors import PhraseVectorStore
+			phrase_embedder = PhraseVectorStore(conf.PHRASE_VECTOR_STORE)
+		else:
+			phrase_embedder = PhraseEmbedder()
+	return phrase_embedder
+
+
+class SeedMatrix(object):
+	"""
+	The vectors of the seeds of a relation, normalized to unit length and stacked as the rows of a matrix,
+	together with their similarity handicaps.
+	The seeds of more relations can be stacked in the same matrix: in that case every row is labelled
+	with the index of its relation (see first_matches).
+	The rows are never modified once added, and new rows are always appended at the end.
+	"""
+	def __init__(self):
+		self.rows = None
+		self.handicaps = np.zeros(0, dtype=np.float32)
+		self.relations = np.zeros(0, dtype=np.int32)
+		self.size = 0
+
+	def __len__(self):
+		return self.size
+
+	def append(self, vector, similarity_handicap, relation=0):
+		"""
+		Add a seed to the matrix. The capacity of the matrix is doubled when needed.
+		:param vector: the vector of the seed (a numpy array)
+		:param similarity_handicap: the similarity handicap of the seed
+		:param relation: the index of the relation of the seed
+		"""
+		if self.rows is None:
+			self.rows = np.zeros((1, len(vector)), dtype=np.float32)
+			self.handicaps = np.zeros(1, dtype=np.float32)
+			self.relations = np.zeros(1, dtype=np.int32)
+		elif self.size == len(self.rows):
+			self.rows = np.concatenate([self.rows, np.zeros_like(self.rows)])
+			self.handicaps = np.concatenate([self.handicaps, np.zeros_like(self.handicaps)])
+			self.relations = np.concatenate([self.relations, np.zeros_like(self.relations)])
+		self.rows[self.size] = _normalize(vector)
+		self.handicaps[self.size] = similarity_handicap
+		self.relations[self.size] = relation
+		self.size += 1
+
+	def similarities(self, vector, start=0):
+		"""
+		:return: the cosine similarities between the vector and the seeds from the index "start" on.
+			As in spaCy, the similarity with a zero vector is 0.
+		"""
+		if self.size <= start:
+			return np.zeros(0, dtype=np.float32)
+		return self.rows[start:self.size].dot(_normalize(vector))
+
+	def first_match(self, vector, similarity_threshold, start=0):
+		"""
+		Find the first seed (from the index "start" on) such that similarity * similarity_handicap >= similarity_threshold.
+		:return: a tuple (seed_index, similarity * similarity_handicap), or None if there is no such seed.
+		"""
+		scores = self.similarities(vector, start) * self.handicaps[start:self.size]
+		matches = np.flatnonzero(scores >= similarity_threshold)
+		if len(matches) == 0:
+			return None
+		return start + int(matches[0]), float(scores[matches[0]])
+
+	def first_matches(self, vector, similarity_thresholds, start=0):
+		"""
+		Same as first_match, for all the relations stacked in the matrix at once:
+		every seed is compared with the similarity threshold of its relation.
+		:param similarity_thresholds: a numpy array with the similarity threshold of every relation
+		:return: a dictionary from the index of a relation to the tuple (seed_index, similarity * similarity_handicap)
+			of its first matching seed; the relations without a matching seed are not in the dictionary.
+		"""
+		scores = self.similarities(vector, start) * self.handicaps[start:self.size]
+		matches = np.flatnonzero(scores >= similarity_thresholds[self.relations[start:self.size]])
+		first_matches = {}
+		for i in matches:
+			relation = int(self.relations[start + i])
+			if relation not in first_matches:
+				first_matches[relation] = (start + int(i), float(scores[i]))
+		return first_matches
+
+
+def _normalize(vector):
+	norm = np.sqrt((vector ** 2).sum())
+	if norm == 0:
+		return np.zeros(len(vector), dtype=np.float32)
+	return vector / norm